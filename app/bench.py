@@ -0,0 +1,64 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+import benchmarks.suite  # noqa: F401  注册所有基准
+from benchmarks.runner import BENCHMARKS, calibrate, compare, format_seconds, load_baseline, machine_info, run_benchmark, run_benchmarks, save_baseline
+
+DEFAULT_BASELINE = str(Path(__file__).resolve().parents[1] / "benchmarks" / "baseline.json")
+
+def main():
+    parser = argparse.ArgumentParser(description="hot-path micro-benchmarks compared against stored baselines")
+    parser.add_argument("--filter", action="append", default=[], help="substring of benchmark names, repeatable")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per measured batch")
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline, 0.25 = 25%%")
+    parser.add_argument("--retries", type=int, default=2, help="re-measure suspected regressions this many times before failing")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--rounds", type=int, default=0, help="full passes, fastest kept (default: 3 with --save, else 1)")
+    parser.add_argument("--json", default="", help="also write results to this file")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    if baseline.get("machine") and baseline["machine"] != machine_info():
+        print(f"warning: baseline was recorded on {baseline['machine']}, numbers may not be comparable")
+    calibration = calibrate(args.min_time, args.repeats)
+    if baseline.get("calibration"):
+        print(f"machine speed vs baseline: {float(baseline['calibration']) / calibration:.2f}x (ratios are normalized)")
+
+    rounds = args.rounds or (3 if args.save else 1)
+    results = run_benchmarks(args.filter, args.min_time, args.repeats, rounds)
+    # 噪声只会让结果变慢：超阈值的项单独重测，取最快的一次再下结论
+    for _ in range(0 if args.save else args.retries):
+        suspects = {c.name for c in compare(results, baseline, args.threshold, calibration) if c.status == "regressed"}
+        if not suspects:
+            break
+        calibration = min(calibration, calibrate(args.min_time, args.repeats))
+        for i, r in enumerate(results):
+            if r.name in suspects:
+                again = run_benchmark(BENCHMARKS[r.name], args.min_time, args.repeats)
+                if again.seconds < r.seconds:
+                    results[i] = again
+
+    comparisons = compare(results, baseline, args.threshold, calibration)
+    print(f"{'benchmark':<44}{'time':>12}{'baseline':>12}{'ratio':>8}  status")
+    for r, c in zip(results, comparisons):
+        ratio = f"{c.ratio:.2f}" if c.ratio else "-"
+        note = f" ({r.skipped})" if r.skipped else ""
+        print(f"{c.name:<44}{format_seconds(c.seconds):>12}{format_seconds(c.baseline):>12}{ratio:>8}  {c.status}{note}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine_info(), "calibration": calibration, "results": [c.__dict__ for c in comparisons]}, f, indent=2)
+    if args.save:
+        save_baseline(args.baseline, results, baseline, calibration)
+        print(f"baseline saved: {args.baseline}")
+        return
+    regressed = [c.name for c in comparisons if c.status == "regressed"]
+    if regressed:
+        print(f"regressed beyond {args.threshold:.0%}: {', '.join(regressed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from config.settings import Settings
+from core.exchange_factory import ExchangeFactory
+from utils.candle_store import CandleStore
+from utils.ohlcv_buffer import timeframe_to_ms
+
+def main():
+    parser = argparse.ArgumentParser(description="backfill the local candle store from the exchange")
+    parser.add_argument("--symbol", default="")
+    parser.add_argument("--timeframe", default="")
+    parser.add_argument("--days", type=float, default=30.0, help="history to fetch when the store is empty")
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+
+    settings = Settings()
+    symbol = args.symbol or settings.symbol
+    timeframe = args.timeframe or settings.sigma_macd_timeframe
+    proxies = {}
+    if settings.http_proxy:
+        proxies["http"] = settings.http_proxy
+    if settings.https_proxy:
+        proxies["https"] = settings.https_proxy
+    exchange = ExchangeFactory.create(
+        "okx",
+        api_key=settings.api_key,
+        secret=settings.api_secret,
+        password=settings.api_password,
+        proxies=proxies,
+        testnet=settings.testnet,
+        enable_rate_limit=True,
+        timeout_ms=settings.timeout_ms,
+        simulated_env=settings.simulated_env,
+    )
+    series = CandleStore(settings.candle_store_dir or "data/candles").series(symbol, timeframe)
+    tf_ms = timeframe_to_ms(timeframe)
+    now_ms = int(time.time() * 1000)
+    since = series.last_ts or int(now_ms - args.days * 86400 * 1000) // tf_ms * tf_ms
+    total = 0
+    while since < now_ms:
+        data = exchange.fetch_ohlcv(symbol, timeframe, since, args.batch)
+        if not data:
+            break
+        total += series.append(data)
+        next_since = int(data[-1][0]) + tf_ms
+        if next_since <= since:
+            break
+        since = next_since
+    print(f"{symbol} {timeframe} rows={len(series)} appended={total} path={series.path}")
+
+if __name__ == "__main__":
+    main()
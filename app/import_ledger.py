@@ -0,0 +1,27 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from config.settings import Settings
+from utils.ledger_db import SqliteTradeLedger
+
+def main():
+    parser = argparse.ArgumentParser(description="import a trades.csv ledger into the sqlite ledger")
+    parser.add_argument("--csv", default="data/trades.csv")
+    parser.add_argument("--db", default="", help="default: <DATA_DIR>/trades.db")
+    parser.add_argument("--force", action="store_true", help="import even if the ledger already has trades (rows are appended, not deduplicated)")
+    args = parser.parse_args()
+
+    ledger = SqliteTradeLedger(Settings(), args.db)
+    t0 = time.perf_counter()
+    try:
+        n = ledger.import_csv(args.csv, force=args.force)
+    except ValueError as e:
+        ledger.close()
+        parser.exit(1, f"{e}; pass --force to append anyway\n")
+    print(f"imported={n} total={ledger.count()} elapsed_sec={time.perf_counter() - t0:.3f} db={ledger.path}")
+    ledger.close()
+
+if __name__ == "__main__":
+    main()
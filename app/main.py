@@ -5,12 +5,19 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 from config.settings import Settings
 from utils.logging import init_logger
+from utils.metrics import instrument_exchange, start_metrics
+from utils.tracing import start_tracing
 from core.exchange_factory import ExchangeFactory
+from core.exchange_recorder import RecordingExchange
+from core.async_exchange import AsyncExchangeAdapter
 from strategie.martingale_macd_spot import MartingaleMACDSpotStrategy
+from strategie.runtime import AsyncStrategyRuntime
 
 def main():
     settings = Settings()
     logger = init_logger(settings)
+    start_metrics(settings)
+    start_tracing(settings)
     proxies = {}
     if settings.http_proxy:
         proxies["http"] = settings.http_proxy
@@ -26,14 +33,25 @@ def main():
         enable_rate_limit=True,
         timeout_ms=settings.timeout_ms,
         simulated_env=settings.simulated_env,
+        rate_limit_scheduler=settings.rate_limit_scheduler,
+        max_inflight=settings.max_inflight_requests,
+        markets_cache_path=settings.markets_cache_file,
+        markets_ttl_sec=settings.markets_ttl_sec,
+        stream_symbols=[settings.symbol] if settings.ws_enabled else None,
+        stream_timeframes=["5m"],
     )
+    if settings.record_file:
+        exchange = RecordingExchange(exchange, settings.record_file)
     strategy = MartingaleMACDSpotStrategy(
         exchange=exchange,
         settings=settings,
         logger=logger,
     )
     print(strategy.state.base_amount)
-    strategy.run()
+    if settings.async_runtime:
+        AsyncStrategyRuntime(AsyncExchangeAdapter(instrument_exchange(exchange)), [strategy]).run()
+    else:
+        strategy.run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,59 @@
+import sys
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from config.settings import Settings
+from config.symbols import load_symbol_configs
+from utils.logging import init_logger
+from utils.metrics import instrument_exchange, start_metrics
+from utils.tracing import start_tracing
+from core.exchange_factory import ExchangeFactory
+from core.exchange_recorder import RecordingExchange
+from core.async_exchange import AsyncExchangeAdapter
+from strategie.runtime import AsyncStrategyRuntime, build_strategies
+
+def main():
+    parser = argparse.ArgumentParser(description="run many symbols in one process on a shared exchange client")
+    parser.add_argument("--config", default="symbols.json", help="see symbols.example.json")
+    parser.add_argument("--strategy", default="sigma", help="default strategy for entries without one")
+    parser.add_argument("--workers", type=int, default=16, help="threads for concurrent exchange requests")
+    args = parser.parse_args()
+
+    settings = Settings()
+    logger = init_logger(settings)
+    start_metrics(settings)
+    start_tracing(settings)
+    configs = load_symbol_configs(args.config, settings, args.strategy)
+    if not configs:
+        parser.error("no symbols in config")
+    proxies = {}
+    if settings.http_proxy:
+        proxies["http"] = settings.http_proxy
+    if settings.https_proxy:
+        proxies["https"] = settings.https_proxy
+    # 所有交易对共用一个交易所实例：markets 只加载一次，限频器也只有一个
+    exchange = ExchangeFactory.create(
+        "okx",
+        api_key=settings.api_key,
+        secret=settings.api_secret,
+        password=settings.api_password,
+        proxies=proxies,
+        testnet=settings.testnet,
+        enable_rate_limit=True,
+        timeout_ms=settings.timeout_ms,
+        simulated_env=settings.simulated_env,
+        rate_limit_scheduler=settings.rate_limit_scheduler,
+        max_inflight=settings.max_inflight_requests,
+        markets_cache_path=settings.markets_cache_file,
+        markets_ttl_sec=settings.markets_ttl_sec,
+        stream_symbols=[c.symbol for c in configs] if settings.ws_enabled else None,
+        stream_timeframes=sorted({"5m" if c.strategy == "martingale" else c.settings.sigma_macd_timeframe for c in configs}),
+    )
+    if settings.record_file:
+        exchange = RecordingExchange(exchange, settings.record_file)
+    strategies = build_strategies(exchange, configs, logger)
+    logger.info(f"multi runner: {len(strategies)} symbols")
+    AsyncStrategyRuntime(AsyncExchangeAdapter(instrument_exchange(exchange), max_workers=args.workers), strategies).run()
+
+if __name__ == "__main__":
+    main()
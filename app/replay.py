@@ -0,0 +1,39 @@
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from config.settings import Settings, with_overrides
+from core.exchange_recorder import ReplayError, ReplayExchange
+from strategie.runtime import STRATEGY_CLASSES
+
+def main():
+    parser = argparse.ArgumentParser(description="run a strategy offline against a recorded exchange session (RECORD_FILE)")
+    parser.add_argument("--file", required=True)
+    parser.add_argument("--strategy", default="sigma", choices=sorted(STRATEGY_CLASSES))
+    parser.add_argument("--match", default="method", choices=["method", "args"])
+    parser.add_argument("--latency", action="store_true", help="sleep for each recorded request duration")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--data-dir", default="data/replay", help="state/ledger dir for the replayed run")
+    parser.add_argument("--max-ticks", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    settings = with_overrides(Settings(), {"data_dir": args.data_dir, "candle_store_dir": ""})
+    exchange = ReplayExchange(args.file, args.match, args.latency, args.latency_scale)
+    strategy = STRATEGY_CLASSES[args.strategy](exchange=exchange, settings=settings, logger=logging.getLogger("replay"))
+    ticks = 0
+    t0 = time.perf_counter()
+    while exchange.remaining() and (not args.max_ticks or ticks < args.max_ticks):
+        try:
+            strategy.tick()
+        except ReplayError as e:
+            print(f"stopped: {e}")
+            break
+        ticks += 1
+    elapsed = time.perf_counter() - t0
+    print(f"ticks={ticks} served={exchange.served} left={exchange.remaining()} elapsed_sec={elapsed:.3f} ticks_per_sec={ticks / elapsed if elapsed > 0 else 0:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from config.settings import Settings
+from backtest.engine import STRATEGIES, load_candles, run_backtest, write_equity_csv, write_fills_csv
+
+def main():
+    parser = argparse.ArgumentParser(description="offline backtest over stored OHLCV candles")
+    parser.add_argument("--csv", default="", help="ohlcv csv: time,open,high,low,close,volume")
+    parser.add_argument("--store", default="", help="candle store dir, e.g. data/candles (instead of --csv)")
+    parser.add_argument("--symbol", default="")
+    parser.add_argument("--timeframe", default="")
+    parser.add_argument("--start", type=int, default=None, help="start time in ms (store only)")
+    parser.add_argument("--end", type=int, default=None, help="end time in ms (store only)")
+    parser.add_argument("--strategy", default="sigma", choices=sorted(STRATEGIES))
+    parser.add_argument("--fee", type=float, default=0.0, help="fee rate per fill, e.g. 0.001")
+    parser.add_argument("--initial-quote", type=float, default=0.0)
+    parser.add_argument("--fills-out", default="")
+    parser.add_argument("--equity-out", default="")
+    args = parser.parse_args()
+
+    settings = Settings()
+    candles = load_candles(args.csv, args.store, args.symbol or settings.symbol, args.timeframe or settings.sigma_macd_timeframe, args.start, args.end)
+    t0 = time.perf_counter()
+    result = run_backtest(candles, settings, args.strategy, fee_rate=args.fee, initial_quote=args.initial_quote)
+    elapsed = time.perf_counter() - t0
+    for k, v in result.summary().items():
+        print(f"{k}={v}")
+    print(f"elapsed_sec={elapsed:.3f}")
+    if args.fills_out:
+        write_fills_csv(args.fills_out, result)
+    if args.equity_out:
+        write_equity_csv(args.equity_out, result)
+
+if __name__ == "__main__":
+    main()
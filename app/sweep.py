@@ -0,0 +1,46 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from config.settings import Settings
+from backtest.engine import STRATEGIES, load_candles
+from backtest.sweep import parse_range, rank_metrics, run_sweep, write_results_csv
+
+def main():
+    parser = argparse.ArgumentParser(description="parallel parameter sweep over Settings fields")
+    parser.add_argument("--csv", default="", help="ohlcv csv: time,open,high,low,close,volume")
+    parser.add_argument("--store", default="", help="candle store dir, e.g. data/candles (instead of --csv)")
+    parser.add_argument("--symbol", default="")
+    parser.add_argument("--timeframe", default="")
+    parser.add_argument("--start", type=int, default=None, help="start time in ms (store only)")
+    parser.add_argument("--end", type=int, default=None, help="end time in ms (store only)")
+    parser.add_argument("--strategy", default="sigma", choices=sorted(STRATEGIES))
+    parser.add_argument("--param", action="append", default=[], help="field=start:stop:step or field=v1,v2,...")
+    parser.add_argument("--fee", type=float, default=0.0)
+    parser.add_argument("--initial-quote", type=float, default=0.0)
+    parser.add_argument("--processes", type=int, default=0, help="0 = all cores")
+    parser.add_argument("--rank-by", default="pnl", choices=rank_metrics(), help="max_drawdown and fees rank ascending, the rest descending")
+    parser.add_argument("--out", default="sweep_results.csv")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    grid = {}
+    for p in args.param:
+        name, _, spec = p.partition("=")
+        grid[name.strip()] = parse_range(spec)
+    if not grid:
+        parser.error("at least one --param is required")
+    settings = Settings()
+    candles = load_candles(args.csv, args.store, args.symbol or settings.symbol, args.timeframe or settings.sigma_macd_timeframe, args.start, args.end)
+    t0 = time.perf_counter()
+    rows = run_sweep(candles, settings, grid, args.strategy, fee_rate=args.fee, initial_quote=args.initial_quote,
+                     processes=args.processes or None, rank_by=args.rank_by)
+    elapsed = time.perf_counter() - t0
+    write_results_csv(args.out, rows)
+    for row in rows[: args.top]:
+        print(row)
+    print(f"combinations={len(rows)} elapsed_sec={elapsed:.3f} out={args.out}")
+
+if __name__ == "__main__":
+    main()
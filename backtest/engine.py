@@ -0,0 +1,381 @@
+import csv
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+from config.settings import Settings
+from utils.candle_store import CandleStore
+from utils.indicators import macd_cross_series
+from utils.ladder import ladder_levels
+
+HOUR_MS = 3600 * 1000
+DAY_MS = 24 * HOUR_MS
+
+
+@dataclass
+class Candles:
+    ts: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.ts.size)
+
+
+@dataclass
+class Fill:
+    index: int
+    ts: int
+    side: str
+    price: float
+    amount: float
+    fee: float
+    realized: float = 0.0
+
+
+@dataclass
+class BacktestResult:
+    fills: List[Fill]
+    ts: np.ndarray
+    base: np.ndarray
+    quote: np.ndarray
+    equity: np.ndarray
+    initial_quote: float
+    realized_pnl: float
+    fees: float
+    state: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def pnl(self) -> float:
+        if self.equity.size == 0:
+            return 0.0
+        return float(self.equity[-1] - self.initial_quote)
+
+    @property
+    def max_drawdown(self) -> float:
+        if self.equity.size == 0:
+            return 0.0
+        peak = np.maximum.accumulate(self.equity)
+        return float(np.max(peak - self.equity))
+
+    def summary(self) -> Dict[str, Any]:
+        buys = sum(1 for f in self.fills if f.side == "buy")
+        return {
+            "bars": int(self.ts.size),
+            "buys": buys,
+            "sells": len(self.fills) - buys,
+            "realized_pnl": self.realized_pnl,
+            "pnl": self.pnl,
+            "fees": self.fees,
+            "max_drawdown": self.max_drawdown,
+            "final_equity": float(self.equity[-1]) if self.equity.size else self.initial_quote,
+            "final_base": float(self.base[-1]) if self.base.size else 0.0,
+        }
+
+
+def candles_from_ohlcv(rows: Sequence[Sequence[float]]) -> Candles:
+    arr = np.asarray(rows, dtype=float)
+    if arr.size == 0:
+        arr = np.zeros((0, 6), dtype=float)
+    if arr.shape[1] < 6:
+        arr = np.hstack([arr, np.zeros((arr.shape[0], 6 - arr.shape[1]))])
+    return Candles(
+        ts=arr[:, 0].astype(np.int64),
+        open=np.ascontiguousarray(arr[:, 1]),
+        high=np.ascontiguousarray(arr[:, 2]),
+        low=np.ascontiguousarray(arr[:, 3]),
+        close=np.ascontiguousarray(arr[:, 4]),
+        volume=np.ascontiguousarray(arr[:, 5]),
+    )
+
+
+def load_ohlcv_csv(path: str) -> Candles:
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.readline()
+    skip = 0 if first[:1].isdigit() else 1
+    arr = np.loadtxt(path, delimiter=",", skiprows=skip, ndmin=2, usecols=range(6))
+    return candles_from_ohlcv(arr)
+
+
+def load_store_candles(root: str, symbol: str, timeframe: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Candles:
+    # 列都是 memmap 上的视图，回测只按需读页，不把整个文件读进内存
+    rows = CandleStore(root).series(symbol, timeframe).range(start_ms, end_ms)
+    return Candles(ts=rows[:, 0], open=rows[:, 1], high=rows[:, 2], low=rows[:, 3], close=rows[:, 4], volume=rows[:, 5])
+
+
+def load_candles(csv_path: str = "", store_dir: str = "", symbol: str = "", timeframe: str = "",
+                 start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Candles:
+    if csv_path:
+        return load_ohlcv_csv(csv_path)
+    if store_dir and symbol and timeframe:
+        return load_store_candles(store_dir, symbol, timeframe, start_ms, end_ms)
+    raise ValueError("either a csv path or store dir + symbol + timeframe is required")
+
+
+def write_fills_csv(path: str, result: BacktestResult):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["time", "side", "price", "amount", "fee", "realized"])
+        for fl in result.fills:
+            w.writerow([fl.ts, fl.side, fl.price, fl.amount, fl.fee, fl.realized])
+
+
+def write_equity_csv(path: str, result: BacktestResult):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["time", "base", "quote", "equity"])
+        for row in zip(result.ts.tolist(), result.base.tolist(), result.quote.tolist(), result.equity.tolist()):
+            w.writerow(row)
+
+
+def prev_day_hourly_baseline(candles: Candles) -> np.ndarray:
+    """
+    与 compute_prev_day_1h_baseline 一致：每根K线的基线 = 前一个UTC自然日 24 根 1h 收盘价的均值，没有前一天数据时为 nan
+    """
+    n = len(candles)
+    baseline = np.full(n, np.nan)
+    if n == 0:
+        return baseline
+    hours = candles.ts // HOUR_MS
+    hour_last = np.flatnonzero(np.diff(hours, append=hours[-1] + 1))
+    hour_close = candles.close[hour_last]
+    hour_day = hours[hour_last] // 24
+    days, starts = np.unique(hour_day, return_index=True)
+    day_mean = np.add.reduceat(hour_close, starts) / np.diff(np.append(starts, hour_close.size))
+    bar_day = candles.ts // DAY_MS
+    pos = np.searchsorted(days, bar_day - 1)
+    pos_ok = pos < days.size
+    found = np.zeros(n, dtype=bool)
+    found[pos_ok] = days[pos[pos_ok]] == bar_day[pos_ok] - 1
+    baseline[found] = day_mean[pos[found]]
+    return baseline
+
+
+def _next_hit(mask_fn: Callable[[int, int], np.ndarray], start: int, n: int, chunk: int = 4096) -> int:
+    while start < n:
+        end = min(n, start + chunk)
+        hits = np.flatnonzero(mask_fn(start, end))
+        if hits.size:
+            return start + int(hits[0])
+        start = end
+        chunk *= 2
+    return n
+
+
+class _Book:
+    def __init__(self, candles: Candles, settings: Settings, fee_rate: float, initial_quote: float):
+        self.candles = candles
+        self.fee_rate = float(fee_rate)
+        self.initial_quote = float(initial_quote)
+        self.slip = float(settings.limit_slippage_pct) if settings.order_type == "limit" else 0.0
+        self.base = 0.0
+        self.avg_cost = 0.0
+        self.quote = float(initial_quote)
+        self.realized = 0.0
+        self.fees = 0.0
+        self.fills: List[Fill] = []
+        self._idx: List[int] = []
+        self._base_after: List[float] = []
+        self._quote_after: List[float] = []
+
+    def buy(self, i: int, base_amount: float, price: Optional[float] = None):
+        price = float(self.candles.close[i]) * (1.0 - self.slip) if price is None else price
+        if base_amount <= 0.0 or price <= 0.0:
+            return
+        fee = base_amount * price * self.fee_rate
+        total = self.base + base_amount
+        self.avg_cost = (self.avg_cost * self.base + price * base_amount) / total if total > 0 else price
+        self.base = total
+        self.quote -= base_amount * price + fee
+        self.fees += fee
+        self._record(Fill(i, int(self.candles.ts[i]), "buy", price, base_amount, fee))
+
+    def sell_down_to(self, i: int, base_keep: float, price: Optional[float] = None):
+        price = float(self.candles.close[i]) * (1.0 + self.slip) if price is None else price
+        base_amount = self.base - base_keep
+        if base_amount <= 0.0:
+            return
+        fee = base_amount * price * self.fee_rate
+        realized = base_amount * (price - self.avg_cost) if self.avg_cost > 0 else 0.0
+        self.base = base_keep
+        self.quote += base_amount * price - fee
+        self.realized += realized
+        self.fees += fee
+        self._record(Fill(i, int(self.candles.ts[i]), "sell", price, base_amount, fee, realized))
+
+    def _record(self, fill: Fill):
+        self.fills.append(fill)
+        self._idx.append(fill.index)
+        self._base_after.append(self.base)
+        self._quote_after.append(self.quote)
+
+    def result(self, state: Dict[str, Any]) -> BacktestResult:
+        n = len(self.candles)
+        base = np.zeros(n)
+        quote = np.full(n, self.initial_quote)
+        if self._idx:
+            pos = np.searchsorted(np.asarray(self._idx), np.arange(n), side="right") - 1
+            held = pos >= 0
+            base[held] = np.asarray(self._base_after)[pos[held]]
+            quote[held] = np.asarray(self._quote_after)[pos[held]]
+        equity = quote + base * self.candles.close
+        return BacktestResult(
+            fills=self.fills,
+            ts=self.candles.ts,
+            base=base,
+            quote=quote,
+            equity=equity,
+            initial_quote=self.initial_quote,
+            realized_pnl=self.realized,
+            fees=self.fees,
+            state=state,
+        )
+
+
+def backtest_sigma(
+    candles: Candles,
+    settings: Settings,
+    fee_rate: float = 0.0,
+    initial_quote: float = 0.0,
+    golden: Optional[np.ndarray] = None,
+) -> BacktestResult:
+    """
+    按 SigmaSpotStrategy.run 的规则逐根K线撮合（每根K线收盘评估一次），只在可能触发买卖的K线上做标量计算。
+    sigma_ladder_levels > 0 时持仓期间按挂单梯子撮合：加仓档和止盈单在上一根收盘时已挂好，
+    K线最低价碰到档位即按档位价成交（跳空低开按开盘价），最高价碰到止盈价即卖出；
+    同一根里阳线按 开-低-高-收、阴线按 开-高-低-收 的顺序处理
+    """
+    n = len(candles)
+    close = candles.close
+    ts = candles.ts
+    golden = macd_cross_series(close) if golden is None else golden
+    prev_bearish = np.zeros(n, dtype=bool)
+    prev_bearish[1:] = candles.open[:-1] > close[:-1]
+    book = _Book(candles, settings, fee_rate, initial_quote)
+    buy_base = float(settings.sigma_buy_base_eth)
+    leave = float(settings.sigma_sell_leave_base_eth)
+    drop = float(settings.sigma_buy_price_drop_pct)
+    profit = float(settings.sigma_sell_profit_pct)
+    cooldown_ms = int(settings.sigma_buy_cooldown_sec) * 1000
+    max_adds = int(settings.sigma_max_adds)
+    ladder = int(settings.sigma_ladder_levels)
+    low, high, open_ = candles.low, candles.high, candles.open
+    last_buy_ms = 0
+    buy_count = 0
+    i = 0
+    while i < n:
+        if ladder > 0 and book.base > 0.0 and book.avg_cost > 0.0:
+            levels = ladder_levels(book.avg_cost, book.base, buy_count, buy_base, drop, max_adds, ladder)
+            tp_amount = book.base - leave if book.base > leave else 0.0
+            first = levels[0][1] if levels else -np.inf
+            tp = book.avg_cost * (1.0 + profit) if tp_amount > 0.0 else np.inf
+            j = _next_hit(lambda s, e: (low[s:e] <= first) | (high[s:e] >= tp), i, n)
+            if j >= n:
+                break
+            o = float(open_[j])
+
+            def fill_levels():
+                nonlocal buy_count, last_buy_ms
+                for k, p in levels:
+                    if low[j] > p:
+                        break
+                    book.buy(j, buy_base, min(p, o))
+                    buy_count, last_buy_ms = k, int(ts[j])
+
+            def fill_tp():
+                if high[j] >= tp:
+                    book.sell_down_to(j, book.base - tp_amount, max(tp, o))
+
+            if close[j] >= o:
+                fill_levels()
+                fill_tp()
+            else:
+                fill_tp()
+                fill_levels()
+            i = j + 1
+            continue
+        if buy_count < max_adds and (book.base <= 0.0 or book.avg_cost > 0.0):
+            ready_ms = last_buy_ms + cooldown_ms
+            if book.base <= 0.0:
+                buy_mask = lambda s, e: golden[s:e] & (ts[s:e] >= ready_ms)
+            else:
+                trigger = book.avg_cost * (1.0 - drop)
+                buy_mask = lambda s, e: golden[s:e] & (ts[s:e] >= ready_ms) & (close[s:e] <= trigger)
+            j_buy = _next_hit(buy_mask, i, n)
+        else:
+            j_buy = n
+        if book.base > leave and book.avg_cost > 0.0:
+            target = book.avg_cost * (1.0 + profit)
+            j_sell = _next_hit(lambda s, e: prev_bearish[s:e] & (close[s:e] >= target), i, n)
+        else:
+            j_sell = n
+        j = min(j_buy, j_sell)
+        if j >= n:
+            break
+        if j == j_buy:
+            book.buy(j, buy_base)
+            last_buy_ms = int(ts[j])
+            buy_count += 1
+        last = float(close[j])
+        if prev_bearish[j] and book.base >= leave and book.avg_cost > 0.0 and last >= book.avg_cost * (1.0 + profit):
+            book.sell_down_to(j, leave)
+        i = j + 1
+    return book.result({"base_amount": book.base, "avg_cost": book.avg_cost, "last_buy_ms": last_buy_ms, "buy_count": buy_count})
+
+
+def backtest_martingale(
+    candles: Candles,
+    settings: Settings,
+    fee_rate: float = 0.0,
+    initial_quote: float = 0.0,
+    golden: Optional[np.ndarray] = None,
+    baseline: Optional[np.ndarray] = None,
+) -> BacktestResult:
+    """
+    按 MartingaleMACDSpotStrategy.run 的规则回测：基线首买、回撤+金叉倍投、达到止盈全部卖出
+    """
+    n = len(candles)
+    close = candles.close
+    golden = macd_cross_series(close) if golden is None else golden
+    baseline = prev_day_hourly_baseline(candles) if baseline is None else baseline
+    book = _Book(candles, settings, fee_rate, initial_quote)
+    base_buy_usdt = float(settings.base_buy_usdt)
+    dd = float(settings.drawdown_pct)
+    tp = float(settings.take_profit_pct)
+    mult = float(settings.multiplicator)
+    i = 0
+    while i < n:
+        if book.base <= 0.0:
+            with np.errstate(invalid="ignore"):
+                j = _next_hit(lambda s, e: close[s:e] < baseline[s:e], i, n)
+        else:
+            trigger = book.avg_cost * (1.0 - dd)
+            target = book.avg_cost * (1.0 + tp)
+            j = _next_hit(lambda s, e: (golden[s:e] & (close[s:e] <= trigger)) | (close[s:e] >= target), i, n)
+        if j >= n:
+            break
+        last = float(close[j])
+        if book.base <= 0.0 and last < baseline[j]:
+            book.buy(j, base_buy_usdt / (last * (1.0 - book.slip)))
+        if book.base > 0.0 and last <= book.avg_cost * (1.0 - dd) and golden[j]:
+            book.buy(j, book.base * mult * last / (last * (1.0 - book.slip)))
+        if book.base > 0.0 and book.avg_cost > 0.0 and (last - book.avg_cost) / book.avg_cost >= tp:
+            book.sell_down_to(j, 0.0)
+            book.avg_cost = 0.0
+        i = j + 1
+    return book.result({"base_amount": book.base, "avg_cost": book.avg_cost})
+
+
+STRATEGIES = {
+    "sigma": backtest_sigma,
+    "martingale": backtest_martingale,
+}
+
+
+def run_backtest(candles: Candles, settings: Settings, strategy: str = "sigma", **kwargs) -> BacktestResult:
+    fn = STRATEGIES.get(strategy)
+    if fn is None:
+        raise ValueError("unsupported strategy")
+    return fn(candles, settings, **kwargs)
@@ -0,0 +1,102 @@
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from config.settings import Settings, coerce_setting, with_overrides
+from backtest.engine import BacktestResult, Candles, prev_day_hourly_baseline, run_backtest
+from utils.indicators import macd_cross_series
+
+_WORKER: Dict[str, Any] = {}
+
+# 越小越好的指标，排名时升序
+ASCENDING_METRICS = frozenset(("max_drawdown", "fees"))
+
+
+def rank_metrics() -> List[str]:
+    """可以用来排名的指标，即 BacktestResult.summary() 的键"""
+    empty = np.zeros(0)
+    return list(BacktestResult([], empty.astype(np.int64), empty, empty, empty, 0.0, 0.0, 0.0).summary())
+
+
+def parse_range(spec: str) -> List[float]:
+    """
+    "0.001:0.005:0.001" 表示闭区间步进，"1,2,3" 表示枚举
+    """
+    spec = spec.strip()
+    if ":" in spec:
+        start, stop, step = (float(x) for x in spec.split(":"))
+        if step <= 0:
+            raise ValueError("range step must be positive")
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        return [round(start + k * step, 12) for k in range(max(count, 0))]
+    return [float(x) for x in spec.split(",") if x.strip()]
+
+
+def expand_grid(grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    known = {f.name: f for f in fields(Settings)}
+    for name in grid:
+        if name not in known:
+            raise ValueError(f"unknown settings field: {name}")
+    names = list(grid)
+    columns = [[coerce_setting(known[n].type, v) for v in grid[n]] for n in names]
+    return [dict(zip(names, values)) for values in itertools.product(*columns)]
+
+
+def _init_worker(candles: Candles, settings: Settings, strategy: str, extra: Dict[str, Any]):
+    _WORKER["candles"] = candles
+    _WORKER["settings"] = settings
+    _WORKER["strategy"] = strategy
+    _WORKER["extra"] = extra
+
+
+def _run_combo(combo: Dict[str, Any]) -> Dict[str, Any]:
+    s = with_overrides(_WORKER["settings"], combo)
+    result = run_backtest(_WORKER["candles"], s, _WORKER["strategy"], **_WORKER["extra"])
+    row = dict(combo)
+    row.update(result.summary())
+    return row
+
+
+def run_sweep(
+    candles: Candles,
+    settings: Settings,
+    grid: Dict[str, Sequence[Any]],
+    strategy: str = "sigma",
+    fee_rate: float = 0.0,
+    initial_quote: float = 0.0,
+    processes: Optional[int] = None,
+    rank_by: str = "pnl",
+) -> List[Dict[str, Any]]:
+    metrics = rank_metrics()
+    if rank_by not in metrics:
+        raise ValueError(f"unknown rank metric: {rank_by} (expected one of {', '.join(metrics)})")
+    combos = expand_grid(grid)
+    # 扫描的参数都不影响 MACD 与基线，只在主进程算一次，随 initializer 下发给各 worker
+    extra: Dict[str, Any] = {"fee_rate": fee_rate, "initial_quote": initial_quote, "golden": macd_cross_series(candles.close)}
+    if strategy == "martingale":
+        extra["baseline"] = prev_day_hourly_baseline(candles)
+    processes = processes or os.cpu_count() or 1
+    if processes <= 1 or len(combos) <= 1:
+        _init_worker(candles, settings, strategy, extra)
+        rows = [_run_combo(c) for c in combos]
+    else:
+        chunksize = max(1, len(combos) // (processes * 4))
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(candles, settings, strategy, extra)) as pool:
+            rows = list(pool.map(_run_combo, combos, chunksize=chunksize))
+    rows.sort(key=lambda r: r[rank_by], reverse=rank_by not in ASCENDING_METRICS)
+    for rank, row in enumerate(rows, 1):
+        row["rank"] = rank
+    return rows
+
+
+def write_results_csv(path: str, rows: List[Dict[str, Any]]):
+    if not rows:
+        return
+    header = ["rank"] + [k for k in rows[0] if k != "rank"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=header)
+        w.writeheader()
+        w.writerows(rows)
@@ -0,0 +1,188 @@
+import json
+import os
+import platform
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# setup(workdir) 返回被测的无参函数，或 (函数, 清理函数)
+Setup = Callable[[str], Any]
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Setup
+    # 依赖缺失等情况返回原因，跳过该项
+    skip: Optional[Callable[[], str]] = None
+
+
+@dataclass
+class BenchResult:
+    name: str
+    seconds: float
+    loops: int
+    samples: List[float] = field(default_factory=list)
+    skipped: str = ""
+
+
+@dataclass
+class Comparison:
+    name: str
+    seconds: float
+    baseline: float
+    ratio: float
+    status: str  # ok / regressed / improved / new / skipped
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, skip: Optional[Callable[[], str]] = None):
+    def deco(setup: Setup) -> Setup:
+        BENCHMARKS[name] = Benchmark(name, setup, skip)
+        return setup
+    return deco
+
+
+def measure(fn: Callable[[], Any], min_time: float = 0.05, repeats: int = 7) -> Tuple[float, int, List[float]]:
+    """
+    先把循环次数放大到一批至少 min_time 秒，再测 repeats 批，返回最快一批的单次耗时、每批次数和各批的单次耗时。
+    取最快而不是平均：噪声（调度、其它进程）只会让结果变慢，最快的一批最接近代码本身的开销
+    """
+    fn()
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        dt = time.perf_counter() - t0
+        if dt >= min_time or loops >= 1 << 24:
+            break
+        loops = min(1 << 24, max(loops * 2, int(loops * min_time / max(dt, 1e-9) * 1.1)))
+    samples = [dt / loops]
+    for _ in range(repeats - 1):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - t0) / loops)
+    return min(samples), loops, samples
+
+
+def run_benchmark(b: Benchmark, min_time: float = 0.05, repeats: int = 7) -> BenchResult:
+    reason = b.skip() if b.skip else ""
+    if reason:
+        return BenchResult(b.name, 0.0, 0, skipped=reason)
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        made = b.setup(workdir)
+        fn, teardown = made if isinstance(made, tuple) else (made, None)
+        try:
+            seconds, loops, samples = measure(fn, min_time, repeats)
+        finally:
+            if teardown is not None:
+                teardown()
+    return BenchResult(b.name, seconds, loops, samples)
+
+
+def select(patterns: Optional[List[str]] = None) -> List[Benchmark]:
+    return [b for n, b in BENCHMARKS.items() if not patterns or any(p in n for p in patterns)]
+
+
+def run_benchmarks(patterns: Optional[List[str]] = None, min_time: float = 0.05, repeats: int = 7, rounds: int = 1) -> List[BenchResult]:
+    """rounds>1 时整套跑多轮，每项取最快的一轮"""
+    best: Dict[str, BenchResult] = {}
+    for _ in range(max(1, rounds)):
+        for b in select(patterns):
+            r = run_benchmark(b, min_time, repeats)
+            if b.name not in best or (not r.skipped and r.seconds < best[b.name].seconds):
+                best[b.name] = r
+    return list(best.values())
+
+
+def _reference_workload():
+    # 固定的纯 Python 工作量（字典、浮点、函数调用），只用来估计这台机器此刻的快慢
+    d: Dict[int, float] = {}
+    acc = 0.0
+    for i in range(500):
+        d[i & 63] = d.get(i & 63, 0.0) + i * 0.5
+        acc += abs(d[i & 63] - acc) * 1e-3
+    return acc
+
+
+def calibrate(min_time: float = 0.05, repeats: int = 7) -> float:
+    """参考负载的单次耗时；比较时按 当前/基线 的比值把结果折算到基线机器的速度，抵消整机的快慢波动"""
+    return measure(_reference_workload, min_time, repeats)[0]
+
+
+def machine_info() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {"machine": {}, "results": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: List[BenchResult], previous: Optional[Dict[str, Any]] = None, calibration: float = 0.0):
+    """只覆盖这次跑过的项，其它项保留原基线；结果先按 calibration 折算到原基线的机器速度"""
+    data = previous or {"machine": {}, "results": {}}
+    scale = 1.0
+    if calibration > 0 and data.get("calibration"):
+        scale = float(data["calibration"]) / calibration
+    elif calibration > 0:
+        data["calibration"] = calibration
+    data["machine"] = machine_info()
+    for r in results:
+        if not r.skipped:
+            data["results"][r.name] = {"seconds": r.seconds * scale, "loops": r.loops}
+    data["results"] = dict(sorted(data["results"].items()))
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def compare(results: List[BenchResult], baseline: Dict[str, Any], threshold: float = 0.25, calibration: float = 0.0) -> List[Comparison]:
+    """
+    比基线慢 threshold 以上为 regressed，快 threshold 以上为 improved。
+    给出本次的 calibration 且基线里也有时，ratio 按两次参考负载的比值归一化
+    """
+    base = baseline.get("results", {})
+    speed = 1.0
+    if calibration > 0 and baseline.get("calibration"):
+        speed = calibration / float(baseline["calibration"])
+    out = []
+    for r in results:
+        if r.skipped:
+            out.append(Comparison(r.name, 0.0, 0.0, 0.0, "skipped"))
+            continue
+        b = float((base.get(r.name) or {}).get("seconds") or 0.0)
+        if b <= 0:
+            out.append(Comparison(r.name, r.seconds, 0.0, 0.0, "new"))
+            continue
+        ratio = r.seconds / b / speed
+        status = "regressed" if ratio > 1.0 + threshold else "improved" if ratio < 1.0 / (1.0 + threshold) else "ok"
+        out.append(Comparison(r.name, r.seconds, b, ratio, status))
+    return out
+
+
+def format_seconds(s: float) -> str:
+    if s <= 0:
+        return "-"
+    if s < 1e-6:
+        return f"{s * 1e9:.0f}ns"
+    if s < 1e-3:
+        return f"{s * 1e6:.2f}us"
+    if s < 1.0:
+        return f"{s * 1e3:.2f}ms"
+    return f"{s:.3f}s"
@@ -0,0 +1,196 @@
+import csv
+import logging
+import os
+import time
+import ccxt
+import numpy as np
+from config.settings import Settings
+from core.markets import build_rules
+from core.okx_client import OkxClient
+from core.sim_exchange import SimExchange
+from strategie.BaseStrategy import BaseStrategy
+from strategie.sigma_spot import SigmaSpotStrategy
+from utils import indicators
+from utils.indicators import StreamingMACD
+from utils.ledger_db import SqliteTradeLedger
+from utils.state import PositionState, StateStore, TradeLedger
+from benchmarks.runner import benchmark
+
+SYMBOL = "ETH/USDT"
+LEDGER_ROWS = 100_000
+
+
+def _closes(n: int = 200, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 100.0 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+
+
+def _recent_candles(n: int = 260):
+    # 最后一根落在当前分钟，策略的增量同步走 since 分支，和线上稳态一致
+    closes = _closes(n)
+    last = int(time.time() * 1000) // 60_000 * 60_000
+    opens = np.concatenate([[closes[0]], closes[:-1]])
+    return [[last - (n - 1 - i) * 60_000, float(o), float(max(o, c)), float(min(o, c)), float(c), 10.0]
+            for i, (o, c) in enumerate(zip(opens, closes))]
+
+
+def _quiet_logger():
+    logger = logging.getLogger("bench")
+    logger.propagate = False
+    if not logger.handlers:
+        logger.addHandler(logging.NullHandler())
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def _settings(workdir: str, **kw) -> Settings:
+    return Settings(dry_run=False, candle_store_dir="", data_dir=workdir, **kw)
+
+
+def _sim_with_candles() -> SimExchange:
+    sim = SimExchange(balances={"USDT": 1_000_000.0})
+    sim.replay_candles(SYMBOL, "1m", _recent_candles())
+    return sim
+
+
+@benchmark("indicators.ema_fallback_200")
+def _ema(workdir):
+    closes = _closes()
+    return lambda: indicators._ema(closes, 12)
+
+
+@benchmark("indicators.macd_cross_golden_fallback_200")
+def _macd_fallback(workdir):
+    closes = _closes()
+    saved = indicators.talib
+    indicators.talib = None
+
+    def teardown():
+        indicators.talib = saved
+    return (lambda: indicators.macd_cross_golden(closes)), teardown
+
+
+@benchmark("indicators.macd_cross_golden_talib_200", skip=lambda: "" if indicators.talib is not None else "TA-Lib not installed")
+def _macd_talib(workdir):
+    closes = _closes()
+    return lambda: indicators.macd_cross_golden(closes)
+
+
+@benchmark("indicators.streaming_macd_tick")
+def _streaming_macd(workdir):
+    closes = _closes()
+    m = StreamingMACD()
+    m.seed(closes)
+    last = float(closes[-1])
+
+    def fn():
+        m.replace_last(last)
+        return m.golden_cross()
+    return fn
+
+
+@benchmark("strategy.update_ohlcv_cache")
+def _update_ohlcv(workdir):
+    st = BaseStrategy(_sim_with_candles(), _settings(workdir), _quiet_logger())
+    st._update_ohlcv_cache()
+    return st._update_ohlcv_cache
+
+
+@benchmark("strategy.sigma_tick")
+def _sigma_tick(workdir):
+    st = SigmaSpotStrategy(_sim_with_candles(), _settings(workdir), _quiet_logger())
+    st.tick()
+
+    def teardown():
+        st.store.close()
+    return st.tick, teardown
+
+
+def _write_ledger_csv(path: str, rows: int = LEDGER_ROWS):
+    rng = np.random.default_rng(5)
+    prices = 100.0 + rng.normal(0, 1, rows)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["time", "side", "symbol", "price", "amount", "fee", "order_id"])
+        for i in range(rows):
+            w.writerow([1_700_000_000_000 + i, "buy" if i % 3 else "sell", SYMBOL if i % 5 else "BTC/USDT", f"{prices[i]:.2f}", "0.01", "0", f"o{i}"])
+
+
+@benchmark("ledger.csv_rebuild_position_100k")
+def _ledger_csv(workdir):
+    ledger = TradeLedger(_settings(workdir))
+    _write_ledger_csv(ledger.path)
+    return lambda: ledger.rebuild_position(SYMBOL)
+
+
+@benchmark("ledger.sqlite_rebuild_position_100k")
+def _ledger_sqlite(workdir):
+    csv_path = os.path.join(workdir, "trades.csv")
+    _write_ledger_csv(csv_path)
+    ledger = SqliteTradeLedger(_settings(workdir))
+    ledger.import_csv(csv_path)
+    return (lambda: ledger.rebuild_position(SYMBOL)), ledger.close
+
+
+@benchmark("state.save")
+def _state_save(workdir):
+    store = StateStore(_settings(workdir))
+    state = PositionState()
+
+    def fn():
+        state.buy_count += 1
+        store.save(state)
+    return fn, store.close
+
+
+@benchmark("state.save_flush")
+def _state_save_flush(workdir):
+    store = StateStore(_settings(workdir))
+    state = PositionState()
+
+    def fn():
+        state.buy_count += 1
+        store.save(state)
+        store.flush()
+    return fn, store.close
+
+
+@benchmark("state.load")
+def _state_load(workdir):
+    settings = _settings(workdir)
+    store = StateStore(settings)
+    state = PositionState(base_amount=1.5, avg_cost=2000.0)
+    for i in range(100):
+        state.buy_count = i
+        store.save(state)
+    store.close()
+    return lambda: StateStore(settings).load()
+
+
+@benchmark("okx.normalize_order_amount")
+def _normalize(workdir):
+    client = OkxClient.__new__(OkxClient)
+    client.exchange = ccxt.okx({})
+    client.exchange.set_markets([{
+        "id": "ETH-USDT", "symbol": SYMBOL, "base": "ETH", "quote": "USDT", "baseId": "ETH", "quoteId": "USDT",
+        "type": "spot", "spot": True, "active": True,
+        "precision": {"amount": 1e-6, "price": 0.01},
+        "limits": {"amount": {"min": 0.0001}, "cost": {"min": 1.0}},
+    }])
+    client.rules = build_rules(client.exchange.markets)
+    return lambda: client._normalize_order_amount(SYMBOL, 0.0123456789, 2000.0)
+
+
+@benchmark("sim.on_trade_with_resting_orders")
+def _sim_on_trade(workdir):
+    sim = SimExchange(balances={"USDT": 1e12, "ETH": 1e9})
+    sim.on_trade(SYMBOL, 0, 100.0)
+    for i in range(100):
+        sim.create_limit_buy(SYMBOL, 0.05, 99.0 - i * 0.01)
+        sim.create_limit_sell(SYMBOL, 0.05, 101.0 + i * 0.01)
+    ts = [1]
+
+    def fn():
+        ts[0] += 1
+        sim.on_trade(SYMBOL, ts[0], 100.0, 0.01)
+    return fn
@@ -1,5 +1,7 @@
+import copy
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from typing import Any, Dict
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,10 +23,17 @@ class Settings:
     https_proxy: str = os.getenv("HTTPS_PROXY", "")
     testnet: bool = os.getenv("OKX_TESTNET", "false").lower() == "true"
     timeout_ms: int = int(os.getenv("TIMEOUT_MS", "10000"))
+    rate_limit_scheduler: bool = os.getenv("RATE_LIMIT_SCHEDULER", "false").lower() == "true"  # per-endpoint buckets instead of ccxt's global throttle
+    max_inflight_requests: int = int(os.getenv("MAX_INFLIGHT_REQUESTS", "8"))
+    markets_cache_file: str = os.getenv("MARKETS_CACHE_FILE", os.path.join("data", "markets.json"))  # empty = always load from the exchange
+    markets_ttl_sec: int = int(os.getenv("MARKETS_TTL_SEC", "3600"))
     dry_run: bool = os.getenv("DRY_RUN", "true").lower() == "true"
     simulated_env: bool = os.getenv("SIMULATED_ENV", "false").lower() == "true"
     order_type: str = os.getenv("ORDER_TYPE", "market").lower()  # market or limit
     limit_slippage_pct: float = float(os.getenv("LIMIT_SLIPPAGE_PCT", "0.0005"))
+    order_timeout_sec: int = int(os.getenv("ORDER_TIMEOUT_SEC", "120"))  # live limit orders older than this get repriced/canceled, 0 = never
+    order_stale_action: str = os.getenv("ORDER_STALE_ACTION", "reprice").lower()  # reprice or cancel
+    order_max_reprices: int = int(os.getenv("ORDER_MAX_REPRICES", "3"))  # canceled after this many reprices
     reset_state_on_start: bool = os.getenv("RESET_STATE_ON_START", "false").lower() == "true"
     sigma_buy_base_eth: float = float(os.getenv("SIGMA_BUY_BASE_ETH", "0.000003"))
     sigma_max_adds: int = int(os.getenv("SIGMA_MAX_ADDS", "100"))
@@ -33,6 +42,22 @@ class Settings:
     sigma_sell_profit_pct: float = float(os.getenv("SIGMA_SELL_PROFIT_PCT", "0.01"))
     sigma_sell_leave_base_eth: float = float(os.getenv("SIGMA_SELL_LEAVE_BASE_ETH", "0.000003"))
     sigma_macd_timeframe: str = os.getenv("SIGMA_MACD_TIMEFRAME", "1m")
+    sigma_ladder_levels: int = int(os.getenv("SIGMA_LADDER_LEVELS", "0"))  # resting add levels kept on the book while in position, 0 = react per tick
+    snapshot_max_age_ms: int = int(os.getenv("SNAPSHOT_MAX_AGE_MS", "2000"))
+    candle_store_dir: str = os.getenv("CANDLE_STORE_DIR", os.path.join("data", "candles"))
+    data_dir: str = os.getenv("DATA_DIR", "data")
+    state_durability: str = os.getenv("STATE_DURABILITY", "batch").lower()  # fsync, batch or none
+    state_fsync_interval_ms: int = int(os.getenv("STATE_FSYNC_INTERVAL_MS", "1000"))
+    metrics_port: int = int(os.getenv("METRICS_PORT", "0"))  # 0 = disabled
+    metrics_host: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    record_file: str = os.getenv("RECORD_FILE", "")  # record exchange I/O for offline replay, empty = disabled
+    trace_buffer: int = int(os.getenv("TRACE_BUFFER", "0"))  # spans kept in memory, 0 = disabled
+    trace_file: str = os.getenv("TRACE_FILE", os.path.join("logs", "trace.json"))
+    log_format: str = os.getenv("LOG_FORMAT", "text").lower()  # text or json
+    log_rate_limit_sec: float = float(os.getenv("LOG_RATE_LIMIT_SEC", "60"))
+    ledger_backend: str = os.getenv("LEDGER_BACKEND", "csv").lower()  # csv or sqlite
+    ws_enabled: bool = os.getenv("WS_ENABLED", "false").lower() == "true"
+    async_runtime: bool = os.getenv("ASYNC_RUNTIME", "false").lower() == "true"
 
     def __post_init__(self):
         print(self.testnet)
@@ -44,3 +69,26 @@ class Settings:
         else:
             self.dry_run = False
             self.testnet = False
+
+
+def coerce_setting(kind: Any, value: Any) -> Any:
+    if kind is bool and isinstance(value, str):
+        return value.lower() == "true"
+    if kind in (bool, int):
+        return kind(float(value))
+    if kind is float:
+        return float(value)
+    if kind is str:
+        return str(value)
+    return value
+
+
+def with_overrides(base: Settings, overrides: Dict[str, Any]) -> Settings:
+    # copy 而不是 dataclasses.replace，避免每份配置都再跑一遍 Settings.__post_init__
+    known = {f.name: f for f in fields(Settings)}
+    s = copy.copy(base)
+    for name, value in overrides.items():
+        if name not in known:
+            raise ValueError(f"unknown settings field: {name}")
+        setattr(s, name, coerce_setting(known[name].type, value))
+    return s
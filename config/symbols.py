@@ -0,0 +1,45 @@
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from config.settings import Settings, with_overrides
+
+
+@dataclass
+class SymbolConfig:
+    symbol: str
+    strategy: str
+    settings: Settings
+
+
+def symbol_data_dir(root: str, symbol: str) -> str:
+    return os.path.join(root, symbol.replace("/", "-"))
+
+
+def load_symbol_configs(path: str, base: Optional[Settings] = None, default_strategy: str = "sigma") -> List[SymbolConfig]:
+    """
+    多交易对配置文件，格式：
+    {"defaults": {"poll_interval_sec": 30},
+     "symbols": ["BTC/USDT", {"symbol": "ETH/USDT", "strategy": "martingale", "sigma_buy_base_eth": 0.001}]}
+    每个交易对在 defaults 之上叠加自己的覆盖项；状态和账本放到 data_dir/<symbol>/ 下，互不覆盖
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+    base = base or Settings()
+    defaults: Dict[str, Any] = dict(doc.get("defaults") or {})
+    default_strategy = defaults.pop("strategy", default_strategy)
+    shared = with_overrides(base, defaults)
+    configs = []
+    seen = set()
+    for entry in doc.get("symbols") or []:
+        overrides = {"symbol": entry} if isinstance(entry, str) else dict(entry)
+        symbol = overrides.get("symbol")
+        if not symbol:
+            raise ValueError(f"symbol entry without symbol: {entry}")
+        if symbol in seen:
+            raise ValueError(f"duplicate symbol: {symbol}")
+        seen.add(symbol)
+        strategy = overrides.pop("strategy", default_strategy)
+        overrides.setdefault("data_dir", symbol_data_dir(shared.data_dir, symbol))
+        configs.append(SymbolConfig(symbol=symbol, strategy=strategy, settings=with_overrides(shared, overrides)))
+    return configs
@@ -0,0 +1,122 @@
+import asyncio
+import contextvars
+import functools
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from core.exchange_base import IExchange
+
+
+class IAsyncExchange(ABC):
+    @abstractmethod
+    async def load_markets(self) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    async def fetch_ohlcv(self, symbol: str, timeframe: str, since: Optional[int] = None, limit: Optional[int] = None) -> List[List[float]]:
+        pass
+
+    @abstractmethod
+    async def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    async def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    async def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    async def create_limit_buy(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    async def create_limit_sell(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    async def fetch_balance(self) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    async def fetch_my_trades(self, symbol: str, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def create_limit_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def cancel_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def amend_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        pass
+
+
+class AsyncExchangeAdapter(IAsyncExchange):
+    """
+    把同步 IExchange 包成 IAsyncExchange：每个调用丢到线程池里执行，
+    多个请求可以用 asyncio.gather 同时发出，总耗时约等于最慢的那一个
+    """
+
+    def __init__(self, exchange: IExchange, max_workers: int = 8, order_workers: int = 2):
+        self.exchange = exchange
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="exchange")
+        # 下单单独一个线程池：读请求在限频器里排队占满线程时，下单不用等线程
+        self._order_executor = ThreadPoolExecutor(max_workers=order_workers, thread_name_prefix="exchange-order")
+
+    async def _run(self, executor, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # 和 asyncio.to_thread 一样带上当前 context，线程里的追踪 span 能挂到调用方的 trace 下
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+    async def _call(self, fn, *args, **kwargs):
+        return await self._run(self._executor, fn, *args, **kwargs)
+
+    async def _order(self, fn, *args, **kwargs):
+        return await self._run(self._order_executor, fn, *args, **kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self._order_executor.shutdown(wait=False)
+
+    async def load_markets(self) -> Dict[str, Any]:
+        return await self._call(self.exchange.load_markets)
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str, since: Optional[int] = None, limit: Optional[int] = None) -> List[List[float]]:
+        return await self._call(self.exchange.fetch_ohlcv, symbol, timeframe, since, limit)
+
+    async def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        return await self._call(self.exchange.fetch_ticker, symbol)
+
+    async def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return await self._order(self.exchange.create_market_buy, symbol, quote_cost, params, ref_price=ref_price)
+
+    async def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return await self._order(self.exchange.create_market_sell, symbol, base_amount, params, ref_price=ref_price)
+
+    async def create_limit_buy(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self._order(self.exchange.create_limit_buy, symbol, base_amount, price, params)
+
+    async def create_limit_sell(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self._order(self.exchange.create_limit_sell, symbol, base_amount, price, params)
+
+    async def fetch_balance(self) -> Dict[str, Any]:
+        return await self._call(self.exchange.fetch_balance)
+
+    async def fetch_my_trades(self, symbol: str, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        return await self._call(self.exchange.fetch_my_trades, symbol, since)
+
+    async def create_limit_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return await self._order(self.exchange.create_limit_orders, orders)
+
+    async def cancel_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return await self._order(self.exchange.cancel_orders, orders)
+
+    async def amend_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return await self._order(self.exchange.amend_orders, orders)
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional
+import ccxt
 
 class IExchange(ABC):
     @abstractmethod
@@ -15,11 +16,11 @@ class IExchange(ABC):
         pass
 
     @abstractmethod
-    def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
         pass
 
     @abstractmethod
-    def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
         pass
 
     @abstractmethod
@@ -37,3 +38,61 @@ class IExchange(ABC):
     @abstractmethod
     def fetch_my_trades(self, symbol: str, since: Optional[int] = None) -> List[Dict[str, Any]]:
         pass
+
+    # ---------- 单笔查单/撤单/改单 ----------
+    # 不支持的交易所抛 ccxt.NotSupported
+
+    def fetch_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        raise ccxt.NotSupported(f"{type(self).__name__} does not support fetch_order")
+
+    def fetch_open_orders(self, symbol: str) -> List[Dict[str, Any]]:
+        raise ccxt.NotSupported(f"{type(self).__name__} does not support fetch_open_orders")
+
+    def cancel_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        raise ccxt.NotSupported(f"{type(self).__name__} does not support cancel_order")
+
+    def amend_order(self, order_id: str, symbol: str, amount: Optional[float] = None, price: Optional[float] = None) -> Dict[str, Any]:
+        """amount 为新的总数量；订单号不变"""
+        raise ccxt.NotSupported(f"{type(self).__name__} does not support amend_order")
+
+    # ---------- 批量下单/撤单/改单 ----------
+    # 结果与请求一一对应；某一笔失败时该位置是 status="rejected" 并带 error，不影响其它笔。
+    # 默认逐笔调用单笔接口，支持批量接口的交易所（OkxClient）覆盖成一次请求
+
+    def create_limit_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """orders: [{"symbol", "side", "amount", "price", "params"(可选)}]，只支持限价单"""
+        out = []
+        for o in orders:
+            fn = self.create_limit_buy if o["side"] == "buy" else self.create_limit_sell
+            try:
+                out.append(fn(o["symbol"], o["amount"], o["price"], o.get("params")))
+            except Exception as e:
+                out.append(rejected(o, e))
+        return out
+
+    def cancel_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """orders: [{"id", "symbol"}]"""
+        out = []
+        for o in orders:
+            try:
+                out.append(self.cancel_order(o["id"], o["symbol"]))
+            except Exception as e:
+                out.append(rejected(o, e))
+        return out
+
+    def amend_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """orders: [{"id", "symbol", "price"(可选), "amount"(可选，新的总数量)}]；订单号不变"""
+        out = []
+        for o in orders:
+            try:
+                out.append(self.amend_order(o["id"], o["symbol"], o.get("amount"), o.get("price")))
+            except Exception as e:
+                out.append(rejected(o, e))
+        return out
+
+
+def rejected(request: Dict[str, Any], error: Any) -> Dict[str, Any]:
+    """批量接口里失败的那一笔；error 为异常或 (异常类名, 信息)"""
+    name, msg = (type(error).__name__, str(error)) if isinstance(error, BaseException) else error
+    return {"id": request.get("id"), "symbol": request.get("symbol"), "side": request.get("side"),
+            "status": "rejected", "error": f"{name}: {msg}", "errorType": name}
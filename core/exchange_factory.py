@@ -1,6 +1,8 @@
-from typing import Any, Dict, Optional
+from typing import Dict, List, Optional
 from core.exchange_base import IExchange
 from core.okx_client import OkxClient
+from core.okx_ws_client import OkxStreamClient
+from core.rate_limiter import RateLimitedExchange, RequestScheduler
 from core.simulated_client import SimulatedClient
 
 class ExchangeFactory:
@@ -15,17 +17,32 @@ class ExchangeFactory:
         enable_rate_limit: bool = True,
         timeout_ms: int = 10000,
         simulated_env: bool = False,
+        stream_symbols: Optional[List[str]] = None,
+        stream_timeframes: Optional[List[str]] = None,
+        rate_limit_scheduler: bool = False,
+        max_inflight: int = 8,
+        markets_cache_path: str = "",
+        markets_ttl_sec: float = 3600.0,
     ) -> IExchange:
         if simulated_env:
             return SimulatedClient()
         if name.lower() == "okx":
-            return OkxClient(
+            rest = OkxClient(
                 api_key=api_key,
                 secret=secret,
                 password=password,
                 proxies=proxies or {},
                 testnet=testnet,
-                enable_rate_limit=enable_rate_limit,
+                # 调度器按接口限频，ccxt 自带的全局节流会把所有请求串成一队，两者只开一个
+                enable_rate_limit=enable_rate_limit and not rate_limit_scheduler,
                 timeout_ms=timeout_ms,
+                markets_cache_path=markets_cache_path,
+                markets_ttl_sec=markets_ttl_sec,
             )
+            if rate_limit_scheduler:
+                rest = RateLimitedExchange(rest, RequestScheduler(max_inflight=max_inflight))
+            if not stream_symbols:
+                return rest
+            proxy = (proxies or {}).get("https") or (proxies or {}).get("http")
+            return OkxStreamClient(rest, stream_symbols, stream_timeframes, proxy=proxy).start()
         raise ValueError("unsupported exchange")
@@ -0,0 +1,299 @@
+import atexit
+import collections
+import functools
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+import ccxt
+from core.exchange_base import IExchange
+
+MAGIC = b"CQXR\x01"
+# flags, len(method), 开始时间(unix 秒), 耗时(秒), len(payload)
+_HEAD = struct.Struct("<BBdfI")
+_ERROR = 1
+
+
+@dataclass
+class ExchangeCall:
+    method: str
+    args: List[Any]
+    kwargs: Dict[str, Any]
+    result: Any
+    error: Optional[Tuple[str, str]]
+    started: float
+    duration: float
+
+
+class ReplayError(Exception):
+    pass
+
+
+def _encode(call_args, kwargs, result, error) -> bytes:
+    d: Dict[str, Any] = {"a": call_args}
+    if kwargs:
+        d["k"] = kwargs
+    if error is None:
+        d["r"] = result
+    else:
+        d["e"] = error
+    return json.dumps(d, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class _RecordWriter:
+    """
+    记录文件 = MAGIC + 一条 zlib 流；每条记录是定长头 + 方法名 + JSON 负载。
+    每 flush_every 条做一次 Z_SYNC_FLUSH 落到文件，进程被杀时最多丢最后不满一批的记录
+    """
+
+    def __init__(self, path: str, flush_every: int = 64):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.flush_every = flush_every
+        self._f = open(path, "wb")
+        self._f.write(MAGIC)
+        self._z = zlib.compressobj(6)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def write(self, method: str, started: float, duration: float, payload: bytes, error: bool):
+        name = method.encode("ascii")
+        head = _HEAD.pack(_ERROR if error else 0, len(name), started, duration, len(payload))
+        with self._lock:
+            if self._f is None:
+                return
+            self._f.write(self._z.compress(head + name + payload))
+            self.count += 1
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._f.write(self._z.flush(zlib.Z_SYNC_FLUSH))
+                self._f.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._f is None:
+                return
+            self._f.write(self._z.flush())
+            self._f.close()
+            self._f = None
+
+
+def read_recording(path: str) -> Iterator[ExchangeCall]:
+    """按记录顺序读出所有调用；文件尾部被截断时读到最后一条完整记录为止"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ReplayError(f"{path}: not an exchange recording")
+    raw = zlib.decompressobj().decompress(data[len(MAGIC):])
+    pos, n = 0, len(raw)
+    while pos + _HEAD.size <= n:
+        flags, name_len, started, duration, payload_len = _HEAD.unpack_from(raw, pos)
+        start = pos + _HEAD.size
+        end = start + name_len + payload_len
+        if end > n:
+            return
+        method = raw[start:start + name_len].decode("ascii")
+        d = json.loads(raw[start + name_len:end])
+        err = d.get("e")
+        yield ExchangeCall(method, d.get("a", []), d.get("k", {}), d.get("r"), tuple(err) if err else None, started, duration)
+        pos = end
+
+
+class RecordingExchange(IExchange):
+    """
+    包在任意 IExchange 外面，把每次请求的参数、返回值或异常和起止时间写进记录文件；
+    线程安全，可以放在 AsyncExchangeAdapter 下面。IExchange 以外的公开方法同样会被记录
+    """
+
+    def __init__(self, exchange: IExchange, path: str, flush_every: int = 64):
+        self.exchange = exchange
+        self.writer = _RecordWriter(path, flush_every)
+        atexit.register(self.close)
+
+    def close(self):
+        self.writer.close()
+
+    def _call(self, method: str, *args, **kwargs):
+        started = time.time()
+        t0 = time.perf_counter()
+        try:
+            result = getattr(self.exchange, method)(*args, **kwargs)
+        except Exception as e:
+            self.writer.write(method, started, time.perf_counter() - t0, _encode(list(args), kwargs, None, [type(e).__name__, str(e)]), True)
+            raise
+        self.writer.write(method, started, time.perf_counter() - t0, _encode(list(args), kwargs, result, None), False)
+        return result
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.exchange, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        return functools.partial(self._call, name)
+
+    def load_markets(self) -> Dict[str, Any]:
+        return self._call("load_markets")
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str, since: Optional[int] = None, limit: Optional[int] = None) -> List[List[float]]:
+        return self._call("fetch_ohlcv", symbol, timeframe, since, limit)
+
+    def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        return self._call("fetch_ticker", symbol)
+
+    def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return self._call("create_market_buy", symbol, quote_cost, params, ref_price=ref_price)
+
+    def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return self._call("create_market_sell", symbol, base_amount, params, ref_price=ref_price)
+
+    def create_limit_buy(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._call("create_limit_buy", symbol, base_amount, price, params)
+
+    def create_limit_sell(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._call("create_limit_sell", symbol, base_amount, price, params)
+
+    def fetch_balance(self) -> Dict[str, Any]:
+        return self._call("fetch_balance")
+
+    def fetch_my_trades(self, symbol: str, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._call("fetch_my_trades", symbol, since)
+
+    def fetch_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        return self._call("fetch_order", order_id, symbol)
+
+    def fetch_open_orders(self, symbol: str) -> List[Dict[str, Any]]:
+        return self._call("fetch_open_orders", symbol)
+
+    def cancel_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        return self._call("cancel_order", order_id, symbol)
+
+    def amend_order(self, order_id: str, symbol: str, amount: Optional[float] = None, price: Optional[float] = None) -> Dict[str, Any]:
+        return self._call("amend_order", order_id, symbol, amount, price)
+
+    def create_limit_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("create_limit_orders", orders)
+
+    def cancel_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("cancel_orders", orders)
+
+    def amend_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("amend_orders", orders)
+
+
+def _error_class(name: str):
+    cls = getattr(ccxt, name, None)
+    if isinstance(cls, type) and issubclass(cls, Exception):
+        return cls
+    return None
+
+
+class ReplayExchange(IExchange):
+    """
+    按记录文件回放交易所响应，不访问网络：
+    - match="method"（默认）：同一方法、同一交易对按记录顺序依次返回，不比较其余参数；since/limit 依赖当前时间时也能回放
+    - match="args"：方法和参数都一致的请求按记录顺序返回，找不到就抛 ReplayError
+    latency=True 时按记录的耗时 * latency_scale 睡眠，重现原来的请求耗时；记录下来的异常原样抛出（ccxt 异常还原成同一类型）
+    """
+
+    def __init__(self, path: str, match: str = "method", latency: bool = False, latency_scale: float = 1.0):
+        if match not in ("method", "args"):
+            raise ValueError(f"unsupported match mode: {match}")
+        self.match = match
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._queues: Dict[Any, Deque[ExchangeCall]] = collections.defaultdict(collections.deque)
+        self.calls = list(read_recording(path))
+        self._methods = {c.method for c in self.calls}
+        for c in self.calls:
+            self._queues[self._key(c.method, c.args, c.kwargs)].append(c)
+        self.served = 0
+
+    def _key(self, method: str, args, kwargs):
+        if self.match == "method":
+            # 按交易对分队列：多个交易对并发时各自的请求顺序仍然确定
+            return method, args[0] if args and isinstance(args[0], str) else ""
+        # 记录里的参数是 JSON 读回来的，用同样的 JSON 串比较，tuple/list 的差异不影响匹配
+        return method, json.dumps([list(args), kwargs], sort_keys=True, separators=(",", ":"), default=str)
+
+    def remaining(self, method: Optional[str] = None) -> int:
+        with self._lock:
+            if method is None:
+                return sum(len(q) for q in self._queues.values())
+            return sum(len(q) for k, q in self._queues.items() if k[0] == method)
+
+    def _serve(self, method: str, *args, **kwargs):
+        key = self._key(method, args, kwargs)
+        with self._lock:
+            q = self._queues.get(key)
+            if not q:
+                raise ReplayError(f"no recorded response left for {method}{tuple(args)}")
+            c = q.popleft()
+            self.served += 1
+        if self.latency and c.duration > 0:
+            time.sleep(c.duration * self.latency_scale)
+        if c.error is not None:
+            name, msg = c.error
+            cls = _error_class(name)
+            if cls is not None:
+                raise cls(msg)
+            raise ReplayError(f"{name}: {msg}")
+        return c.result
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") or name not in self._methods:
+            raise AttributeError(name)
+        return functools.partial(self._serve, name)
+
+    def load_markets(self) -> Dict[str, Any]:
+        return self._serve("load_markets")
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str, since: Optional[int] = None, limit: Optional[int] = None) -> List[List[float]]:
+        return self._serve("fetch_ohlcv", symbol, timeframe, since, limit)
+
+    def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        return self._serve("fetch_ticker", symbol)
+
+    def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return self._serve("create_market_buy", symbol, quote_cost, params, ref_price=ref_price)
+
+    def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return self._serve("create_market_sell", symbol, base_amount, params, ref_price=ref_price)
+
+    def create_limit_buy(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._serve("create_limit_buy", symbol, base_amount, price, params)
+
+    def create_limit_sell(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._serve("create_limit_sell", symbol, base_amount, price, params)
+
+    def fetch_balance(self) -> Dict[str, Any]:
+        return self._serve("fetch_balance")
+
+    def fetch_my_trades(self, symbol: str, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._serve("fetch_my_trades", symbol, since)
+
+    def fetch_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        return self._serve("fetch_order", order_id, symbol)
+
+    def fetch_open_orders(self, symbol: str) -> List[Dict[str, Any]]:
+        return self._serve("fetch_open_orders", symbol)
+
+    def cancel_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        return self._serve("cancel_order", order_id, symbol)
+
+    def amend_order(self, order_id: str, symbol: str, amount: Optional[float] = None, price: Optional[float] = None) -> Dict[str, Any]:
+        return self._serve("amend_order", order_id, symbol, amount, price)
+
+    def create_limit_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._serve("create_limit_orders", orders)
+
+    def cancel_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._serve("cancel_orders", orders)
+
+    def amend_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._serve("amend_orders", orders)
@@ -0,0 +1,55 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from core.exchange_base import IExchange
+
+
+@dataclass
+class MarketSnapshot:
+    symbol: str
+    last: float
+    bid: float
+    ask: float
+    captured_at: float
+
+    def age_ms(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        return (now - self.captured_at) * 1000.0
+
+
+class MarketSnapshotProvider:
+    """
+    每个 tick 只取一次 ticker：capture() 强制刷新，get() 在 max_age_ms 以内直接复用上一次的快照
+    """
+
+    def __init__(self, exchange: IExchange, max_age_ms: int):
+        self.exchange = exchange
+        self.max_age_ms = max_age_ms
+        self._snapshots: Dict[str, MarketSnapshot] = {}
+
+    def capture(self, symbol: str) -> MarketSnapshot:
+        return self.update(symbol, self.exchange.fetch_ticker(symbol))
+
+    def update(self, symbol: str, t: Dict[str, Any]) -> MarketSnapshot:
+        last = float(t.get("last") or 0.0)
+        snap = MarketSnapshot(
+            symbol=symbol,
+            last=last,
+            bid=float(t.get("bid") or last),
+            ask=float(t.get("ask") or last),
+            captured_at=time.monotonic(),
+        )
+        self._snapshots[symbol] = snap
+        return snap
+
+    def get(self, symbol: str) -> MarketSnapshot:
+        snap = self._snapshots.get(symbol)
+        if snap is None or snap.age_ms() > self.max_age_ms:
+            return self.capture(symbol)
+        return snap
+
+    def invalidate(self, symbol: Optional[str] = None):
+        if symbol is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(symbol, None)
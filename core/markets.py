@@ -0,0 +1,153 @@
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+def _decimals(step: float) -> int:
+    if step <= 0:
+        return 12
+    return max(0, int(math.ceil(-math.log10(step) - 1e-9)))
+
+
+class MarketRules:
+    """某个交易对的精度和最小下单规则，取自 ccxt 格式的 market（precision 为步长，与 OKX 一致）"""
+
+    __slots__ = ("base", "quote", "amount_step", "price_step", "amount_dp", "price_dp", "min_amount", "min_cost")
+
+    def __init__(self, symbol: str, m: Dict[str, Any]):
+        self.base, _, self.quote = symbol.partition("/")
+        prec = m.get("precision") or {}
+        limits = m.get("limits") or {}
+        self.amount_step = float(prec.get("amount") or 0.0)
+        self.price_step = float(prec.get("price") or 0.0)
+        self.amount_dp = _decimals(self.amount_step)
+        self.price_dp = _decimals(self.price_step)
+        self.min_amount = float((limits.get("amount") or {}).get("min") or 0.0)
+        self.min_cost = float((limits.get("cost") or {}).get("min") or 0.0)
+
+    @property
+    def complete(self) -> bool:
+        return self.amount_step > 0 and self.price_step > 0
+
+    def amount_floor(self, x: float) -> float:
+        if self.amount_step <= 0:
+            return x
+        return round(math.floor(x / self.amount_step + 1e-9) * self.amount_step, self.amount_dp)
+
+    def amount_ceil(self, x: float) -> float:
+        if self.amount_step <= 0:
+            return x
+        return round(math.ceil(x / self.amount_step - 1e-9) * self.amount_step, self.amount_dp)
+
+    def price_round(self, x: float) -> float:
+        if self.price_step <= 0:
+            return x
+        return round(round(x / self.price_step) * self.price_step, self.price_dp)
+
+    def normalize(self, amount: float, price: float) -> float:
+        """补到最小数量/最小金额，再按步长截断；按最小金额补出来的数量向上取整，截断后仍满足最小金额"""
+        amt = float(amount)
+        if self.min_amount and amt < self.min_amount:
+            amt = self.min_amount
+        if self.min_cost and price > 0 and amt * price < self.min_cost:
+            return self.amount_ceil(self.min_cost / price)
+        return self.amount_floor(amt)
+
+
+def build_rules(markets: Dict[str, Dict[str, Any]]) -> Dict[str, MarketRules]:
+    """交易对 -> MarketRules；缺步长的 market 不进表，下单时按缺少规则处理"""
+    rules = {}
+    for symbol, m in (markets or {}).items():
+        r = MarketRules(symbol, m)
+        if r.complete:
+            rules[symbol] = r
+    return rules
+
+
+class MarketsCache:
+    """
+    markets 元数据的磁盘缓存。load() 有文件就直接用（过期也先用着，由后台线程刷新），没有文件才同步拉取；
+    start() 起后台线程，每过 ttl_sec 重新拉一次并写回文件，拉取失败时保留旧数据，稍后重试
+    """
+
+    def __init__(self, path: str, ttl_sec: float, fetch: Callable[[], Dict[str, Any]], retry_sec: float = 60.0):
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.fetch = fetch
+        self.retry_sec = retry_sec
+        self.saved_at = 0.0
+        self.failed_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def age(self) -> float:
+        return time.time() - self.saved_at if self.saved_at else float("inf")
+
+    def read(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                d = json.load(f)
+            markets = d.get("markets") or {}
+            self.saved_at = float(d.get("saved_at") or 0.0) if markets else 0.0
+            return markets
+        except Exception:
+            os.replace(self.path, f"{self.path}.corrupt-{int(time.time())}")
+            return {}
+
+    def write(self, markets: Dict[str, Any]):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        saved_at = time.time()
+        tmp = self.path + ".tmp"
+        with self._lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"saved_at": saved_at, "markets": markets}, f, ensure_ascii=False, separators=(",", ":"), default=str)
+            os.replace(tmp, self.path)
+            self.saved_at = saved_at
+
+    def refresh(self) -> Dict[str, Any]:
+        try:
+            markets = self.fetch()
+        except Exception:
+            self.failed_at = time.time()
+            raise
+        if markets:
+            self.write(markets)
+        else:
+            self.failed_at = time.time()
+        return markets
+
+    def load(self) -> Dict[str, Any]:
+        markets = self.read()
+        if markets:
+            return markets
+        try:
+            return self.refresh()
+        except Exception:
+            return {}
+
+    def _run(self, on_update: Callable[[Dict[str, Any]], None]):
+        while not self._stop.is_set():
+            wait = max(self.ttl_sec - self.age(), self.retry_sec - (time.time() - self.failed_at))
+            if wait > 0:
+                self._stop.wait(wait)
+                continue
+            try:
+                markets = self.refresh()
+            except Exception:
+                markets = {}
+            if markets:
+                on_update(markets)
+
+    def start(self, on_update: Callable[[Dict[str, Any]], None]) -> "MarketsCache":
+        self._thread = threading.Thread(target=self._run, args=(on_update,), name="markets-refresh", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -1,7 +1,16 @@
+import os
+import threading
 import time
 from typing import Any, Dict, List, Optional
 import ccxt
-from core.exchange_base import IExchange
+from core.exchange_base import IExchange, rejected
+from core.markets import MarketRules, MarketsCache, build_rules
+from utils.tracing import TRACER
+
+# 缺少某个交易对的规则时，下单前最多这么久同步重拉一次 markets
+MARKETS_RELOAD_INTERVAL_SEC = 30.0
+# OKX 批量下单/撤单/改单每次最多 20 笔
+OKX_BATCH_SIZE = 20
 
 class OkxClient(IExchange):
     def __init__(
@@ -13,6 +22,8 @@ class OkxClient(IExchange):
         testnet: bool,
         enable_rate_limit: bool,
         timeout_ms: int,
+        markets_cache_path: str = "",
+        markets_ttl_sec: float = 3600.0,
     ):
         params = {
             "apiKey": api_key,
@@ -26,11 +37,57 @@ class OkxClient(IExchange):
         self.exchange = ccxt.okx(params)
         if testnet:
             self.exchange.setSandboxMode(True)
+        self.rules: Dict[str, MarketRules] = {}
+        self._markets_lock = threading.Lock()
+        self._last_reload = 0.0
+        self.markets_cache: Optional[MarketsCache] = None
+        if markets_cache_path:
+            if testnet:
+                root, ext = os.path.splitext(markets_cache_path)
+                markets_cache_path = f"{root}-testnet{ext}"
+            # 启动时读磁盘缓存，过期的由后台线程刷新；没有缓存才同步拉取
+            self.markets_cache = MarketsCache(markets_cache_path, markets_ttl_sec, self._fetch_markets)
+            self._use_markets(self.markets_cache.load())
+            self.markets_cache.start(self._use_markets)
+        else:
+            try:
+                self._use_markets(self._fetch_markets())
+            except Exception:
+                pass
+
+    def _fetch_markets(self) -> Dict[str, Any]:
+        return self.exchange.load_markets(True)
+
+    def _use_markets(self, markets: Dict[str, Any]):
+        if not markets:
+            return
+        with self._markets_lock:
+            if markets is not self.exchange.markets:
+                self.exchange.set_markets(markets)
+            self.rules = build_rules(self.exchange.markets)
+
+    def _reload_markets(self):
+        now = time.monotonic()
+        if now - self._last_reload < MARKETS_RELOAD_INTERVAL_SEC:
+            return
+        self._last_reload = now
         try:
-            self.exchange.load_markets()
+            self._use_markets(self.markets_cache.refresh() if self.markets_cache else self._fetch_markets())
         except Exception:
             pass
 
+    def _rules(self, symbol: str) -> MarketRules:
+        """下单前取规则；没有精度和最小量就不下单，宁可报错也不按错误的数量下单"""
+        r = self.rules.get(symbol)
+        if r is None:
+            self._reload_markets()
+            r = self.rules.get(symbol)
+        if r is None:
+            if not self.rules:
+                raise ccxt.ExchangeNotAvailable(f"markets not loaded, refusing to place {symbol} orders without limits")
+            raise ccxt.BadSymbol(f"no precision/limits for {symbol}")
+        return r
+
     def load_markets(self) -> Dict[str, Any]:
         return self.exchange.markets
 
@@ -40,65 +97,149 @@ class OkxClient(IExchange):
     def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
         return self.exchange.fetch_ticker(symbol)
 
-    def _amount_to_precision(self, symbol: str, amount: float) -> float:
-        s = self.exchange.amount_to_precision(symbol, amount)
-        return float(s)
-
     def _price_to_precision(self, symbol: str, price: float) -> float:
-        s = self.exchange.price_to_precision(symbol, price)
-        return float(s)
+        return self._rules(symbol).price_round(float(price))
 
     def _normalize_order_amount(self, symbol: str, base_amount: float, price: Optional[float] = None) -> float:
-        m = self.exchange.markets.get(symbol)
-        amt = float(base_amount)
-        if m:
-            limits = m.get("limits", {})
-            min_amt = float(limits.get("amount", {}).get("min", 0.0) or 0.0)
-            min_cost = float(limits.get("cost", {}).get("min", 0.0) or 0.0)
-            if min_amt and amt < min_amt:
-                amt = min_amt
-            if price is not None and min_cost:
-                if amt * float(price) < min_cost:
-                    amt = min_cost / float(price)
-        amt = self._amount_to_precision(symbol, amt)
-        return amt
-
-    def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        ticker = self.fetch_ticker(symbol)
-        price = float(ticker["last"])
-        base_amount = self._normalize_order_amount(symbol, quote_cost / price, price)
-        p = {"tdMode": "cash"}
-        if params:
-            p.update(params)
-        return self.exchange.create_order(symbol, "market", "buy", base_amount, None, p)
+        return self._rules(symbol).normalize(float(base_amount), float(price or 0.0))
 
-    def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        ticker = self.fetch_ticker(symbol)
-        price = float(ticker["last"])
-        base_amount = self._normalize_order_amount(symbol, base_amount, price)
+    def _create_order(self, symbol: str, type: str, side: str, base_amount: float, price: Optional[float], params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         p = {"tdMode": "cash"}
         if params:
             p.update(params)
-        return self.exchange.create_order(symbol, "market", "sell", base_amount, None, p)
+        with TRACER.span("create_order", side=side, type=type) as span:
+            o = self.exchange.create_order(symbol, type, side, base_amount, price, p)
+            span.set(order_id=o.get("id", ""))
+        return o
+
+    def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        price = float(ref_price) if ref_price else float(self.fetch_ticker(symbol)["last"])
+        with TRACER.span("normalize_amount"):
+            base_amount = self._normalize_order_amount(symbol, quote_cost / price, price)
+        return self._create_order(symbol, "market", "buy", base_amount, None, params)
+
+    def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        price = float(ref_price) if ref_price else float(self.fetch_ticker(symbol)["last"])
+        with TRACER.span("normalize_amount"):
+            base_amount = self._normalize_order_amount(symbol, base_amount, price)
+        return self._create_order(symbol, "market", "sell", base_amount, None, params)
 
     def create_limit_buy(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        base_amount = self._normalize_order_amount(symbol, base_amount, price)
-        price = self._price_to_precision(symbol, price)
-        p = {"tdMode": "cash"}
-        if params:
-            p.update(params)
-        return self.exchange.create_order(symbol, "limit", "buy", base_amount, price, p)
+        with TRACER.span("normalize_amount"):
+            base_amount = self._normalize_order_amount(symbol, base_amount, price)
+            price = self._price_to_precision(symbol, price)
+        return self._create_order(symbol, "limit", "buy", base_amount, price, params)
 
     def create_limit_sell(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        base_amount = self._normalize_order_amount(symbol, base_amount, price)
-        price = self._price_to_precision(symbol, price)
-        p = {"tdMode": "cash"}
-        if params:
-            p.update(params)
-        return self.exchange.create_order(symbol, "limit", "sell", base_amount, price, p)
+        with TRACER.span("normalize_amount"):
+            base_amount = self._normalize_order_amount(symbol, base_amount, price)
+            price = self._price_to_precision(symbol, price)
+        return self._create_order(symbol, "limit", "sell", base_amount, price, params)
 
     def fetch_balance(self) -> Dict[str, Any]:
         return self.exchange.fetch_balance()
 
     def fetch_my_trades(self, symbol: str, since: Optional[int] = None) -> List[Dict[str, Any]]:
         return self.exchange.fetch_my_trades(symbol, since=since)
+
+    def fetch_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        return self.exchange.fetch_order(order_id, symbol)
+
+    def fetch_open_orders(self, symbol: str) -> List[Dict[str, Any]]:
+        return self.exchange.fetch_open_orders(symbol)
+
+    def cancel_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        with TRACER.span("cancel_order"):
+            return self.exchange.cancel_order(order_id, symbol)
+
+    def amend_order(self, order_id: str, symbol: str, amount: Optional[float] = None, price: Optional[float] = None) -> Dict[str, Any]:
+        r = self.amend_orders([{"id": order_id, "symbol": symbol, "amount": amount, "price": price}])[0]
+        if r["status"] == "rejected":
+            cls = getattr(ccxt, r["errorType"], None)
+            raise (cls if isinstance(cls, type) and issubclass(cls, Exception) else ccxt.ExchangeError)(r["error"])
+        return r
+
+    # ---------- 批量接口：按 OKX_BATCH_SIZE 分块，每块一次请求，结果按位置对回每一笔 ----------
+
+    def _fmt(self, x: float, dp: int) -> str:
+        return f"{x:.{dp}f}"
+
+    def _batch(self, op: str, orders: List[Dict[str, Any]], build, send, parse) -> List[Dict[str, Any]]:
+        out: List[Optional[Dict[str, Any]]] = [None] * len(orders)
+        for start in range(0, len(orders), OKX_BATCH_SIZE):
+            idx, reqs = [], []
+            for i in range(start, min(start + OKX_BATCH_SIZE, len(orders))):
+                try:
+                    reqs.append(build(orders[i]))
+                    idx.append(i)
+                except Exception as e:
+                    out[i] = rejected(orders[i], e)
+            if not reqs:
+                continue
+            with TRACER.span(op, orders=len(reqs)):
+                try:
+                    data = send(reqs).get("data") or []
+                except Exception as e:
+                    # 整块失败（全部被拒时 ccxt 直接抛错）：这一块每一笔都记成同一个错误
+                    for i in idx:
+                        out[i] = rejected(orders[i], e)
+                    continue
+            for k, i in enumerate(idx):
+                d = data[k] if k < len(data) else {}
+                code = str(d.get("sCode", "")) if d else "missing"
+                if code == "0":
+                    out[i] = parse(orders[i], reqs[k], d)
+                else:
+                    cls = self.exchange.exceptions["exact"].get(code, ccxt.ExchangeError)
+                    out[i] = rejected(orders[i], (cls.__name__, d.get("sMsg") or f"sCode {code}"))
+        return out
+
+    def create_limit_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        def build(o):
+            r = self._rules(o["symbol"])
+            price = r.price_round(float(o["price"]))
+            req = {
+                "instId": self.exchange.market_id(o["symbol"]),
+                "tdMode": "cash",
+                "side": o["side"],
+                "ordType": "limit",
+                "sz": self._fmt(r.normalize(float(o["amount"]), price), r.amount_dp),
+                "px": self._fmt(price, r.price_dp),
+            }
+            # params 为 OKX 原生字段，如 ordType=post_only、clOrdId
+            req.update(o.get("params") or {})
+            return req
+
+        def parse(o, req, d):
+            return {"id": d.get("ordId"), "clientOrderId": d.get("clOrdId") or None, "symbol": o["symbol"], "type": "limit",
+                    "side": o["side"], "price": float(req["px"]), "amount": float(req["sz"]), "filled": 0.0, "status": "open", "info": d}
+        return self._batch("batch_create_orders", orders, build, self.exchange.privatePostTradeBatchOrders, parse)
+
+    def cancel_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        def build(o):
+            return {"instId": self.exchange.market_id(o["symbol"]), "ordId": str(o["id"])}
+
+        def parse(o, req, d):
+            return {"id": d.get("ordId") or o["id"], "symbol": o["symbol"], "status": "canceled", "info": d}
+        return self._batch("batch_cancel_orders", orders, build, self.exchange.privatePostTradeCancelBatchOrders, parse)
+
+    def amend_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        def build(o):
+            r = self._rules(o["symbol"])
+            req = {"instId": self.exchange.market_id(o["symbol"]), "ordId": str(o["id"])}
+            if o.get("price") is not None:
+                req["newPx"] = self._fmt(r.price_round(float(o["price"])), r.price_dp)
+            if o.get("amount") is not None:
+                req["newSz"] = self._fmt(r.amount_floor(float(o["amount"])), r.amount_dp)
+            if len(req) == 2:
+                raise ccxt.ArgumentsRequired("amend needs a new price or amount")
+            return req
+
+        def parse(o, req, d):
+            out = {"id": d.get("ordId") or o["id"], "symbol": o["symbol"], "status": "open", "info": d}
+            if "newPx" in req:
+                out["price"] = float(req["newPx"])
+            if "newSz" in req:
+                out["amount"] = float(req["newSz"])
+            return out
+        return self._batch("batch_amend_orders", orders, build, self.exchange.privatePostTradeAmendBatchOrders, parse)
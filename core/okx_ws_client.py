@@ -0,0 +1,354 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from core.exchange_base import IExchange
+from utils.ohlcv_buffer import OHLCVRingBuffer, is_strictly_increasing, timeframe_to_ms
+
+try:
+    import aiohttp
+except Exception:
+    aiohttp = None
+
+OKX_PUBLIC_WS = "wss://ws.okx.com:8443/ws/v5/public"
+OKX_BUSINESS_WS = "wss://ws.okx.com:8443/ws/v5/business"
+
+
+def to_inst_id(symbol: str) -> str:
+    return symbol.replace("/", "-")
+
+
+def okx_bar(timeframe: str) -> str:
+    unit = timeframe[-1]
+    n = timeframe[:-1]
+    if unit == "m":
+        return n + "m"
+    if unit == "h":
+        return n + "H"
+    if unit in ("d", "w", "M"):
+        return n + unit.upper() + "utc"
+    raise ValueError(f"unsupported timeframe: {timeframe}")
+
+
+class OkxStreamClient(IExchange):
+    """
+    行情走 OKX WebSocket 推送（tickers / candle / trades），内存里只保留最新状态，
+    fetch_ticker / fetch_ohlcv 直接从内存返回；连接断开、数据不够或过期时退回 REST。
+    下单、余额、成交等其余方法全部转发给 rest。
+    """
+
+    def __init__(
+        self,
+        rest: IExchange,
+        symbols: List[str],
+        timeframes: Optional[List[str]] = None,
+        public_url: str = OKX_PUBLIC_WS,
+        business_url: str = OKX_BUSINESS_WS,
+        proxy: Optional[str] = None,
+        max_candles: int = 500,
+        max_trades: int = 1000,
+        ticker_max_age_ms: int = 10000,
+        ping_interval_sec: float = 25.0,
+        reconnect_delay_sec: float = 1.0,
+        max_reconnect_delay_sec: float = 30.0,
+        record_path: str = "",
+    ):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for OkxStreamClient")
+        self.rest = rest
+        self.symbols = list(symbols)
+        self.timeframes = list(timeframes or ["1m"])
+        self.public_url = public_url
+        self.business_url = business_url
+        self.proxy = proxy or None
+        self.max_candles = max_candles
+        self.ticker_max_age_ms = ticker_max_age_ms
+        self.ping_interval_sec = ping_interval_sec
+        self.reconnect_delay_sec = reconnect_delay_sec
+        self.max_reconnect_delay_sec = max_reconnect_delay_sec
+        self.record_path = record_path
+        self._by_inst = {to_inst_id(s): s for s in self.symbols}
+        self._by_bar = {"candle" + okx_bar(tf): tf for tf in self.timeframes}
+        self._lock = threading.Lock()
+        self._tickers: Dict[str, Dict[str, Any]] = {}
+        self._candles: Dict[Tuple[str, str], OHLCVRingBuffer] = {}
+        self._trades: Dict[str, Deque[Dict[str, Any]]] = {s: deque(maxlen=max_trades) for s in self.symbols}
+        self._connected: Dict[str, bool] = {"public": False, "business": False}
+        self.connects = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._record = None
+
+    # ---- lifecycle ----
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        if self.record_path:
+            self._record = open(self.record_path, "a", encoding="utf-8")
+        self._stop.clear()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="okx-ws", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(lambda: [t.cancel() for t in asyncio.all_tasks(self._loop)])
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+        if self._record is not None:
+            self._record.close()
+            self._record = None
+
+    def wait_connected(self, timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.is_connected():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def is_connected(self, channel: Optional[str] = None) -> bool:
+        if channel is not None:
+            return self._connected[channel]
+        return all(self._connected.values())
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        tasks = [
+            self._loop.create_task(self._connection("public", self.public_url, self._public_args())),
+            self._loop.create_task(self._connection("business", self.business_url, self._business_args())),
+        ]
+        try:
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        finally:
+            self._loop.close()
+
+    def _public_args(self) -> List[Dict[str, str]]:
+        args = []
+        for s in self.symbols:
+            args.append({"channel": "tickers", "instId": to_inst_id(s)})
+            args.append({"channel": "trades", "instId": to_inst_id(s)})
+        return args
+
+    def _business_args(self) -> List[Dict[str, str]]:
+        return [{"channel": ch, "instId": to_inst_id(s)} for s in self.symbols for ch in self._by_bar]
+
+    async def _connection(self, name: str, url: str, args: List[Dict[str, str]]):
+        delay = self.reconnect_delay_sec
+        while not self._stop.is_set():
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async with session.ws_connect(url, proxy=self.proxy, heartbeat=None) as ws:
+                        # 每次(重)连接都重新订阅
+                        await ws.send_json({"op": "subscribe", "args": args})
+                        self.connects += 1
+                        delay = self.reconnect_delay_sec
+                        await self._read(name, ws)
+            except asyncio.CancelledError:
+                break
+            except Exception:
+                pass
+            self._connected[name] = False
+            if self._stop.is_set():
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay_sec)
+        self._connected[name] = False
+
+    async def _read(self, name: str, ws):
+        while not self._stop.is_set():
+            try:
+                msg = await ws.receive(timeout=self.ping_interval_sec)
+            except asyncio.TimeoutError:
+                await ws.send_str("ping")
+                continue
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                if msg.data == "pong":
+                    continue
+                if self._record is not None:
+                    self._record.write(msg.data + "\n")
+                self.handle_message(name, json.loads(msg.data))
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.ERROR):
+                return
+
+    # ---- message handling ----
+
+    def handle_message(self, name: str, msg: Dict[str, Any]):
+        event = msg.get("event")
+        if event == "subscribe":
+            self._connected[name] = True
+            return
+        if event is not None:
+            return
+        arg = msg.get("arg") or {}
+        symbol = self._by_inst.get(arg.get("instId", ""))
+        channel = arg.get("channel", "")
+        if symbol is None:
+            return
+        data = msg.get("data") or []
+        if channel == "tickers":
+            for d in data:
+                self._on_ticker(symbol, d)
+        elif channel == "trades":
+            for d in data:
+                self._on_trade(symbol, d)
+        elif channel in self._by_bar:
+            for d in data:
+                self._on_candle(symbol, self._by_bar[channel], d)
+
+    def _on_ticker(self, symbol: str, d: Dict[str, Any]):
+        ticker = {
+            "symbol": symbol,
+            "timestamp": int(d.get("ts") or 0),
+            "last": float(d.get("last") or 0.0),
+            "bid": float(d.get("bidPx") or 0.0) or None,
+            "ask": float(d.get("askPx") or 0.0) or None,
+            "bidVolume": float(d.get("bidSz") or 0.0),
+            "askVolume": float(d.get("askSz") or 0.0),
+            "open": float(d.get("open24h") or 0.0),
+            "high": float(d.get("high24h") or 0.0),
+            "low": float(d.get("low24h") or 0.0),
+            "baseVolume": float(d.get("vol24h") or 0.0),
+            "quoteVolume": float(d.get("volCcy24h") or 0.0),
+            "info": d,
+            "received": time.monotonic(),
+        }
+        with self._lock:
+            self._tickers[symbol] = ticker
+
+    def _on_trade(self, symbol: str, d: Dict[str, Any]):
+        trade = {
+            "id": d.get("tradeId"),
+            "symbol": symbol,
+            "timestamp": int(d.get("ts") or 0),
+            "price": float(d.get("px") or 0.0),
+            "amount": float(d.get("sz") or 0.0),
+            "side": d.get("side"),
+        }
+        with self._lock:
+            self._trades[symbol].append(trade)
+
+    def _on_candle(self, symbol: str, timeframe: str, d: List[str]):
+        candle = [int(d[0]), float(d[1]), float(d[2]), float(d[3]), float(d[4]), float(d[5])]
+        with self._lock:
+            buf = self._candles.get((symbol, timeframe))
+            if buf is None:
+                buf = self._candles[(symbol, timeframe)] = OHLCVRingBuffer(self.max_candles)
+            last = buf.last_ts
+            if len(buf) == 0 or candle[0] == last + timeframe_to_ms(timeframe):
+                buf.append(candle)
+            elif candle[0] == last:
+                buf.replace_last(candle)
+            elif candle[0] > last:
+                # 断线期间漏了K线：丢掉旧窗口，下次 fetch_ohlcv 走 REST 回补
+                buf.clear()
+                buf.append(candle)
+
+    # ---- market data ----
+
+    def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        with self._lock:
+            t = self._tickers.get(symbol)
+        if t is not None and self._connected["public"] and (time.monotonic() - t["received"]) * 1000 <= self.ticker_max_age_ms:
+            return dict(t)
+        return self.rest.fetch_ticker(symbol)
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str, since: Optional[int] = None, limit: Optional[int] = None) -> List[List[float]]:
+        key = (symbol, timeframe)
+        if key in self._candles or (symbol in self.symbols and timeframe in self.timeframes):
+            rows = self._stream_ohlcv(key, since, limit)
+            if rows is not None:
+                return rows
+            data = self.rest.fetch_ohlcv(symbol, timeframe, since, limit)
+            self._merge_rest_candles(key, data)
+            return data
+        return self.rest.fetch_ohlcv(symbol, timeframe, since, limit)
+
+    def _stream_ohlcv(self, key: Tuple[str, str], since: Optional[int], limit: Optional[int]) -> Optional[List[List[float]]]:
+        if not self._connected["business"]:
+            return None
+        with self._lock:
+            buf = self._candles.get(key)
+            if buf is None or len(buf) == 0:
+                return None
+            ts = buf.ts
+            if since is not None:
+                if ts[0] > since:
+                    return None
+                start = int((ts < since).sum())
+                rows = buf.to_list()[start:]
+                return rows[:limit] if limit else rows
+            if limit is None or len(buf) < limit:
+                return None
+            return buf.to_list()[-limit:]
+
+    def _merge_rest_candles(self, key: Tuple[str, str], data: List[List[float]]):
+        if not data or not is_strictly_increasing(data):
+            return
+        with self._lock:
+            buf = self._candles.get(key)
+            if buf is None:
+                buf = self._candles[key] = OHLCVRingBuffer(self.max_candles)
+            stream_rows = buf.to_list()
+            if stream_rows and int(data[-1][0]) + timeframe_to_ms(key[1]) < stream_rows[0][0]:
+                return
+            first_stream = stream_rows[0][0] if stream_rows else None
+            merged = [list(c) for c in data if first_stream is None or int(c[0]) < first_stream] + stream_rows
+            buf.clear()
+            buf.extend(merged)
+
+    def recent_trades(self, symbol: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            trades = list(self._trades.get(symbol, ()))
+        return trades[-limit:] if limit else trades
+
+    # ---- delegated ----
+
+    def load_markets(self) -> Dict[str, Any]:
+        return self.rest.load_markets()
+
+    def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return self.rest.create_market_buy(symbol, quote_cost, params, ref_price=ref_price or self.fetch_ticker(symbol).get("last"))
+
+    def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return self.rest.create_market_sell(symbol, base_amount, params, ref_price=ref_price or self.fetch_ticker(symbol).get("last"))
+
+    def create_limit_buy(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.rest.create_limit_buy(symbol, base_amount, price, params)
+
+    def create_limit_sell(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.rest.create_limit_sell(symbol, base_amount, price, params)
+
+    def fetch_balance(self) -> Dict[str, Any]:
+        return self.rest.fetch_balance()
+
+    def fetch_my_trades(self, symbol: str, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.rest.fetch_my_trades(symbol, since)
+
+    def fetch_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        return self.rest.fetch_order(order_id, symbol)
+
+    def fetch_open_orders(self, symbol: str) -> List[Dict[str, Any]]:
+        return self.rest.fetch_open_orders(symbol)
+
+    def cancel_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        return self.rest.cancel_order(order_id, symbol)
+
+    def amend_order(self, order_id: str, symbol: str, amount: Optional[float] = None, price: Optional[float] = None) -> Dict[str, Any]:
+        return self.rest.amend_order(order_id, symbol, amount, price)
+
+    def create_limit_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self.rest.create_limit_orders(orders)
+
+    def cancel_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self.rest.cancel_orders(orders)
+
+    def amend_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self.rest.amend_orders(orders)
@@ -0,0 +1,221 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import ccxt
+from core.exchange_base import IExchange
+from utils.state import PositionState, StateStore
+
+# 交易所已经结束的订单状态；其余（open、None）都按仍在挂单处理
+DONE_STATUSES = frozenset(("closed", "canceled", "expired", "rejected"))
+
+# reconcile() 里目标价/量相对变化不超过这个比例就不改单
+REPRICE_TOL = 1e-4
+
+
+class OrderManager:
+    """
+    实盘限价单的生命周期：下单后记入 state.open_orders，之后每轮
+      sync()   一次 fetch_open_orders 取回该交易对全部挂单，对比已成交量，把新增成交通过 on_fill 记到持仓；
+               不在挂单列表里的（成交完或被撤）再逐笔 fetch_order 取最终状态，每轮最多 max_lookups 笔；
+      expire() 挂单超过 timeout_sec 的按 reprice(order) 给出的新价格批量改单，给不出价格或改价次数用完的批量撤单，
+               撤掉的单留在表里，下一轮 sync() 拿到最终成交量后移除。
+    没有挂单时两者都不发请求；有挂单时每轮请求数不超过 1 + max_lookups + 2。
+    常驻挂单（rest=True，如 Sigma 的挂单梯子）不参与超时处理，由 reconcile() 按标签维护
+    """
+
+    def __init__(self, exchange: IExchange, symbol: str, state: PositionState, store: StateStore,
+                 on_fill: Callable[[str, float, float, str], None], timeout_sec: float = 120.0,
+                 stale_action: str = "reprice", max_reprices: int = 3, max_lookups: int = 5, logger=None):
+        if stale_action not in ("reprice", "cancel"):
+            raise ValueError(f"unsupported stale order action: {stale_action}")
+        self.exchange = exchange
+        self.symbol = symbol
+        self.state = state
+        self.store = store
+        self.on_fill = on_fill
+        self.timeout_sec = timeout_sec
+        self.stale_action = stale_action
+        self.max_reprices = max_reprices
+        self.max_lookups = max_lookups
+        self.logger = logger
+        self.requests = 0
+
+    @property
+    def orders(self) -> List[Dict[str, Any]]:
+        return self.state.open_orders
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        for o in self.orders:
+            if o["id"] == order_id:
+                return o
+        return None
+
+    def pending(self, side: str) -> float:
+        """某一方向挂单中尚未成交的数量"""
+        return sum(max(0.0, o["amount"] - o["filled"]) for o in self.orders if o["side"] == side)
+
+    def place(self, side: str, amount: float, price: float, params: Optional[Dict[str, Any]] = None,
+              tag: str = "", rest: bool = False) -> Dict[str, Any]:
+        fn = self.exchange.create_limit_buy if side == "buy" else self.exchange.create_limit_sell
+        d = fn(self.symbol, amount, price, params or {})
+        self.track(d, side, amount, price, tag, rest)
+        return d
+
+    def track(self, d: Dict[str, Any], side: str, amount: float, price: float, tag: str = "", rest: bool = False):
+        """登记一笔已下的限价单；下单返回里已经带了成交量（穿价成交）的当场入账"""
+        if not d.get("id") or d.get("status") == "rejected":
+            return
+        # target_* 是下单时要求的价/量，交易所按步长取整后的在 price/amount
+        o = {"id": d["id"], "side": side, "price": float(d.get("price") or price), "amount": float(d.get("amount") or amount),
+             "filled": 0.0, "cost": 0.0, "placed_ms": int(time.time() * 1000), "reprices": 0,
+             "tag": tag, "rest": rest, "target_price": price, "target_amount": amount}
+        self.orders.append(o)
+        if not self._apply(o, d):
+            self.orders.remove(o)
+        self.store.save(self.state)
+
+    def _apply(self, o: Dict[str, Any], d: Dict[str, Any]) -> bool:
+        """把订单 d 的累计成交量对到跟踪记录 o 上，返回订单是否还挂着"""
+        filled = float(d.get("filled") or 0.0)
+        if filled > o["filled"] + 1e-12:
+            if d.get("cost"):
+                cost = float(d["cost"])
+            else:
+                cost = o["cost"] + (filled - o["filled"]) * float(d.get("average") or d.get("price") or o["price"])
+            delta = filled - o["filled"]
+            price = (cost - o["cost"]) / delta
+            o["filled"], o["cost"] = filled, cost
+            self.on_fill(o["side"], delta, price, o["id"])
+        return d.get("status") not in DONE_STATUSES
+
+    def sync(self) -> int:
+        """对账一轮，返回发出的请求数"""
+        if not self.orders:
+            return 0
+        n = 1
+        by_id = {d["id"]: d for d in self.exchange.fetch_open_orders(self.symbol)}
+        done = []
+        for o in list(self.orders):
+            d = by_id.get(o["id"])
+            if d is None:
+                if n > self.max_lookups:
+                    continue
+                n += 1
+                try:
+                    d = self.exchange.fetch_order(o["id"], self.symbol)
+                except ccxt.OrderNotFound:
+                    d = {"status": "canceled"}
+                if d.get("status") not in DONE_STATUSES:
+                    # 挂单列表和查单之间刚好状态变化，下一轮再看
+                    d = dict(d, status="open")
+            if not self._apply(o, d):
+                done.append(o)
+        for o in done:
+            self.orders.remove(o)
+            if self.logger:
+                self.logger.info(f"ORDER-DONE {self.symbol} {o['side']} id={o['id']} filled={o['filled']:.8f}/{o['amount']:.8f}")
+        self.store.save(self.state)
+        self.requests += n
+        return n
+
+    # ---------- 批量操作：每种一次请求，结果逐笔对回跟踪记录 ----------
+
+    def place_many(self, reqs: List[Dict[str, Any]]) -> int:
+        """reqs: [{"side", "amount", "price", "tag", "rest"}]"""
+        if not reqs:
+            return 0
+        results = self.exchange.create_limit_orders([{"symbol": self.symbol, "side": r["side"], "amount": r["amount"], "price": r["price"]}
+                                                     for r in reqs])
+        for r, d in zip(reqs, results):
+            if d.get("status") == "rejected":
+                if self.logger:
+                    self.logger.warning(f"PLACE {self.symbol} {r['side']} {r.get('tag', '')} price={r['price']:.6f} failed: {d.get('error', '')}")
+                continue
+            self.track(d, r["side"], r["amount"], r["price"], r.get("tag", ""), r.get("rest", False))
+            if self.logger:
+                self.logger.info(f"PLACE {r['side'].upper()}-LIMIT {self.symbol} {r.get('tag', '')} price={r['price']:.6f} amount={r['amount']:.8f} order_id={d.get('id', '')}")
+        self.requests += 1
+        return 1
+
+    def amend_many(self, changes: List[Tuple[Dict[str, Any], Optional[float], Optional[float]]], now_ms: Optional[int] = None) -> int:
+        """changes: [(跟踪记录, 新价格或 None, 新的总数量或 None)]；失败多半是刚成交或被撤，交给下一轮 sync()"""
+        if not changes:
+            return 0
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        results = self.exchange.amend_orders([{"id": o["id"], "symbol": self.symbol, "price": p, "amount": a} for o, p, a in changes])
+        for (o, p, a), r in zip(changes, results):
+            o["reprices"] += 1
+            o["placed_ms"] = now_ms
+            if r.get("status") == "rejected":
+                if self.logger:
+                    self.logger.warning(f"REPRICE {self.symbol} id={o['id']} failed: {r.get('error', '')}")
+                continue
+            if p is not None:
+                o["target_price"] = p
+                o["price"] = float(r.get("price") or p)
+            if a is not None:
+                o["target_amount"] = a
+                o["amount"] = float(r.get("amount") or a)
+            if self.logger:
+                self.logger.info(f"REPRICE {self.symbol} {o['side']} id={o['id']} price={o['price']:.6f} amount={o['amount']:.8f}")
+        self.store.save(self.state)
+        self.requests += 1
+        return 1
+
+    def cancel_many(self, orders: List[Dict[str, Any]]) -> int:
+        if not orders:
+            return 0
+        results = self.exchange.cancel_orders([{"id": o["id"], "symbol": self.symbol} for o in orders])
+        for o, r in zip(orders, results):
+            if r.get("status") == "rejected" and r.get("errorType") != "OrderNotFound":
+                if self.logger:
+                    self.logger.warning(f"CANCEL {self.symbol} id={o['id']} failed: {r.get('error', '')}")
+                continue
+            o["canceling"] = True
+            if self.logger:
+                self.logger.info(f"CANCEL {self.symbol} {o['side']} id={o['id']}")
+        self.store.save(self.state)
+        self.requests += 1
+        return 1
+
+    def expire(self, reprice: Optional[Callable[[Dict[str, Any]], Optional[float]]] = None, now_ms: Optional[int] = None) -> int:
+        """处理超时挂单，返回发出的请求数"""
+        if not self.orders or self.timeout_sec <= 0:
+            return 0
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        amend, cancel = [], []
+        for o in self.orders:
+            if o.get("canceling") or o.get("rest") or now_ms - o["placed_ms"] < self.timeout_sec * 1000:
+                continue
+            price = None
+            if self.stale_action == "reprice" and o["reprices"] < self.max_reprices and reprice is not None:
+                price = reprice(o)
+            if not price:
+                cancel.append(o)
+            elif abs(price - o["price"]) <= o["price"] * 1e-9:
+                o["placed_ms"] = now_ms
+                o["reprices"] += 1
+            else:
+                amend.append((o, price, None))
+        return self.amend_many(amend, now_ms) + self.cancel_many(cancel)
+
+    def reconcile(self, want: Dict[str, Tuple[str, float, float]], tol: float = REPRICE_TOL) -> int:
+        """
+        让带标签的常驻挂单与 want {标签: (方向, 价格, 未成交数量)} 一致：缺的批量下单，目标价/量变了的批量改单，
+        不再需要的批量撤单（已部分成交的留着等它成交完）。只动变化了的那几档，返回发出的请求数
+        """
+        live = {o["tag"]: o for o in self.orders if o.get("rest") and not o.get("canceling")}
+        place, amend, cancel = [], [], []
+        for tag, (side, price, amount) in want.items():
+            o = live.get(tag)
+            if o is None:
+                place.append({"side": side, "price": price, "amount": amount, "tag": tag, "rest": True})
+                continue
+            total = o["filled"] + amount
+            new_price = price if abs(price - o["target_price"]) > o["target_price"] * tol else None
+            new_amount = total if abs(total - o["target_amount"]) > o["target_amount"] * tol else None
+            if new_price is not None or new_amount is not None:
+                amend.append((o, new_price, new_amount))
+        for tag, o in live.items():
+            if tag not in want and o["filled"] <= 0.0:
+                cancel.append(o)
+        return self.cancel_many(cancel) + self.amend_many(amend) + self.place_many(place)
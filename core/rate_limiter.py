@@ -0,0 +1,291 @@
+import bisect
+import contextlib
+import functools
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+from core.exchange_base import IExchange
+from core.okx_client import OKX_BATCH_SIZE
+from utils.metrics import REGISTRY, MetricsRegistry
+
+ORDER, ACCOUNT, MARKET = 0, 1, 2
+PRIORITY_NAMES = ("order", "account", "market")
+
+# OKX v5 文档公布的限频：接口 -> (请求数, 窗口秒)
+OKX_LIMITS: Dict[str, Tuple[int, float]] = {
+    "trade/order": (60, 2.0),  # 下单，按 UserID + instId
+    "trade/cancel-order": (60, 2.0),
+    "trade/amend-order": (60, 2.0),
+    # 批量接口按笔数限 300 笔/2 秒，这里按每次 OKX_BATCH_SIZE 笔折算成请求数
+    "trade/batch-orders": (300 // OKX_BATCH_SIZE, 2.0),
+    "trade/cancel-batch-orders": (300 // OKX_BATCH_SIZE, 2.0),
+    "trade/amend-batch-orders": (300 // OKX_BATCH_SIZE, 2.0),
+    "trade/order-get": (60, 2.0),  # GET /trade/order 查单
+    "trade/orders-pending": (60, 2.0),
+    "trade/fills-history": (10, 2.0),  # ccxt 的 fetch_my_trades 走近三个月成交
+    "account/balance": (10, 2.0),
+    "market/candles": (40, 2.0),
+    "market/ticker": (20, 2.0),
+    "public/instruments": (20, 2.0),
+}
+
+# 方法 -> (接口, 优先级, 是否按交易对单独计数)
+OKX_ENDPOINTS: Dict[str, Tuple[str, int, bool]] = {
+    "create_market_buy": ("trade/order", ORDER, True),
+    "create_market_sell": ("trade/order", ORDER, True),
+    "create_limit_buy": ("trade/order", ORDER, True),
+    "create_limit_sell": ("trade/order", ORDER, True),
+    # 第一个参数是订单号不是交易对，所有交易对共用一个桶（比按交易对更保守）
+    "cancel_order": ("trade/cancel-order", ORDER, False),
+    "create_limit_orders": ("trade/batch-orders", ORDER, False),
+    "cancel_orders": ("trade/cancel-batch-orders", ORDER, False),
+    "amend_orders": ("trade/amend-batch-orders", ORDER, False),
+    # OkxClient 的单笔改单走的是批量改单接口
+    "amend_order": ("trade/amend-batch-orders", ORDER, False),
+    "fetch_order": ("trade/order-get", ACCOUNT, False),
+    "fetch_open_orders": ("trade/orders-pending", ACCOUNT, False),
+    "fetch_balance": ("account/balance", ACCOUNT, False),
+    "fetch_my_trades": ("trade/fills-history", ACCOUNT, False),
+    "fetch_ohlcv": ("market/candles", MARKET, False),
+    "fetch_ticker": ("market/ticker", MARKET, False),
+    "load_markets": ("public/instruments", MARKET, False),
+}
+
+# 批量方法：按 OKX_BATCH_SIZE 拆开，每块单独取令牌
+BATCH_METHODS = frozenset(("create_limit_orders", "cancel_orders", "amend_orders"))
+
+# 只读请求：参数完全相同且前一个还在途时直接共用它的结果
+READ_METHODS = frozenset(("fetch_order", "fetch_open_orders", "fetch_balance", "fetch_my_trades", "fetch_ohlcv", "fetch_ticker", "load_markets"))
+
+
+class TokenBucket:
+    """
+    容量 limit*burst，按 limit*(1-burst)/window 的速率补充：任意长度为 window 的区间内最多放行 limit 个，
+    对按固定窗口还是滑动窗口计数的服务端都不会超限
+    """
+
+    def __init__(self, limit: int, window: float, burst: float = 0.2):
+        self.capacity = max(1.0, limit * burst)
+        self.rate = max(limit - self.capacity, 1e-9) / window
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1.0
+
+
+class RequestScheduler:
+    """
+    每个接口（按交易对计数的接口再按交易对）一个令牌桶，同时在途的请求不超过 max_inflight，
+    其中一个名额只留给下单/撤单，读请求占满时下单不用排队。
+    等待中的请求按 (优先级, 到达顺序) 排队：令牌或名额空出来时，先放行优先级最高且自己的桶里有令牌的那个
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, float]]] = None, max_inflight: int = 8,
+                 burst: float = 0.2, registry: MetricsRegistry = REGISTRY):
+        self.limits = dict(OKX_LIMITS if limits is None else limits)
+        self.max_inflight = max(1, max_inflight)
+        self.burst = burst
+        self.registry = registry
+        self._cond = threading.Condition()
+        self._buckets: Dict[str, TokenBucket] = {}
+        # (优先级, 序号, 桶名)，有序
+        self._waiting: List[Tuple[int, int, str]] = []
+        self._seq = itertools.count()
+        self._inflight = 0
+        self._depth = [0] * len(PRIORITY_NAMES)
+
+    def _bucket(self, key: str) -> Optional[TokenBucket]:
+        b = self._buckets.get(key)
+        if b is None:
+            endpoint = key.split("|", 1)[0]
+            if endpoint not in self.limits:
+                return None
+            limit, window = self.limits[endpoint]
+            b = self._buckets[key] = TokenBucket(limit, window, self.burst)
+        return b
+
+    def _slots(self, priority: int) -> int:
+        return self.max_inflight if priority == ORDER else max(1, self.max_inflight - 1)
+
+    def _next_ready(self, now: float) -> Optional[Tuple[int, int, str]]:
+        for w in self._waiting:
+            b = self._bucket(w[2])
+            if self._inflight < self._slots(w[0]) and (b is None or b.wait_time(now) <= 0.0):
+                return w
+        return None
+
+    def _set_depth(self, priority: int, delta: int):
+        self._depth[priority] += delta
+        if self.registry.enabled:
+            self.registry.queue_depth.set(self._depth[priority], PRIORITY_NAMES[priority])
+
+    def depth(self, priority: Optional[int] = None) -> int:
+        with self._cond:
+            return sum(self._depth) if priority is None else self._depth[priority]
+
+    def acquire(self, key: str, priority: int):
+        me = (priority, next(self._seq), key)
+        t0 = time.monotonic()
+        with self._cond:
+            bisect.insort(self._waiting, me)
+            self._set_depth(priority, 1)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._next_ready(now) == me:
+                        b = self._bucket(key)
+                        if b is not None:
+                            b.take(now)
+                        self._inflight += 1
+                        break
+                    b = self._bucket(key)
+                    wait = b.wait_time(now) if b is not None else 0.0
+                    # 令牌不够就睡到补满为止；否则等别的请求放行或结束时唤醒
+                    self._cond.wait(min(wait, 1.0) if wait > 0 else 1.0)
+            finally:
+                self._waiting.remove(me)
+                self._set_depth(priority, -1)
+                self._cond.notify_all()
+        if self.registry.enabled:
+            self.registry.queue_wait.observe(time.monotonic() - t0, PRIORITY_NAMES[priority])
+
+    def release(self):
+        with self._cond:
+            self._inflight -= 1
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, key: str, priority: int):
+        self.acquire(key, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class RateLimitedExchange(IExchange):
+    """
+    放在 OkxClient 外面代替 ccxt 的全局限频：请求经 RequestScheduler 按接口限频、按优先级放行，
+    参数相同的只读请求在途时合并成一次。没有登记的方法直接透传
+    """
+
+    def __init__(self, exchange: IExchange, scheduler: Optional[RequestScheduler] = None,
+                 endpoints: Optional[Dict[str, Tuple[str, int, bool]]] = None, registry: MetricsRegistry = REGISTRY):
+        self.exchange = exchange
+        self.scheduler = scheduler or RequestScheduler(registry=registry)
+        self.endpoints = dict(OKX_ENDPOINTS if endpoints is None else endpoints)
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._pending: Dict[Any, Future] = {}
+
+    def _send(self, method: str, *args, **kwargs):
+        endpoint, priority, per_symbol = self.endpoints[method]
+        key = endpoint
+        if per_symbol and args and isinstance(args[0], str):
+            key = f"{endpoint}|{args[0]}"
+        with self.scheduler.slot(key, priority):
+            return getattr(self.exchange, method)(*args, **kwargs)
+
+    def _call(self, method: str, *args, **kwargs):
+        if method not in self.endpoints:
+            return getattr(self.exchange, method)(*args, **kwargs)
+        if method in BATCH_METHODS:
+            orders = args[0]
+            out: List[Dict[str, Any]] = []
+            for i in range(0, len(orders), OKX_BATCH_SIZE):
+                out.extend(self._send(method, orders[i:i + OKX_BATCH_SIZE]))
+            return out
+        if method not in READ_METHODS:
+            return self._send(method, *args, **kwargs)
+        try:
+            key = (method, args, tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:
+            return self._send(method, *args, **kwargs)
+        with self._lock:
+            fut = self._pending.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._pending[key] = Future()
+        if not leader:
+            if self.registry.enabled:
+                self.registry.deduped.inc(method)
+            return fut.result()
+        try:
+            result = self._send(method, *args, **kwargs)
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.exchange, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        return functools.partial(self._call, name)
+
+    def load_markets(self) -> Dict[str, Any]:
+        return self._call("load_markets")
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str, since: Optional[int] = None, limit: Optional[int] = None) -> List[List[float]]:
+        return self._call("fetch_ohlcv", symbol, timeframe, since, limit)
+
+    def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        return self._call("fetch_ticker", symbol)
+
+    def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return self._call("create_market_buy", symbol, quote_cost, params, ref_price=ref_price)
+
+    def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return self._call("create_market_sell", symbol, base_amount, params, ref_price=ref_price)
+
+    def create_limit_buy(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._call("create_limit_buy", symbol, base_amount, price, params)
+
+    def create_limit_sell(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._call("create_limit_sell", symbol, base_amount, price, params)
+
+    def fetch_balance(self) -> Dict[str, Any]:
+        return self._call("fetch_balance")
+
+    def fetch_my_trades(self, symbol: str, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._call("fetch_my_trades", symbol, since)
+
+    def fetch_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        return self._call("fetch_order", order_id, symbol)
+
+    def fetch_open_orders(self, symbol: str) -> List[Dict[str, Any]]:
+        return self._call("fetch_open_orders", symbol)
+
+    def cancel_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        return self._call("cancel_order", order_id, symbol)
+
+    def amend_order(self, order_id: str, symbol: str, amount: Optional[float] = None, price: Optional[float] = None) -> Dict[str, Any]:
+        return self._call("amend_order", order_id, symbol, amount, price)
+
+    def create_limit_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("create_limit_orders", orders)
+
+    def cancel_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("cancel_orders", orders)
+
+    def amend_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("amend_orders", orders)
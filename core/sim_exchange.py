@@ -0,0 +1,426 @@
+import bisect
+import heapq
+import itertools
+import math
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import ccxt
+from core.exchange_base import IExchange
+from core.markets import MarketRules
+from utils.ohlcv_buffer import timeframe_to_ms
+
+# 没有显式给出 markets 的交易对按这个规则：数量步长 1e-6，价格步长 0.01，最小 1 USDT
+DEFAULT_MARKET: Dict[str, Any] = {
+    "precision": {"amount": 1e-6, "price": 0.01},
+    "limits": {"amount": {"min": 1e-6}, "cost": {"min": 1.0}},
+}
+
+_EPS = 1e-12
+
+
+class _Order:
+    __slots__ = ("id", "client_id", "symbol", "type", "side", "price", "amount", "filled", "cost", "fee", "status", "timestamp", "seq")
+
+    def __init__(self, oid: str, client_id: str, symbol: str, type: str, side: str, price: float, amount: float, ts: int, seq: int):
+        self.id = oid
+        self.client_id = client_id
+        self.symbol = symbol
+        self.type = type
+        self.side = side
+        self.price = price
+        self.amount = amount
+        self.filled = 0.0
+        self.cost = 0.0
+        self.fee = 0.0
+        self.status = "open"
+        self.timestamp = ts
+        self.seq = seq
+
+    @property
+    def remaining(self) -> float:
+        return self.amount - self.filled
+
+
+class _Book:
+    __slots__ = ("symbol", "rules", "bids", "asks", "last", "trades", "trade_ts", "candles")
+
+    def __init__(self, symbol: str, rules: MarketRules):
+        self.symbol = symbol
+        self.rules = rules
+        # 挂单堆：买单按 (-价格, 序号)，卖单按 (价格, 序号)，即价格优先、时间优先；撤单、改单惰性删除
+        self.bids: List[Tuple[float, int, _Order]] = []
+        self.asks: List[Tuple[float, int, _Order]] = []
+        self.last = 0.0
+        self.trades: List[Dict[str, Any]] = []
+        self.trade_ts: List[int] = []
+        self.candles: Dict[str, Tuple[List[int], List[List[float]]]] = {}
+
+
+class SimExchange(IExchange):
+    """
+    撮合模拟交易所，实现完整的 IExchange：
+    - 行情由 on_trade()/on_candle() 或 replay_trades()/replay_candles() 喂入，时钟就是最后一笔行情的时间戳
+    - 自己的限价单按价格-时间优先排队，被市场成交按成交量部分/全部撮合，成交价为挂单价（maker 费率）
+    - 市价单和穿价的限价单在盘口立即成交（taker 费率），盘口 = 最新价 ± spread_pct/2
+    - 手续费按 OKX 现货规则从收到的币里扣：买入扣 base，卖出扣 quote
+    - 数量按 OKX 规则补到最小值并截断到步长，余额不足抛 ccxt.InsufficientFunds，不满足规则抛 ccxt.InvalidOrder
+    """
+
+    def __init__(
+        self,
+        markets: Optional[Dict[str, Dict[str, Any]]] = None,
+        balances: Optional[Dict[str, float]] = None,
+        maker_fee: float = 0.0008,
+        taker_fee: float = 0.001,
+        spread_pct: float = 0.0002,
+        trades_page: int = 100,
+    ):
+        self.markets: Dict[str, Dict[str, Any]] = {s: dict(m, symbol=s) for s, m in (markets or {}).items()}
+        self.maker_fee = float(maker_fee)
+        self.taker_fee = float(taker_fee)
+        self.spread_pct = float(spread_pct)
+        self.trades_page = trades_page
+        self.time_ms = 0
+        self._books: Dict[str, _Book] = {}
+        # 币种 -> [free, used]
+        self._balances: Dict[str, List[float]] = {c: [float(v), 0.0] for c, v in (balances or {}).items()}
+        self._orders: Dict[str, _Order] = {}
+        self._order_seq = itertools.count(1)
+        self._trade_seq = itertools.count(1)
+
+    def _book(self, symbol: str) -> _Book:
+        book = self._books.get(symbol)
+        if book is None:
+            m = self.markets.get(symbol)
+            if m is None:
+                base, _, quote = symbol.partition("/")
+                m = self.markets[symbol] = dict(DEFAULT_MARKET, symbol=symbol, base=base, quote=quote)
+            book = self._books[symbol] = _Book(symbol, MarketRules(symbol, m))
+        return book
+
+    def _bal(self, ccy: str) -> List[float]:
+        b = self._balances.get(ccy)
+        if b is None:
+            b = self._balances[ccy] = [0.0, 0.0]
+        return b
+
+    def _touch(self, book: _Book) -> Tuple[float, float]:
+        half = book.last * self.spread_pct / 2.0
+        r = book.rules
+        if r.price_step > 0 and half > 0:
+            bid = round(math.floor((book.last - half) / r.price_step + 1e-9) * r.price_step, r.price_dp)
+            ask = round(math.ceil((book.last + half) / r.price_step - 1e-9) * r.price_step, r.price_dp)
+            return bid, ask
+        return book.last - half, book.last + half
+
+    # ---------- 行情 ----------
+
+    def on_trade(self, symbol: str, ts: int, price: float, amount: float = math.inf):
+        """一笔市场成交：最新价更新为 price，并用这笔的量按价格-时间优先撮合穿价的挂单"""
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._book(symbol)
+        book.last = price
+        if ts > self.time_ms:
+            self.time_ms = ts
+        bids = book.bids
+        if bids and -bids[0][0] >= price:
+            amount = self._match(book, bids, True, price, amount, ts)
+        asks = book.asks
+        if asks and asks[0][0] <= price and amount > 0:
+            self._match(book, asks, False, price, amount, ts)
+
+    def on_candle(self, symbol: str, timeframe: str, candle: Sequence[float]):
+        """
+        一根已收盘的K线：按 开→低→高→收（阴线为 开→高→低→收）拆成四笔成交撮合挂单，成交量平分（无量视为不限量），
+        然后放进历史供 fetch_ohlcv 取
+        """
+        ts = int(candle[0])
+        o, h, l, c = float(candle[1]), float(candle[2]), float(candle[3]), float(candle[4])
+        v = float(candle[5]) if len(candle) > 5 else 0.0
+        q = v / 4.0 if v > 0 else math.inf
+        step = timeframe_to_ms(timeframe) // 4
+        path = (o, l, h, c) if c >= o else (o, h, l, c)
+        for k, p in enumerate(path):
+            self.on_trade(symbol, ts + k * step, p, q)
+        ts_list, rows = self._book(symbol).candles.setdefault(timeframe, ([], []))
+        if ts_list and ts <= ts_list[-1]:
+            i = bisect.bisect_left(ts_list, ts)
+            if ts_list[i] == ts:
+                rows[i] = [ts, o, h, l, c, v]
+                return
+            ts_list.insert(i, ts)
+            rows.insert(i, [ts, o, h, l, c, v])
+            return
+        ts_list.append(ts)
+        rows.append([ts, o, h, l, c, v])
+
+    def replay_trades(self, symbol: str, rows: Iterable[Sequence[float]], on_event: Optional[Callable[[int], Any]] = None) -> int:
+        """按顺序喂入 (ts, price, amount) 成交，每笔之后回调 on_event(i)，返回条数"""
+        feed = self.on_trade
+        n = 0
+        if on_event is None:
+            for ts, price, amount in rows:
+                feed(symbol, int(ts), float(price), float(amount))
+                n += 1
+            return n
+        for ts, price, amount in rows:
+            feed(symbol, int(ts), float(price), float(amount))
+            on_event(n)
+            n += 1
+        return n
+
+    def replay_candles(self, symbol: str, timeframe: str, rows: Iterable[Sequence[float]], on_bar: Optional[Callable[[int], Any]] = None) -> int:
+        """按顺序喂入K线，每根收盘后回调 on_bar(i)（比如跑一次策略 tick），返回根数"""
+        n = 0
+        for row in rows:
+            self.on_candle(symbol, timeframe, row)
+            if on_bar is not None:
+                on_bar(n)
+            n += 1
+        return n
+
+    # ---------- 撮合 ----------
+
+    def _match(self, book: _Book, heap: List[Tuple[float, int, _Order]], is_bid: bool, price: float, qty: float, ts: int) -> float:
+        while heap and qty > 0:
+            key, seq, o = heap[0]
+            # 撤掉的单和改单后留下的旧条目都惰性删除
+            if o.status != "open" or seq != o.seq:
+                heapq.heappop(heap)
+                continue
+            limit = -key if is_bid else key
+            if (is_bid and limit < price) or (not is_bid and limit > price):
+                break
+            f = min(o.remaining, qty)
+            qty -= f
+            self._fill(book, o, f, o.price, False, ts)
+            if o.status != "open":
+                heapq.heappop(heap)
+        return qty
+
+    def _fill(self, book: _Book, o: _Order, amount: float, price: float, taker: bool, ts: int):
+        r = book.rules
+        cost = amount * price
+        if o.side == "buy":
+            fee = amount * (self.taker_fee if taker else self.maker_fee)
+            fee_ccy = r.base
+            q = self._bal(r.quote)
+            if o.type == "limit":
+                # 按挂单价冻结的 quote 解冻，成交价更优的差额退回可用
+                q[1] -= amount * o.price
+                q[0] += amount * (o.price - price)
+            else:
+                q[0] -= cost
+            self._bal(r.base)[0] += amount - fee
+        else:
+            fee = cost * (self.taker_fee if taker else self.maker_fee)
+            fee_ccy = r.quote
+            b = self._bal(r.base)
+            if o.type == "limit":
+                b[1] -= amount
+            else:
+                b[0] -= amount
+            self._bal(r.quote)[0] += cost - fee
+        o.filled += amount
+        o.cost += cost
+        o.fee += fee
+        if o.remaining <= _EPS * max(1.0, o.amount):
+            o.status = "closed"
+        book.trades.append({
+            "id": str(next(self._trade_seq)),
+            "order": o.id,
+            "timestamp": ts,
+            "symbol": o.symbol,
+            "type": o.type,
+            "side": o.side,
+            "takerOrMaker": "taker" if taker else "maker",
+            "price": price,
+            "amount": amount,
+            "cost": cost,
+            "fee": {"cost": fee, "currency": fee_ccy},
+        })
+        book.trade_ts.append(ts)
+
+    def _place(self, symbol: str, type: str, side: str, amount: float, price: Optional[float], params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        book = self._book(symbol)
+        if book.last <= 0:
+            raise ccxt.ExchangeError(f"sim: no market data for {symbol}")
+        r = book.rules
+        bid, ask = self._touch(book)
+        if type == "limit":
+            price = r.price_round(float(price))
+            if price <= 0:
+                raise ccxt.InvalidOrder(f"sim: invalid price {price}")
+        px = price if type == "limit" else (ask if side == "buy" else bid)
+        amount = r.normalize(amount, px)
+        if amount <= 0 or (r.min_amount and amount < r.min_amount - _EPS):
+            raise ccxt.InvalidOrder(f"sim: amount {amount} below minimum {r.min_amount} for {symbol}")
+        if r.min_cost and amount * px < r.min_cost * (1.0 - 1e-9):
+            raise ccxt.InvalidOrder(f"sim: cost {amount * px} below minimum {r.min_cost} for {symbol}")
+        if side == "buy":
+            funds, need = self._bal(r.quote), amount * px
+        else:
+            funds, need = self._bal(r.base), amount
+        if funds[0] + _EPS < need:
+            raise ccxt.InsufficientFunds(f"sim: need {need}, free {funds[0]}")
+        seq = next(self._order_seq)
+        o = _Order(f"sim-{seq}", str((params or {}).get("clOrdId") or ""), symbol, type, side, price or 0.0, amount, self.time_ms, seq)
+        self._orders[o.id] = o
+        if type == "market":
+            self._fill(book, o, amount, px, True, self.time_ms)
+            return self._order_dict(o)
+        funds[0] -= need
+        funds[1] += need
+        if side == "buy" and price >= ask:
+            self._fill(book, o, amount, ask, True, self.time_ms)
+        elif side == "sell" and price <= bid:
+            self._fill(book, o, amount, bid, True, self.time_ms)
+        elif side == "buy":
+            heapq.heappush(book.bids, (-price, seq, o))
+        else:
+            heapq.heappush(book.asks, (price, seq, o))
+        return self._order_dict(o)
+
+    def _order_dict(self, o: _Order) -> Dict[str, Any]:
+        book = self._books[o.symbol]
+        return {
+            "id": o.id,
+            "clientOrderId": o.client_id,
+            "timestamp": o.timestamp,
+            "symbol": o.symbol,
+            "type": o.type,
+            "side": o.side,
+            "price": o.price or (o.cost / o.filled if o.filled else None),
+            "amount": o.amount,
+            "filled": o.filled,
+            "remaining": max(0.0, o.remaining),
+            "cost": o.cost,
+            "average": o.cost / o.filled if o.filled else None,
+            "status": o.status,
+            "fee": {"cost": o.fee, "currency": book.rules.base if o.side == "buy" else book.rules.quote},
+        }
+
+    # ---------- IExchange ----------
+
+    def load_markets(self) -> Dict[str, Any]:
+        return self.markets
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str, since: Optional[int] = None, limit: Optional[int] = None) -> List[List[float]]:
+        book = self._books.get(symbol)
+        series = book.candles.get(timeframe) if book else None
+        if not series:
+            return []
+        ts_list, rows = series
+        if since is None:
+            out = rows[-limit:] if limit else rows
+        else:
+            i = bisect.bisect_left(ts_list, int(since))
+            out = rows[i:i + limit] if limit else rows[i:]
+        return [list(r) for r in out]
+
+    def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        book = self._book(symbol)
+        bid, ask = self._touch(book)
+        return {"symbol": symbol, "timestamp": self.time_ms, "last": book.last, "close": book.last, "bid": bid, "ask": ask}
+
+    def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        book = self._book(symbol)
+        price = float(ref_price) if ref_price else self._touch(book)[1]
+        if price <= 0:
+            raise ccxt.ExchangeError(f"sim: no market data for {symbol}")
+        return self._place(symbol, "market", "buy", quote_cost / price, None, params)
+
+    def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return self._place(symbol, "market", "sell", base_amount, None, params)
+
+    def create_limit_buy(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._place(symbol, "limit", "buy", base_amount, price, params)
+
+    def create_limit_sell(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._place(symbol, "limit", "sell", base_amount, price, params)
+
+    def fetch_balance(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"free": {}, "used": {}, "total": {}}
+        for ccy, (free, used) in self._balances.items():
+            out["free"][ccy] = free
+            out["used"][ccy] = used
+            out["total"][ccy] = free + used
+            out[ccy] = {"free": free, "used": used, "total": free + used}
+        return out
+
+    def fetch_my_trades(self, symbol: str, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        """与 OKX 一样分页：since 为空时返回最近一页，否则从 since 起最多一页"""
+        book = self._books.get(symbol)
+        if book is None:
+            return []
+        if since is None:
+            return list(book.trades[-self.trades_page:])
+        i = bisect.bisect_left(book.trade_ts, int(since))
+        return book.trades[i:i + self.trades_page]
+
+    # ---------- 订单查询/撤单 ----------
+
+    def _get_order(self, order_id: str) -> _Order:
+        o = self._orders.get(order_id)
+        if o is None:
+            raise ccxt.OrderNotFound(f"sim: order {order_id} not found")
+        return o
+
+    def fetch_order(self, order_id: str, symbol: Optional[str] = None) -> Dict[str, Any]:
+        return self._order_dict(self._get_order(order_id))
+
+    def fetch_open_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [self._order_dict(o) for o in self._orders.values() if o.status == "open" and (symbol is None or o.symbol == symbol)]
+
+    def cancel_order(self, order_id: str, symbol: Optional[str] = None) -> Dict[str, Any]:
+        o = self._get_order(order_id)
+        if o.status != "open":
+            raise ccxt.OrderNotFound(f"sim: order {order_id} is {o.status}")
+        r = self._books[o.symbol].rules
+        if o.side == "buy":
+            b, amt = self._bal(r.quote), o.remaining * o.price
+        else:
+            b, amt = self._bal(r.base), o.remaining
+        b[0] += amt
+        b[1] -= amt
+        o.status = "canceled"
+        return self._order_dict(o)
+
+    def amend_order(self, order_id: str, symbol: Optional[str] = None, amount: Optional[float] = None, price: Optional[float] = None) -> Dict[str, Any]:
+        """
+        与 OKX 改单一致：订单号不变，amount 为新的总数量（须大于已成交量）。
+        改价或加量重新排队，只减量保留原来的时间优先；改到穿价立即按盘口成交
+        """
+        o = self._get_order(order_id)
+        if o.status != "open" or o.type != "limit":
+            raise ccxt.OrderNotFound(f"sim: order {order_id} is {o.status}")
+        book = self._books[o.symbol]
+        r = book.rules
+        new_price = r.price_round(float(price)) if price is not None else o.price
+        new_amount = r.amount_floor(float(amount)) if amount is not None else o.amount
+        if new_price <= 0:
+            raise ccxt.InvalidOrder(f"sim: invalid price {new_price}")
+        if new_amount <= o.filled + _EPS:
+            raise ccxt.InvalidOrder(f"sim: new amount {new_amount} not above filled {o.filled}")
+        if o.side == "buy":
+            funds, held, need = self._bal(r.quote), o.remaining * o.price, (new_amount - o.filled) * new_price
+        else:
+            funds, held, need = self._bal(r.base), o.remaining, new_amount - o.filled
+        if funds[0] + held + _EPS < need:
+            raise ccxt.InsufficientFunds(f"sim: need {need}, free {funds[0] + held}")
+        funds[0] += held - need
+        funds[1] += need - held
+        requeue = new_price != o.price or new_amount > o.amount
+        o.price, o.amount = new_price, new_amount
+        if requeue:
+            o.seq = next(self._order_seq)
+            bid, ask = self._touch(book)
+            if o.side == "buy" and new_price >= ask:
+                self._fill(book, o, o.remaining, ask, True, self.time_ms)
+            elif o.side == "sell" and new_price <= bid:
+                self._fill(book, o, o.remaining, bid, True, self.time_ms)
+            elif o.side == "buy":
+                heapq.heappush(book.bids, (-new_price, o.seq, o))
+            else:
+                heapq.heappush(book.asks, (new_price, o.seq, o))
+        return self._order_dict(o)
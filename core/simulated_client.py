@@ -1,31 +1,42 @@
+import itertools
 import time
 from typing import Any, Dict, List, Optional
+import ccxt
 import numpy as np
 from core.exchange_base import IExchange
+from utils.ohlcv_buffer import timeframe_to_ms
 
 class SimulatedClient(IExchange):
     def __init__(self):
         self._price = 100.0
+        # 批量接口下的挂单只记状态，不撮合
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        self._seq = itertools.count(1)
 
     def load_markets(self) -> Dict[str, Any]:
         return {}
 
     def fetch_ohlcv(self, symbol: str, timeframe: str, since: Optional[int] = None, limit: Optional[int] = None) -> List[List[float]]:
-        now = int(time.time() * 1000)
+        tf_ms = timeframe_to_ms(timeframe)
+        last_open = int(time.time() * 1000) // tf_ms * tf_ms
         if timeframe == "1h":
             closes = np.linspace(100.0, 101.0, 24)
         else:
             closes = np.concatenate([np.linspace(100.0, 99.0, 50), np.linspace(99.0, 101.0, 150)])
-        return [[now, 0.0, 0.0, 0.0, float(c)] for c in closes[:limit] if closes.size > 0]
+        rows = [[last_open - (closes.size - 1 - i) * tf_ms, 0.0, 0.0, 0.0, float(c)] for i, c in enumerate(closes)]
+        if since is not None:
+            rows = [r for r in rows if r[0] >= since]
+            return rows[:limit] if limit else rows
+        return rows[-limit:] if limit else rows
 
     def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
         return {"last": self._price}
 
-    def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        amount = quote_cost / max(self._price, 1e-9)
+    def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        amount = quote_cost / max(ref_price or self._price, 1e-9)
         return {"id": "sim_buy", "amount": amount}
 
-    def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
         return {"id": "sim_sell", "amount": base_amount}
 
     def create_limit_buy(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -39,3 +50,39 @@ class SimulatedClient(IExchange):
 
     def fetch_my_trades(self, symbol: str, since: Optional[int] = None) -> List[Dict[str, Any]]:
         return []
+
+    def create_limit_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        out = []
+        for o in orders:
+            oid = f"sim_limit_{o['side']}_{next(self._seq)}"
+            d = self._orders[oid] = {"id": oid, "symbol": o["symbol"], "type": "limit", "side": o["side"], "price": float(o["price"]),
+                                     "amount": float(o["amount"]), "filled": 0.0, "status": "open"}
+            out.append(dict(d))
+        return out
+
+    def _open_order(self, order_id: str) -> Dict[str, Any]:
+        o = self._orders.get(order_id)
+        if o is None or o["status"] != "open":
+            raise ccxt.OrderNotFound(f"sim: order {order_id} not open")
+        return o
+
+    def fetch_order(self, order_id: str, symbol: Optional[str] = None) -> Dict[str, Any]:
+        if order_id not in self._orders:
+            raise ccxt.OrderNotFound(f"sim: order {order_id} not found")
+        return dict(self._orders[order_id])
+
+    def fetch_open_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [dict(o) for o in self._orders.values() if o["status"] == "open" and (symbol is None or o["symbol"] == symbol)]
+
+    def cancel_order(self, order_id: str, symbol: Optional[str] = None) -> Dict[str, Any]:
+        o = self._open_order(order_id)
+        o["status"] = "canceled"
+        return dict(o)
+
+    def amend_order(self, order_id: str, symbol: Optional[str] = None, amount: Optional[float] = None, price: Optional[float] = None) -> Dict[str, Any]:
+        o = self._open_order(order_id)
+        if amount is not None:
+            o["amount"] = float(amount)
+        if price is not None:
+            o["price"] = float(price)
+        return dict(o)
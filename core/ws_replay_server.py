@@ -0,0 +1,110 @@
+import asyncio
+import json
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    from aiohttp import WSMsgType, web
+except Exception:
+    web = None
+
+
+def load_recording(path: str) -> List[Dict[str, Any]]:
+    messages = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                messages.append(json.loads(line))
+    return messages
+
+
+class ReplayWebSocketServer:
+    """
+    本地假 OKX WebSocket：收到 subscribe 后回 ack，再按顺序回放录制的推送消息（只回放已订阅频道的），
+    响应文本 ping。drop_after_replay 次数内每次回放完主动断开，用来测重连与重新订阅。
+    """
+
+    def __init__(self, messages: List[Union[Dict[str, Any], str]], host: str = "127.0.0.1", port: int = 0,
+                 interval_sec: float = 0.0, drop_after_replay: int = 0):
+        if web is None:
+            raise RuntimeError("aiohttp is required for ReplayWebSocketServer")
+        self.messages = [m if isinstance(m, dict) else json.loads(m) for m in messages]
+        self.host = host
+        self.port = port
+        self.interval_sec = interval_sec
+        self.drop_after_replay = drop_after_replay
+        self.subscriptions: List[Dict[str, Any]] = []
+        self.connections = 0
+        self.pings = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._serve, name="ws-replay", daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        fut = asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop)
+        try:
+            fut.result(5)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+        self._loop = None
+
+    def _serve(self):
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        drop = self.connections <= self.drop_after_replay
+        subscribed = set()
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            if msg.data == "ping":
+                self.pings += 1
+                await ws.send_str("pong")
+                continue
+            req = json.loads(msg.data)
+            if req.get("op") != "subscribe":
+                continue
+            for arg in req.get("args", []):
+                self.subscriptions.append(arg)
+                subscribed.add((arg.get("channel"), arg.get("instId")))
+                await ws.send_json({"event": "subscribe", "arg": arg})
+            for m in self.messages:
+                arg = m.get("arg") or {}
+                if (arg.get("channel"), arg.get("instId")) not in subscribed:
+                    continue
+                await ws.send_json(m)
+                if self.interval_sec:
+                    await asyncio.sleep(self.interval_sec)
+            if drop:
+                await ws.close()
+                break
+        return ws
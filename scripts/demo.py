@@ -22,10 +22,10 @@ class DummyExchange(IExchange):
         return [[now, 0, 0, 0, float(c)] for c in closes]
     def fetch_ticker(self, symbol):
         return {"last": self.price}
-    def create_market_buy(self, symbol, quote_cost, params=None):
+    def create_market_buy(self, symbol, quote_cost, params=None, ref_price=None):
         amount = quote_cost / self.price
         return {"id": "demo_buy", "amount": amount}
-    def create_market_sell(self, symbol, base_amount, params=None):
+    def create_market_sell(self, symbol, base_amount, params=None, ref_price=None):
         return {"id": "demo_sell", "amount": base_amount}
     def fetch_balance(self):
         return {"free": {"ETH": 0}}
@@ -1,37 +1,89 @@
+import asyncio
 import time
 import numpy as np
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
+from core.async_exchange import IAsyncExchange
 from core.exchange_base import IExchange
+from core.market_snapshot import MarketSnapshot, MarketSnapshotProvider
+from core.order_manager import OrderManager
 from config.settings import Settings
-from utils.indicators import macd_cross_golden
-from utils.state import PositionState, StateStore, TradeLedger
+from utils.indicators import StreamingMACD
+from utils.candle_store import CandleStore
+from utils.metrics import REGISTRY, InstrumentedLedger, instrument_exchange, timed_stage
+from utils.tracing import TRACER
+from utils.ohlcv_buffer import OHLCVRingBuffer, is_strictly_increasing, timeframe_to_ms
+from utils.state import PositionState, StateStore, TradeCursor, open_ledger
 
 
 class BaseStrategy:
     def __init__(self, exchange: IExchange, settings: Settings, logger):
+        self.metrics = REGISTRY
+        self.tracer = TRACER
+        exchange = instrument_exchange(exchange)
         self.exchange = exchange
         self.settings = settings
         self.logger = logger
         self.symbol = settings.symbol
         self.store = StateStore(settings)
-        self.ledger = TradeLedger(settings)
+        self.ledger = open_ledger(settings)
+        if self.metrics.enabled:
+            self.ledger = InstrumentedLedger(self.ledger, self.symbol)
+        self.trade_cursor = TradeCursor(settings, self.symbol)
         self.state = self.store.load()
-        self._ohlcv_cache: List[List[float]] = []
+        self.orders = OrderManager(exchange, self.symbol, self.state, self.store, self._on_order_fill,
+                                   settings.order_timeout_sec, settings.order_stale_action, settings.order_max_reprices, logger=logger)
+        self._market = MarketSnapshotProvider(exchange, settings.snapshot_max_age_ms)
         self._ohlcv_limit = 200
+        self._ohlcv_cache = OHLCVRingBuffer(self._ohlcv_limit)
         self._timeframe = settings.sigma_macd_timeframe
+        self._macd = StreamingMACD()
+        self._candle_store = CandleStore(settings.candle_store_dir) if settings.candle_store_dir else None
+        self._ohlcv_warm_started = False
         self._bootstrap_state()
 
+    def _capture_snapshot(self) -> MarketSnapshot:
+        return self._market.capture(self.symbol)
+
     def _get_latest_price(self) -> float:
-        t = self.exchange.fetch_ticker(self.symbol)
-        return float(t.get("last", 0.0))
+        return self._market.get(self.symbol).last
 
     def _compute_limit_prices(self):
-        t = self.exchange.fetch_ticker(self.symbol)
-        bid = float(t.get("bid", t.get("last", 0.0)))
-        ask = float(t.get("ask", t.get("last", 0.0)))
-        bp = bid * (1.0 - self.settings.limit_slippage_pct)
-        sp = ask * (1.0 + self.settings.limit_slippage_pct)
+        snap = self._market.get(self.symbol)
+        bp = snap.bid * (1.0 - self.settings.limit_slippage_pct)
+        sp = snap.ask * (1.0 + self.settings.limit_slippage_pct)
         return bp, sp
+
+    def _reprice_order(self, order: Dict[str, Any]) -> Optional[float]:
+        """超时挂单的新价格：按当前盘口重新计算限价，返回 None 则撤单"""
+        bp, sp = self._compute_limit_prices()
+        return bp if order["side"] == "buy" else sp
+
+    def _on_order_fill(self, side: str, amount: float, price: float, order_id: str):
+        """OrderManager 对账发现的新增成交，按成交量和成交均价记入持仓与流水"""
+        st = self.state
+        if side == "buy":
+            total = st.base_amount + amount
+            st.avg_cost = (st.avg_cost * st.base_amount + price * amount) / total if total > 0 else price
+            st.base_amount = total
+        else:
+            st.base_amount = max(0.0, st.base_amount - amount)
+            if st.base_amount <= 0:
+                st.avg_cost = 0.0
+        self.store.save(st)
+        self.ledger.record(side, self.symbol, price, amount, 0.0, order_id)
+        self.logger.info(f"FILL {side.upper()}-LIMIT {self.symbol} price={price:.6f} amount={amount:.8f} pos={st.base_amount:.8f} order_id={order_id}")
+
+    def _sync_orders(self):
+        try:
+            self.orders.sync()
+        except Exception as e:
+            self.logger.warning(f"order sync {self.symbol} failed: {e}")
+
+    def _expire_orders(self):
+        try:
+            self.orders.expire(self._reprice_order)
+        except Exception as e:
+            self.logger.warning(f"order expire {self.symbol} failed: {e}")
     
     def _bootstrap_state(self):
         try:
@@ -70,22 +122,10 @@ class BaseStrategy:
                         self.store.save(self.state)
                 return
             if self.state.avg_cost <= 0.0:
-                trades = self.exchange.fetch_my_trades(self.symbol, None)
-                buy_amt = 0.0
-                sell_amt = 0.0
-                buy_cost = 0.0
-                for t in trades:
-                    side = t.get("side", "")
-                    amount = float(t.get("amount", 0.0) or 0.0)
-                    price = float(t.get("price", 0.0) or 0.0)
-                    if side == "buy":
-                        buy_amt += amount
-                        buy_cost += amount * price
-                    elif side == "sell":
-                        sell_amt += amount
-                net_amt = buy_amt - sell_amt
+                self.trade_cursor.sync(self.exchange)
+                avg, net_amt = self.trade_cursor.position()
                 if net_amt > 0:
-                    self.state.avg_cost = buy_cost / net_amt
+                    self.state.avg_cost = avg
                     self.state.base_amount = net_amt
                     self.store.save(self.state)
                 else:
@@ -99,22 +139,10 @@ class BaseStrategy:
     
     def _rebuild_avg_cost_from_exchange_trades(self):
         try:
-            trades = self.exchange.fetch_my_trades(self.symbol, None)
-            buy_amt = 0.0
-            sell_amt = 0.0
-            buy_cost = 0.0
-            for t in trades:
-                side = t.get("side", "")
-                amount = float(t.get("amount", 0.0) or 0.0)
-                price = float(t.get("price", 0.0) or 0.0)
-                if side == "buy":
-                    buy_amt += amount
-                    buy_cost += amount * price
-                elif side == "sell":
-                    sell_amt += amount
-            net_amt = buy_amt - sell_amt
+            self.trade_cursor.sync(self.exchange)
+            avg, net_amt = self.trade_cursor.position()
             if net_amt > 0:
-                self.state.avg_cost = buy_cost / net_amt
+                self.state.avg_cost = avg
                 self.state.base_amount = net_amt
                 self.store.save(self.state)
             else:
@@ -126,27 +154,16 @@ class BaseStrategy:
         except Exception:
             pass
     
-    def get_open_avg_cost(self) -> float:
+    def get_open_avg_cost(self, trades: Optional[List[Dict[str, Any]]] = None) -> float:
         try:
             if self.settings.dry_run:
                 avg, amt = self.ledger.rebuild_position(self.symbol)
                 return avg if amt > 0 else 0.0
-            trades = self.exchange.fetch_my_trades(self.symbol, None)
-            buy_amt = 0.0
-            sell_amt = 0.0
-            buy_cost = 0.0
-            for t in trades:
-                side = t.get("side", "")
-                amount = float(t.get("amount", 0.0) or 0.0)
-                price = float(t.get("price", 0.0) or 0.0)
-                if side == "buy":
-                    buy_amt += amount
-                    buy_cost += amount * price
-                elif side == "sell":
-                    sell_amt += amount
-            net_amt = buy_amt - sell_amt
+            # trades 是调用方按 trade_cursor.since 已经取回的第一页新成交，满页时 sync 继续往后翻
+            self.trade_cursor.sync(self.exchange, trades)
+            avg, net_amt = self.trade_cursor.position()
             if net_amt > 0:
-                return buy_cost / net_amt
+                return avg
             avg, amt = self.ledger.rebuild_position(self.symbol)
             return avg if amt > 0 else 0.0
         except Exception:
@@ -156,35 +173,123 @@ class BaseStrategy:
         if self.settings.dry_run:
             return
         try:
-            b = self.exchange.fetch_balance()
-            base = self.symbol.split("/")[0]
-            bal = float(b.get("free", {}).get(base, 0.0) or 0.0)
-            self.state.base_amount = bal
-            self.state.avg_cost = self.get_open_avg_cost()
-            if self.state.base_amount <= 0 and self.state.avg_cost > 0:
-                self.state.avg_cost = 0.0
-                self.store.save(self.state)
+            self._apply_balance(self.exchange.fetch_balance(), None)
         except Exception:
             pass
 
-    def _update_ohlcv_cache(self):
-        if not self._ohlcv_cache:
-            data = self.exchange.fetch_ohlcv(self.symbol, self._timeframe, None, self._ohlcv_limit)
-            if data:
-                self._ohlcv_cache = data
+    async def _refresh_state_from_balance_async(self, aexchange: IAsyncExchange):
+        if self.settings.dry_run:
             return
-        latest = self.exchange.fetch_ohlcv(self.symbol, self._timeframe, None, 1)
-        if not latest:
+        try:
+            b, trades = await asyncio.gather(aexchange.fetch_balance(), aexchange.fetch_my_trades(self.symbol, self.trade_cursor.since))
+            # 成交满页时 sync 还要继续翻页、每页落盘，放到线程里，不占用所有交易对共用的事件循环
+            await asyncio.to_thread(self._apply_balance, b, trades)
+        except Exception:
+            pass
+
+    def _apply_balance(self, b: Dict[str, Any], trades: Optional[List[Dict[str, Any]]]):
+        base = self.symbol.split("/")[0]
+        bal = float(b.get("free", {}).get(base, 0.0) or 0.0)
+        # 挂着的卖单冻结的部分仍是持仓
+        self.state.base_amount = bal + self.orders.pending("sell")
+        self.state.avg_cost = self.get_open_avg_cost(trades)
+        if self.state.base_amount <= 0 and self.state.avg_cost > 0:
+            self.state.avg_cost = 0.0
+            self.store.save(self.state)
+
+    def _candle_series(self):
+        if self._candle_store is None:
+            return None
+        return self._candle_store.series(self.symbol, self._timeframe)
+
+    def _persist_candles(self, data):
+        series = self._candle_series()
+        if series is None:
             return
-        candle = latest[0]
-        ts = candle[0]
-        if self._ohlcv_cache and self._ohlcv_cache[-1][0] == ts:
-            self._ohlcv_cache[-1] = candle
-        else:
+        try:
+            series.append(data)
+        except Exception as e:
+            self.logger.warning(f"candle store {self.symbol} {self._timeframe} append failed: {e}")
+
+    def _warm_start_ohlcv_cache(self) -> bool:
+        series = self._candle_series()
+        if series is None:
+            return False
+        tf_ms = timeframe_to_ms(self._timeframe)
+        rows = series.tail(self._ohlcv_limit)
+        if rows.shape[0] < 2 or int(time.time() * 1000) - int(rows[-1, 0]) >= self._ohlcv_limit * tf_ms:
+            return False
+        if not (rows[1:, 0] - rows[:-1, 0] == tf_ms).all():
+            return False
+        self._ohlcv_cache.extend(rows)
+        self._macd.seed(rows[:, 4])
+        return True
+
+    def _ohlcv_request(self) -> Tuple[Optional[int], int]:
+        """
+        下一次该向交易所要的K线窗口 (since, limit)，since 为 None 表示全量重载。
+        进程启动时先用本地K线库热启动，只向交易所要缺的那一段；之后的重载都走全量
+        """
+        if not self._ohlcv_cache and not self._ohlcv_warm_started:
+            self._ohlcv_warm_started = True
+            self._warm_start_ohlcv_cache()
+        if not self._ohlcv_cache:
+            return None, self._ohlcv_limit
+        tf_ms = timeframe_to_ms(self._timeframe)
+        last_ts = self._ohlcv_cache.last_ts
+        now_ms = int(time.time() * 1000)
+        missing = max(0, (now_ms - last_ts) // tf_ms)
+        if missing >= self._ohlcv_limit:
+            return None, self._ohlcv_limit
+        # 从缓存最后一根开始按 since 取增量：刷新最后一根的收盘值，同时补齐轮询间隔里漏掉的K线；多取一根容忍时钟偏差
+        return last_ts, int(missing) + 2
+
+    @timed_stage("indicators")
+    def _apply_ohlcv(self, since: Optional[int], data) -> bool:
+        """合并 _ohlcv_request 取回的K线，返回 False 表示增量对不上，需要再做一次全量重载"""
+        if since is None:
+            self._ohlcv_cache.clear()
+            self._macd.reset()
+            if not data:
+                return True
+            if not is_strictly_increasing(data):
+                self.logger.warning(f"ohlcv {self.symbol} {self._timeframe} reload rejected: timestamps not increasing")
+                return True
+            self._ohlcv_cache.extend(data)
+            self._macd.seed([c[4] for c in data])
+            self._persist_candles(data)
+            return True
+        if not data:
+            return True
+        if not is_strictly_increasing(data):
+            self.logger.warning(f"ohlcv {self.symbol} {self._timeframe} delta rejected: timestamps not increasing")
+            return False
+        self._persist_candles(data)
+        tf_ms = timeframe_to_ms(self._timeframe)
+        for candle in data:
+            ts = int(candle[0])
+            last_ts = self._ohlcv_cache.last_ts
+            if ts < last_ts:
+                continue
+            if ts == last_ts:
+                self._ohlcv_cache.replace_last(candle)
+                self._macd.replace_last(candle[4])
+                continue
+            if ts - last_ts != tf_ms:
+                self.logger.warning(f"ohlcv {self.symbol} {self._timeframe} gap {last_ts} -> {ts}, reloading")
+                return False
             self._ohlcv_cache.append(candle)
-            if len(self._ohlcv_cache) > self._ohlcv_limit:
-                self._ohlcv_cache.pop(0)
+            self._macd.append(candle[4])
+        return True
 
+    def _update_ohlcv_cache(self):
+        since, limit = self._ohlcv_request()
+        data = self.exchange.fetch_ohlcv(self.symbol, self._timeframe, since, limit)
+        if not self._apply_ohlcv(since, data):
+            data = self.exchange.fetch_ohlcv(self.symbol, self._timeframe, None, self._ohlcv_limit)
+            self._apply_ohlcv(None, data)
+
+    @timed_stage("order")
     def _buy_base_amount_eth(self, base_amount: float):
         if base_amount <= 0.0:
             return
@@ -201,7 +306,7 @@ class BaseStrategy:
                 self.logger.info(
                     f"BUY-LIMIT {self.symbol} price={price:.6f} amount={base_amount:.8f} pos={self.state.base_amount:.8f}")
                 return
-            o = self.exchange.create_limit_buy(self.symbol, base_amount, price, {})
+            o = self.orders.place("buy", base_amount, price)
             self.logger.info(
                 f"PLACE BUY-LIMIT {self.symbol} price={price:.6f} amount={base_amount:.8f} order_id={o.get('id', '')}")
             return
@@ -217,7 +322,7 @@ class BaseStrategy:
                     f"BUY {self.symbol} price={last_price:.6f} amount={base_amount:.8f} pos={self.state.base_amount:.8f}")
                 return
             quote_cost = base_amount * last_price
-            o = self.exchange.create_market_buy(self.symbol, quote_cost, {})
+            o = self.exchange.create_market_buy(self.symbol, quote_cost, {}, ref_price=last_price)
             amt = float(o.get("amount", 0.0) or 0.0)
             price = last_price
             if amt > 0:
@@ -225,6 +330,7 @@ class BaseStrategy:
                 self.ledger.record("buy", self.symbol, price, amt, 0.0, o.get("id", ""))
             self.logger.info(f"BUY {self.symbol} price={price:.6f} amount={amt:.8f} pos={self.state.base_amount:.8f}")
 
+    @timed_stage("order")
     def _sell_but_keep_base(self, base_keep: float):
         base_amount = self.state.base_amount
         if base_amount <= base_keep:
@@ -239,13 +345,16 @@ class BaseStrategy:
                 self.ledger.record("sell", self.symbol, price, sell_amount, 0.0, "")
                 self.logger.info(
                     f"SELL-LIMIT {self.symbol} price={price:.6f} amount={sell_amount:.8f} realized={realized:.6f}")
-            else:
-                print(self.state.base_amount, sell_amount, price)
-                o = self.exchange.create_limit_sell(self.symbol, sell_amount, price, {})
-                self.logger.info(
-                    f"PLACE SELL-LIMIT {self.symbol} price={price:.6f} amount={sell_amount:.8f} order_id={o.get('id', '')}")
-            self.state.base_amount = base_keep
-            self.store.save(self.state)
+                self.state.base_amount = base_keep
+                self.store.save(self.state)
+                return
+            # 实盘：持仓等成交后由 OrderManager 扣减；已挂着的卖单不重复下
+            sell_amount -= self.orders.pending("sell")
+            if sell_amount <= 0:
+                return
+            o = self.orders.place("sell", sell_amount, price)
+            self.logger.info(
+                f"PLACE SELL-LIMIT {self.symbol} price={price:.6f} amount={sell_amount:.8f} order_id={o.get('id', '')}")
             return
         else:
             price = last_price
@@ -255,12 +364,98 @@ class BaseStrategy:
                 self.logger.info(
                     f"SELL {self.symbol} price={price:.6f} amount={sell_amount:.8f} realized={realized:.6f}")
             else:
-                o = self.exchange.create_market_sell(self.symbol, sell_amount, {})
+                o = self.exchange.create_market_sell(self.symbol, sell_amount, {}, ref_price=price)
                 realized = sell_amount * (price - self.state.avg_cost) if self.state.avg_cost > 0 else 0.0
                 self.ledger.record("sell", self.symbol, price, sell_amount, 0.0, o.get("id", ""))
                 self.logger.info(f"SELL {self.symbol} price={price:.6f} amount={sell_amount:.8f} realized={realized:.6f}")
             self.state.base_amount = base_keep
             self.store.save(self.state)
 
-    def run(self):
+    def _on_tick(self, snap: MarketSnapshot):
+        pass
+
+    def _after_tick(self, snap: MarketSnapshot):
         pass
+
+    def tick(self):
+        m, tr = self.metrics, self.tracer
+        try:
+            # 先对账挂单再读余额：买单新成交已经在余额里，顺序反了会记两次
+            if self.orders.orders:
+                with m.stage(self.symbol, "order_sync"), tr.span("order_sync"):
+                    self._sync_orders()
+            with m.stage(self.symbol, "refresh_state"), tr.span("refresh_state"):
+                self._refresh_state_from_balance()
+            with m.stage(self.symbol, "ohlcv_sync"), tr.span("ohlcv_sync"):
+                self._update_ohlcv_cache()
+            with m.stage(self.symbol, "ticker"), tr.span("ticker"):
+                snap = self._capture_snapshot()
+            if self.orders.orders:
+                with m.stage(self.symbol, "order_expire"), tr.span("order_expire"):
+                    self._expire_orders()
+            with m.stage(self.symbol, "decide"), tr.span("decide", price=snap.last):
+                self._on_tick(snap)
+            with m.stage(self.symbol, "after_tick"), tr.span("after_tick"):
+                self._after_tick(snap)
+        finally:
+            # 一轮里的多次 save 合并成一次落盘
+            with m.stage(self.symbol, "state_flush"), tr.span("state_flush"):
+                self.store.flush()
+
+    async def tick_async(self, aexchange: IAsyncExchange, order_lock: asyncio.Lock):
+        """
+        和 tick() 一样的一轮，但持仓、K线、ticker 三类请求并发发出；
+        挂单对账、超时处理、决策与下单放到线程里执行，并在同一段 order_lock 内串行，避免多个策略同时下单。
+        有挂单时余额要在对账之后读，这一轮的持仓查询挪到锁内对账之后
+        """
+        async def update_ohlcv():
+            since, limit = self._ohlcv_request()
+            data = await aexchange.fetch_ohlcv(self.symbol, self._timeframe, since, limit)
+            # 合并K线会写本地K线库，同样放到线程里
+            if not await asyncio.to_thread(self._apply_ohlcv, since, data):
+                data = await aexchange.fetch_ohlcv(self.symbol, self._timeframe, None, self._ohlcv_limit)
+                await asyncio.to_thread(self._apply_ohlcv, None, data)
+
+        async def traced(name, aw):
+            with self.tracer.span(name):
+                return await aw
+
+        def timed(stage, fn, *args):
+            def call():
+                with self.metrics.stage(self.symbol, stage), self.tracer.span(stage):
+                    return fn(*args)
+            return call
+
+        try:
+            has_orders = bool(self.orders.orders)
+            fetches = [traced("ticker", aexchange.fetch_ticker(self.symbol)), traced("ohlcv_sync", update_ohlcv())]
+            if not has_orders:
+                fetches.append(traced("refresh_state", self._refresh_state_from_balance_async(aexchange)))
+            with self.metrics.stage(self.symbol, "fetch"), self.tracer.span("fetch"):
+                ticker = (await asyncio.gather(*fetches))[0]
+            snap = self._market.update(self.symbol, ticker)
+            async with order_lock:
+                if has_orders:
+                    # 先对账挂单再读余额：买单新成交已经在余额里，顺序反了会记两次
+                    await asyncio.to_thread(timed("order_sync", self._sync_orders))
+                    await traced("refresh_state", self._refresh_state_from_balance_async(aexchange))
+                    await asyncio.to_thread(timed("order_expire", self._expire_orders))
+                await asyncio.to_thread(timed("decide", self._on_tick, snap))
+            await asyncio.to_thread(timed("after_tick", self._after_tick, snap))
+        finally:
+            await asyncio.to_thread(timed("state_flush", self.store.flush))
+
+    def run(self):
+        prev_start = 0.0
+        while True:
+            start = time.monotonic()
+            if prev_start:
+                self.metrics.lag(self.symbol, start - prev_start - self.settings.poll_interval_sec)
+            prev_start = start
+            try:
+                with self.metrics.loop(self.symbol), self.tracer.trace("tick", symbol=self.symbol):
+                    self.tick()
+            except Exception as e:
+                self.metrics.loop_error(self.symbol)
+                self.logger.error(str(e))
+            time.sleep(self.settings.poll_interval_sec)
@@ -1,42 +1,37 @@
-import logging
+import asyncio
 import time
-import math
-from typing import Dict, Any, List
-import numpy as np
+from typing import Dict, Any, List, Optional
+from core.async_exchange import IAsyncExchange
 from core.exchange_base import IExchange
+from core.market_snapshot import MarketSnapshot
 from config.settings import Settings
-from utils.indicators import macd_cross_golden, compute_prev_day_1h_baseline
-from utils.state import PositionState, StateStore, TradeLedger
+from utils.indicators import compute_prev_day_1h_baseline
+from utils.metrics import timed_stage
+from strategie.BaseStrategy import BaseStrategy
 
-class MartingaleMACDSpotStrategy:
+class MartingaleMACDSpotStrategy(BaseStrategy):
     def __init__(self, exchange: IExchange, settings: Settings, logger):
-        self.exchange = exchange
-        self.settings = settings
-        self.logger = logger
-        self.symbol = settings.symbol
-        self.store = StateStore(settings)
-        self.ledger = TradeLedger(settings)
-        self.state = self.store.load()
-        self._ohlcv_cache: List[List[float]] = []
-        self._ohlcv_limit = 200
+        super().__init__(exchange, settings, logger)
         self._timeframe = "5m"
         self._baseline_cache: float = 0.0
         self._baseline_last_ts: float = 0.0
-        self._bootstrap_state()
-
-    def _get_latest_price(self) -> float:
-        t = self.exchange.fetch_ticker(self.symbol)
-        return float(t["last"])
 
     def _refresh_state_from_balance(self):
         if self.settings.dry_run:
             return
-        b = self.exchange.fetch_balance()
+        self._apply_balance(self.exchange.fetch_balance(), None)
+
+    async def _refresh_state_from_balance_async(self, aexchange: IAsyncExchange):
+        if self.settings.dry_run:
+            return
+        b = await aexchange.fetch_balance()
+        await asyncio.to_thread(self._apply_balance, b, None)
+
+    def _apply_balance(self, b: Dict[str, Any], trades: Optional[List[Dict[str, Any]]]):
         base = self.symbol.split("/")[0]
-        bal = round(b.get("free", {}).get(base), 3)
-        if bal is None:
-            bal = 0.0
-        self.state.base_amount = float(bal)
+        bal = round(float(b.get("free", {}).get(base) or 0.0), 3)
+        # 挂着的卖单冻结的部分仍是持仓
+        self.state.base_amount = bal + self.orders.pending("sell")
         if self.state.base_amount <= 0 and self.state.avg_cost > 0:
             self.state.avg_cost = 0.0
             self.store.save(self.state)
@@ -77,22 +72,10 @@ class MartingaleMACDSpotStrategy:
                         self.store.save(self.state)
                 return
             if self.state.avg_cost <= 0.0:
-                trades = self.exchange.fetch_my_trades(self.symbol, None)
-                buy_amt = 0.0
-                sell_amt = 0.0
-                buy_cost = 0.0
-                for t in trades:
-                    side = t.get("side", "")
-                    amount = float(t.get("amount", 0.0))
-                    price = float(t.get("price", 0.0))
-                    if side == "buy":
-                        buy_amt += amount
-                        buy_cost += amount * price
-                    elif side == "sell":
-                        sell_amt += amount
-                net_amt = buy_amt - sell_amt
+                self.trade_cursor.sync(self.exchange)
+                avg, net_amt = self.trade_cursor.position()
                 if net_amt > 0:
-                    self.state.avg_cost = buy_cost / net_amt
+                    self.state.avg_cost = avg
                     self.state.base_amount = net_amt
                     self.store.save(self.state)
                 else:
@@ -109,14 +92,7 @@ class MartingaleMACDSpotStrategy:
             return 0.0
         return (last_price - self.state.avg_cost) / self.state.avg_cost
 
-    def _compute_limit_prices(self):
-        t = self.exchange.fetch_ticker(self.symbol)
-        bid = float(t.get("bid", t.get("last", 0.0)))
-        ask = float(t.get("ask", t.get("last", 0.0)))
-        bp = bid * (1.0 - self.settings.limit_slippage_pct)
-        sp = ask * (1.0 + self.settings.limit_slippage_pct)
-        return bp, sp
-
+    @timed_stage("order")
     def _buy_quote_cost_usdt(self, usdt_cost: float):
         if self.settings.order_type == "limit":
             bp, _ = self._compute_limit_prices()
@@ -131,7 +107,7 @@ class MartingaleMACDSpotStrategy:
                 return
             price = bp
             base_amount = usdt_cost / price
-            o = self.exchange.create_limit_buy(self.symbol, base_amount, price, {})
+            o = self.orders.place("buy", base_amount, price)
             self.logger.info(f"PLACE BUY-LIMIT {self.symbol} price={price:.6f} amount={base_amount:.8f} order_id={o.get('id','')}")
             return
         else:
@@ -144,7 +120,7 @@ class MartingaleMACDSpotStrategy:
                 self.ledger.record("buy", self.symbol, last_price, base_amount, 0.0, "")
                 self.logger.info(f"BUY {self.symbol} price={last_price:.6f} amount={base_amount:.8f} pos={self.state.base_amount:.8f} pnl={self._pnl_ratio(last_price):.5f}")
                 return
-            o = self.exchange.create_market_buy(self.symbol, usdt_cost, {})
+            o = self.exchange.create_market_buy(self.symbol, usdt_cost, {}, ref_price=self._get_latest_price())
             last_price = float(self._get_latest_price())
             base_amount = float(o.get("amount", 0.0)) if o else 0.0
             if base_amount > 0:
@@ -154,6 +130,7 @@ class MartingaleMACDSpotStrategy:
                 self.ledger.record("buy", self.symbol, last_price, base_amount, 0.0, o.get("id", ""))
             self.logger.info(f"BUY {self.symbol} price={last_price:.6f} amount={base_amount:.8f} pos={self.state.base_amount:.8f} pnl={self._pnl_ratio(last_price):.5f}")
 
+    @timed_stage("order")
     def _sell_all(self):
         last_price = self._get_latest_price()
         base_amount = self.state.base_amount
@@ -167,15 +144,19 @@ class MartingaleMACDSpotStrategy:
                 self.ledger.record("sell", self.symbol, price, base_amount, 0.0, "")
                 self.logger.info(f"SELL-LIMIT {self.symbol} price={price:.6f} amount={base_amount:.8f} realized={realized:.6f}")
             else:
-                o = self.exchange.create_limit_sell(self.symbol, base_amount, sp, {})
-                self.logger.info(f"PLACE SELL-LIMIT {self.symbol} price={sp:.6f} amount={base_amount:.8f} order_id={o.get('id','')}")
+                # 实盘：持仓等成交后由 OrderManager 扣减
+                base_amount -= self.orders.pending("sell")
+                if base_amount > 0:
+                    o = self.orders.place("sell", base_amount, sp)
+                    self.logger.info(f"PLACE SELL-LIMIT {self.symbol} price={sp:.6f} amount={base_amount:.8f} order_id={o.get('id','')}")
+                return
         else:
             if self.settings.dry_run:
                 realized = base_amount * (last_price - self.state.avg_cost)
                 self.ledger.record("sell", self.symbol, last_price, base_amount, 0.0, "")
                 self.logger.info(f"SELL {self.symbol} price={last_price:.6f} amount={base_amount:.8f} realized={realized:.6f}")
             else:
-                o = self.exchange.create_market_sell(self.symbol, base_amount, {})
+                o = self.exchange.create_market_sell(self.symbol, base_amount, {}, ref_price=last_price)
                 realized = base_amount * (last_price - self.state.avg_cost)
                 self.ledger.record("sell", self.symbol, last_price, base_amount, 0.0, o.get("id", ""))
                 self.logger.info(f"SELL {self.symbol} price={last_price:.6f} amount={base_amount:.8f} realized={realized:.6f}")
@@ -183,6 +164,7 @@ class MartingaleMACDSpotStrategy:
         self.state.avg_cost = 0.0
         self.store.save(self.state)
 
+    @timed_stage("order")
     def _sell_all_but_remain_some_usdt(self):
         """
         逻辑和 _sell_all() 一样， 不同的是是这个函数是卖出所有 但保留0.5usdt的仓位
@@ -204,8 +186,11 @@ class MartingaleMACDSpotStrategy:
                 self.ledger.record("sell", self.symbol, price, sell_amount, 0.0, "")
                 self.logger.info(f"SELL-LIMIT {self.symbol} price={price:.6f} amount={sell_amount:.8f} realized={realized:.6f}")
             else:
-                o = self.exchange.create_limit_sell(self.symbol, sell_amount, price, {})
-                self.logger.info(f"PLACE SELL-LIMIT {self.symbol} price={price:.6f} amount={sell_amount:.8f} order_id={o.get('id','')}")
+                sell_amount -= self.orders.pending("sell")
+                if sell_amount > 0:
+                    o = self.orders.place("sell", sell_amount, price)
+                    self.logger.info(f"PLACE SELL-LIMIT {self.symbol} price={price:.6f} amount={sell_amount:.8f} order_id={o.get('id','')}")
+                return
             self.state.base_amount = base_keep
             self.store.save(self.state)
         else:
@@ -219,7 +204,7 @@ class MartingaleMACDSpotStrategy:
                 self.ledger.record("sell", self.symbol, price, sell_amount, 0.0, "")
                 self.logger.info(f"SELL {self.symbol} price={price:.6f} amount={sell_amount:.8f} realized={realized:.6f}")
             else:
-                o = self.exchange.create_market_sell(self.symbol, sell_amount, {})
+                o = self.exchange.create_market_sell(self.symbol, sell_amount, {}, ref_price=price)
                 realized = sell_amount * (price - self.state.avg_cost)
                 self.ledger.record("sell", self.symbol, price, sell_amount, 0.0, o.get("id", ""))
                 self.logger.info(f"SELL {self.symbol} price={price:.6f} amount={sell_amount:.8f} realized={realized:.6f}")
@@ -239,8 +224,7 @@ class MartingaleMACDSpotStrategy:
             cost = add_amount * last_price
             self._buy_quote_cost_usdt(cost)
             return
-        ticker = self.exchange.fetch_ticker(self.symbol)
-        price = float(ticker["last"])
+        price = self._get_latest_price()
         cost = add_amount * price
         self._buy_quote_cost_usdt(cost)
 
@@ -259,45 +243,19 @@ class MartingaleMACDSpotStrategy:
             return
         self._sell_all()
 
-    def _update_ohlcv_cache(self):
-        if not self._ohlcv_cache:
-            data = self.exchange.fetch_ohlcv(self.symbol, self._timeframe, None, self._ohlcv_limit)
-            if data:
-                self._ohlcv_cache = data
-            return
-        latest = self.exchange.fetch_ohlcv(self.symbol, self._timeframe, None, 1)
-        if not latest:
-            return
-        candle = latest[0]
-        ts = candle[0]
-        if self._ohlcv_cache and self._ohlcv_cache[-1][0] == ts:
-            self._ohlcv_cache[-1] = candle
-        else:
-            self._ohlcv_cache.append(candle)
-            if len(self._ohlcv_cache) > self._ohlcv_limit:
-                self._ohlcv_cache.pop(0)
-
+    @timed_stage("indicators")
     def _get_cached_baseline(self) -> float:
         now = time.time()
         if self._baseline_last_ts <= 0 or (now - self._baseline_last_ts) >= 3600:
-            self._baseline_cache = compute_prev_day_1h_baseline(self.exchange, self.symbol, self.settings.timezone)
+            self._baseline_cache = compute_prev_day_1h_baseline(self.exchange, self.symbol, self.settings.timezone, self._candle_store)
             self._baseline_last_ts = now
         return self._baseline_cache
 
-    def run(self):
-        while True:
-            try:
-                self._refresh_state_from_balance()
-                baseline = self._get_cached_baseline()
-                self._update_ohlcv_cache()
-                closes = np.array([c[4] for c in self._ohlcv_cache], dtype=float) if self._ohlcv_cache else np.array([], dtype=float)
-                golden_cross = macd_cross_golden(closes) if closes.size > 0 else False
-                last_price = self._get_latest_price()
-                self.logger.info(f"state:{self.state}")
-                self._initial_buy_if_needed(last_price, baseline)
-                self._martingale_buy_if_needed(last_price, golden_cross)
-                self._take_profit_if_needed(last_price)
-                time.sleep(self.settings.poll_interval_sec)
-            except Exception as e:
-                self.logger.error(str(e))
-                time.sleep(self.settings.poll_interval_sec)
+    def _on_tick(self, snap: MarketSnapshot):
+        baseline = self._get_cached_baseline()
+        golden_cross = self._macd.golden_cross()
+        last_price = snap.last
+        self.logger.info(f"state:{self.state}")
+        self._initial_buy_if_needed(last_price, baseline)
+        self._martingale_buy_if_needed(last_price, golden_cross)
+        self._take_profit_if_needed(last_price)
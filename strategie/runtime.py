@@ -0,0 +1,72 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Type
+from config.symbols import SymbolConfig
+from core.async_exchange import IAsyncExchange
+from core.exchange_base import IExchange
+from strategie.BaseStrategy import BaseStrategy
+from strategie.martingale_macd_spot import MartingaleMACDSpotStrategy
+from strategie.sigma_spot import SigmaSpotStrategy
+from utils.logging import symbol_logger
+
+STRATEGY_CLASSES: Dict[str, Type[BaseStrategy]] = {
+    "sigma": SigmaSpotStrategy,
+    "martingale": MartingaleMACDSpotStrategy,
+}
+
+
+def build_strategies(exchange: IExchange, configs: List[SymbolConfig], logger) -> List[BaseStrategy]:
+    strategies = []
+    for cfg in configs:
+        cls = STRATEGY_CLASSES.get(cfg.strategy)
+        if cls is None:
+            raise ValueError(f"unknown strategy: {cfg.strategy}")
+        strategies.append(cls(exchange=exchange, settings=cfg.settings, logger=symbol_logger(logger, cfg.symbol)))
+    return strategies
+
+
+class AsyncStrategyRuntime:
+    """
+    多个策略实例共用一个事件循环：每个策略一个任务，各自按 poll_interval_sec 轮询，
+    行情/持仓请求并发，下单共用一把锁串行
+    """
+
+    def __init__(self, aexchange: IAsyncExchange, strategies: Optional[List[BaseStrategy]] = None):
+        self.aexchange = aexchange
+        self.strategies: List[BaseStrategy] = list(strategies or [])
+        self.order_lock: Optional[asyncio.Lock] = None
+
+    def add(self, strategy: BaseStrategy):
+        self.strategies.append(strategy)
+
+    async def _loop(self, strategy: BaseStrategy, iterations: Optional[int], offset: float):
+        if offset > 0:
+            await asyncio.sleep(offset)
+        n = 0
+        prev_start = 0.0
+        while iterations is None or n < iterations:
+            start = time.monotonic()
+            if prev_start:
+                strategy.metrics.lag(strategy.symbol, start - prev_start - strategy.settings.poll_interval_sec)
+            prev_start = start
+            try:
+                with strategy.metrics.loop(strategy.symbol), strategy.tracer.trace("tick", symbol=strategy.symbol):
+                    await strategy.tick_async(self.aexchange, self.order_lock)
+            except Exception as e:
+                strategy.metrics.loop_error(strategy.symbol)
+                strategy.logger.error(str(e))
+            n += 1
+            if iterations is None or n < iterations:
+                await asyncio.sleep(strategy.settings.poll_interval_sec)
+
+    async def run_async(self, iterations: Optional[int] = None, stagger: bool = True):
+        # 按轮询间隔把各策略的起始时刻错开，避免几十个交易对同一时刻一起打交易所
+        self.order_lock = asyncio.Lock()
+        n = len(self.strategies)
+        await asyncio.gather(*(
+            self._loop(s, iterations, i * s.settings.poll_interval_sec / n if stagger else 0.0)
+            for i, s in enumerate(self.strategies)
+        ))
+
+    def run(self, iterations: Optional[int] = None, stagger: bool = True):
+        asyncio.run(self.run_async(iterations, stagger))
@@ -1,67 +1,137 @@
 import time
-import numpy as np
-from typing import List
+from typing import Dict, List, Tuple
 from core.exchange_base import IExchange
+from core.market_snapshot import MarketSnapshot
 from config.settings import Settings
-from utils.indicators import macd_cross_golden
 from utils.state import PositionState, StateStore, TradeLedger
 from strategie.BaseStrategy import BaseStrategy
+from utils.metrics import timed_stage
+from utils.ladder import ladder_levels
+from utils.logging import Lazy, log_fields
 
 
 class SigmaSpotStrategy(BaseStrategy):
-    def run(self):
-        while True:
-            try:
-                # self.logger.info('1')
-                self._refresh_state_from_balance()
-                self._update_ohlcv_cache()
-                closes = np.array([c[4] for c in self._ohlcv_cache], dtype=float) if self._ohlcv_cache else np.array([],
-                                                                                                                     dtype=float)
-                golden_cross = macd_cross_golden(closes) if closes.size > 0 else False
-                last_price = self._get_latest_price()
-                now_ms = int(time.time() * 1000)
-                can_buy_time = (now_ms - int(self.state.last_buy_ms)) >= int(
-                    self.settings.sigma_buy_cooldown_sec) * 1000
-                price_ok = (self.state.base_amount <= 0.0) or (self.state.avg_cost > 0.0 and last_price <= self.state.avg_cost * (1.0 - float(self.settings.sigma_buy_price_drop_pct))) # or last_price <= self.state.avg_cost * (1.0 - 0.01)
-                can_buy = price_ok and can_buy_time and golden_cross and (int(self.state.buy_count) < int(self.settings.sigma_max_adds))
-                if can_buy:
-                    self._buy_base_amount_eth(float(self.settings.sigma_buy_base_eth))
-                    self.state.last_buy_ms = now_ms
-                    self.state.buy_count = int(self.state.buy_count) + 1
-                    self.store.save(self.state)
-                else:
-                    self.logger.info(
-                        f"cant buy: {(price_ok if price_ok else f'({self.state.base_amount} <= 0.0) or ({self.state.avg_cost} > 0.0 and {last_price} <= {self.state.avg_cost} * (1.0 - {float(self.settings.sigma_buy_price_drop_pct)}))',
-                                      can_buy_time if can_buy_time else f'({now_ms} - {int(self.state.last_buy_ms)}) >= {int(self.settings.sigma_buy_cooldown_sec)} * 1000',
-                                      golden_cross if golden_cross else f'{macd_cross_golden(closes)} if {closes.size} > 0 else False',
-                                      (int(self.state.buy_count) < int(self.settings.sigma_max_adds)))}")
-                    # print('cant buy:', price_ok , can_buy_time , golden_cross , (int(self.state.buy_count) < int(self.settings.sigma_max_adds)))
-                prev_bearish = False
-                if len(self._ohlcv_cache) >= 2:
-                    prev = self._ohlcv_cache[-2]
-                    o = float(prev[1])
-                    c = float(prev[4])
-                    prev_bearish = o > c
-                can_sell = (self.state.base_amount >= float(self.settings.sigma_sell_leave_base_eth)) and (
-                            self.state.avg_cost > 0.0 and last_price >= self.state.avg_cost * (
-                                1.0 + float(self.settings.sigma_sell_profit_pct))) and prev_bearish
-                # self._sell_but_keep_base(float(self.settings.sigma_sell_leave_base_eth))
-                if can_sell:
-                    self._sell_but_keep_base(float(self.settings.sigma_sell_leave_base_eth))
-                else:
-                    self.logger.info(
-                        f'cant sell: {(self.state.base_amount >= float(self.settings.sigma_sell_leave_base_eth)) if (self.state.base_amount >= float(self.settings.sigma_sell_leave_base_eth)) else f'({self.state.base_amount} >= float({self.settings.sigma_sell_leave_base_eth}))',
-                        (self.state.avg_cost > 0.0 and last_price >= self.state.avg_cost * (1.0 + float(self.settings.sigma_sell_profit_pct))) if (self.state.avg_cost > 0.0 and last_price >= self.state.avg_cost * (1.0 + float(self.settings.sigma_sell_profit_pct))) else f'({self.state.avg_cost} > 0.0 and {last_price} >= {self.state.avg_cost} * (1.0 + {float(self.settings.sigma_sell_profit_pct)}))',
-                        prev_bearish}')
-                    # print('cant sell:', self.state.base_amount >= float(self.settings.sigma_sell_leave_base_eth), (
-                    #             self.state.avg_cost > 0.0 and last_price >= self.state.avg_cost * (
-                    #                 1.0 + float(self.settings.sigma_sell_profit_pct))), prev_bearish)
-                b = self.exchange.fetch_balance()
-                usdt = float(b.get("free", {}).get("USDT", 0.0) or 0.0)
-                pnl_ratio = ((last_price - self.state.avg_cost) / self.state.avg_cost) if (self.state.avg_cost > 0.0 and self.state.base_amount > 0.0) else 0.0
-                pnl_amount = (self.state.base_amount * (last_price - self.state.avg_cost)) if (self.state.avg_cost > 0.0 and self.state.base_amount > 0.0) else 0.0
-                self.logger.info(f"state:{self.state} price={last_price:.6f} pnl_ratio={pnl_ratio:.6f} pnl_amount={pnl_amount:.6f} usdt_free={usdt:.2f}")
-                time.sleep(self.settings.poll_interval_sec)
-            except Exception as e:
-                self.logger.error(str(e))
-                time.sleep(self.settings.poll_interval_sec)
+    def _ladder_orders(self) -> Dict[str, Tuple[str, float, float]]:
+        """挂单梯子的目标：{标签: (方向, 价格, 数量)}，add:<n> 为第 n 次加仓，tp 为止盈卖单"""
+        st, s = self.state, self.settings
+        step = float(s.sigma_buy_base_eth)
+        want = {f"add:{n}": ("buy", price, step) for n, price in ladder_levels(
+            st.avg_cost, st.base_amount, int(st.buy_count), step, float(s.sigma_buy_price_drop_pct), int(s.sigma_max_adds), int(s.sigma_ladder_levels))}
+        leave = float(s.sigma_sell_leave_base_eth)
+        if st.base_amount > leave:
+            want["tp"] = ("sell", st.avg_cost * (1.0 + float(s.sigma_sell_profit_pct)), st.base_amount - leave)
+        return want
+
+    def _on_order_fill(self, side: str, amount: float, price: float, order_id: str):
+        super()._on_order_fill(side, amount, price, order_id)
+        o = self.orders.get(order_id)
+        tag = o.get("tag", "") if o else ""
+        if side == "buy" and tag.startswith("add:"):
+            # 部分成交也算用掉这一档，剩下的继续挂着；下一档从成交后的均价重新推算
+            self.state.buy_count = max(int(self.state.buy_count), int(tag[4:]))
+            self.state.last_buy_ms = int(time.time() * 1000)
+            self.store.save(self.state)
+
+    @timed_stage("order")
+    def _tick_ladder(self, snap: MarketSnapshot):
+        """
+        持仓期间把接下来的加仓档和止盈单常驻在盘口，成交由交易所撮合，不再等下一轮轮询；
+        每轮只改均价变动后目标价/量变了的档位。dry_run 没有盘口，按本轮现价穿过的档位记成交
+        """
+        want = self._ladder_orders()
+        if not self.settings.dry_run:
+            self.orders.reconcile(want)
+            return
+        for tag, (side, price, amount) in want.items():
+            if side == "buy" and snap.last <= price:
+                self._on_order_fill("buy", amount, price, "")
+                self.state.buy_count = int(tag[4:])
+                self.state.last_buy_ms = int(time.time() * 1000)
+                self.store.save(self.state)
+        tp = want.get("tp")
+        if tp is not None and snap.last >= tp[1]:
+            self._on_order_fill("sell", tp[2], tp[1], "")
+
+    def _on_tick(self, snap: MarketSnapshot):
+        if self.settings.sigma_ladder_levels > 0:
+            if self.state.base_amount > 0.0 and self.state.avg_cost > 0.0:
+                self._tick_ladder(snap)
+                return
+            if not self.settings.dry_run:
+                # 没有持仓时梯子没有锚点：撤掉残留的档位，开仓仍按下面的规则
+                self.orders.reconcile({})
+        golden_cross = self._macd.golden_cross()
+        last_price = snap.last
+        now_ms = int(time.time() * 1000)
+        avg_cost = self.state.avg_cost
+        base_amount = self.state.base_amount
+        last_buy_ms = int(self.state.last_buy_ms)
+        buy_count = int(self.state.buy_count)
+        cooldown_ms = int(self.settings.sigma_buy_cooldown_sec) * 1000
+        drop_pct = float(self.settings.sigma_buy_price_drop_pct)
+        can_buy_time = (now_ms - last_buy_ms) >= cooldown_ms
+        price_ok = (base_amount <= 0.0) or (avg_cost > 0.0 and last_price <= avg_cost * (1.0 - drop_pct)) # or last_price <= self.state.avg_cost * (1.0 - 0.01)
+        adds_ok = buy_count < int(self.settings.sigma_max_adds)
+        can_buy = price_ok and can_buy_time and golden_cross and adds_ok
+        if can_buy:
+            self._buy_base_amount_eth(float(self.settings.sigma_buy_base_eth))
+            self.state.last_buy_ms = now_ms
+            self.state.buy_count = int(self.state.buy_count) + 1
+            self.store.save(self.state)
+        else:
+            macd, signal = self._macd.macd, self._macd.signal
+            # 原因不变时按 LOG_RATE_LIMIT_SEC 限频；明细字段只有真正输出时才在日志线程里格式化
+            self.logger.info("cant buy", extra=log_fields(
+                rate_key=(price_ok, can_buy_time, golden_cross, adds_ok),
+                price_ok=price_ok,
+                cooldown_ok=can_buy_time,
+                golden_cross=golden_cross,
+                adds_ok=adds_ok,
+                price=last_price,
+                buy_below=Lazy(lambda: f"{avg_cost * (1.0 - drop_pct):.6f}" if avg_cost > 0.0 else "-"),
+                cooldown_left_sec=Lazy(lambda: max(0, cooldown_ms - (now_ms - last_buy_ms)) // 1000),
+                macd=Lazy(lambda: f"{macd:.6f}"),
+                signal=Lazy(lambda: f"{signal:.6f}"),
+                buy_count=buy_count,
+            ))
+        base_amount = self.state.base_amount
+        avg_cost = self.state.avg_cost
+        leave_base = float(self.settings.sigma_sell_leave_base_eth)
+        profit_pct = float(self.settings.sigma_sell_profit_pct)
+        prev_bearish = False
+        if len(self._ohlcv_cache) >= 2:
+            prev_bearish = bool(self._ohlcv_cache.opens[-2] > self._ohlcv_cache.closes[-2])
+        amount_ok = base_amount >= leave_base
+        profit_ok = avg_cost > 0.0 and last_price >= avg_cost * (1.0 + profit_pct)
+        can_sell = amount_ok and profit_ok and prev_bearish
+        if can_sell:
+            self._sell_but_keep_base(leave_base)
+        else:
+            self.logger.info("cant sell", extra=log_fields(
+                rate_key=(amount_ok, profit_ok, prev_bearish),
+                amount_ok=amount_ok,
+                profit_ok=profit_ok,
+                prev_bearish=prev_bearish,
+                base_amount=base_amount,
+                price=last_price,
+                sell_above=Lazy(lambda: f"{avg_cost * (1.0 + profit_pct):.6f}" if avg_cost > 0.0 else "-"),
+            ))
+
+    def _after_tick(self, snap: MarketSnapshot):
+        last_price = snap.last
+        b = self.exchange.fetch_balance()
+        usdt = float(b.get("free", {}).get("USDT", 0.0) or 0.0)
+        st = self.state
+        has_pos = st.avg_cost > 0.0 and st.base_amount > 0.0
+        pnl_ratio = ((last_price - st.avg_cost) / st.avg_cost) if has_pos else 0.0
+        pnl_amount = (st.base_amount * (last_price - st.avg_cost)) if has_pos else 0.0
+        self.logger.info("state", extra=log_fields(
+            base_amount=st.base_amount,
+            avg_cost=st.avg_cost,
+            last_buy_ms=st.last_buy_ms,
+            buy_count=st.buy_count,
+            price=last_price,
+            pnl_ratio=Lazy(lambda: f"{pnl_ratio:.6f}"),
+            pnl_amount=Lazy(lambda: f"{pnl_amount:.6f}"),
+            usdt_free=Lazy(lambda: f"{usdt:.2f}"),
+        ))
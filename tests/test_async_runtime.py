@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import threading
+import time
+import pytest
+from config.settings import Settings
+from core.async_exchange import AsyncExchangeAdapter
+from core.sim_exchange import SimExchange
+from core.simulated_client import SimulatedClient
+from strategie.BaseStrategy import BaseStrategy
+from strategie.runtime import AsyncStrategyRuntime
+from strategie.sigma_spot import SigmaSpotStrategy
+
+LATENCY = 0.1
+
+
+class SlowClient(SimulatedClient):
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self.in_flight_orders = 0
+        self.max_in_flight_orders = 0
+        self.orders = 0
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        time.sleep(LATENCY)
+        return super().fetch_ohlcv(symbol, timeframe, since, limit)
+
+    def fetch_ticker(self, symbol):
+        time.sleep(LATENCY)
+        return super().fetch_ticker(symbol)
+
+    def fetch_balance(self):
+        time.sleep(LATENCY)
+        return {"free": {"ETH": 0.0, "USDT": 100.0}}
+
+    def fetch_my_trades(self, symbol, since=None):
+        time.sleep(LATENCY)
+        return []
+
+    def create_market_buy(self, symbol, quote_cost, params=None, ref_price=None):
+        with self._lock:
+            self.in_flight_orders += 1
+            self.max_in_flight_orders = max(self.max_in_flight_orders, self.in_flight_orders)
+        time.sleep(LATENCY)
+        with self._lock:
+            self.in_flight_orders -= 1
+            self.orders += 1
+        return super().create_market_buy(symbol, quote_cost, params, ref_price)
+
+
+class BuyEveryTick(BaseStrategy):
+    def _on_tick(self, snap):
+        self.exchange.create_market_buy(self.symbol, 1.0, {}, ref_price=snap.last)
+
+
+def _settings():
+    s = Settings(simulated_env=False, candle_store_dir="", poll_interval_sec=0)
+    s.dry_run = False
+    return s
+
+
+def test_async_tick_overlaps_independent_requests(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ex = SlowClient()
+    st = SigmaSpotStrategy(ex, _settings(), logging.getLogger("test"))
+    t0 = time.perf_counter()
+    st.tick()
+    sync_elapsed = time.perf_counter() - t0
+    aex = AsyncExchangeAdapter(ex)
+    t0 = time.perf_counter()
+    asyncio.run(st.tick_async(aex, asyncio.Lock()))
+    async_elapsed = time.perf_counter() - t0
+    aex.close()
+    assert sync_elapsed >= 5 * LATENCY
+    assert async_elapsed < 3.5 * LATENCY
+    assert st._ohlcv_cache.last_ts > 0 and st._market.get(st.symbol).last == 100.0
+
+
+def test_strategies_share_one_loop_and_orders_are_serialized(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ex = SlowClient()
+    aex = AsyncExchangeAdapter(ex, max_workers=16)
+    runtime = AsyncStrategyRuntime(aex)
+    for _ in range(4):
+        runtime.add(BuyEveryTick(ex, _settings(), logging.getLogger("test")))
+    t0 = time.perf_counter()
+    runtime.run(iterations=2)
+    elapsed = time.perf_counter() - t0
+    aex.close()
+    assert ex.orders == 8 and ex.max_in_flight_orders == 1
+    # 8 次下单串行 0.8s，行情/持仓请求在各策略之间重叠
+    assert elapsed < 8 * LATENCY + 4 * LATENCY
+
+
+def test_order_sync_runs_under_order_lock_before_balance(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    markets = {"ETH/USDT": {"precision": {"amount": 0.001, "price": 0.1}, "limits": {"amount": {"min": 0.01}, "cost": {"min": 1.0}}}}
+    sim = SimExchange(markets=markets, balances={"USDT": 1000.0, "ETH": 1.0}, maker_fee=0.0, taker_fee=0.0, spread_pct=0.0)
+    sim.on_trade("ETH/USDT", 1_000, 100.0)
+    s = Settings(dry_run=False, candle_store_dir="", order_type="limit", limit_slippage_pct=0.01)
+    st = SigmaSpotStrategy(sim, s, logging.getLogger("test"))
+    st._capture_snapshot()
+    st._buy_base_amount_eth(0.5)
+    lock = asyncio.Lock()
+    seen = []
+    fetch_open_orders, fetch_balance = sim.fetch_open_orders, sim.fetch_balance
+    monkeypatch.setattr(sim, "fetch_open_orders", lambda symbol=None: seen.append(("sync", lock.locked())) or fetch_open_orders(symbol))
+    monkeypatch.setattr(sim, "fetch_balance", lambda: seen.append(("balance", lock.locked())) or fetch_balance())
+    sim.on_trade("ETH/USDT", 2_000, 99.0, 0.5)
+    aex = AsyncExchangeAdapter(sim)
+    asyncio.run(st.tick_async(aex, lock))
+    aex.close()
+    assert seen[:2] == [("sync", True), ("balance", True)]
+    # 买单成交只记一次
+    assert st.state.base_amount == pytest.approx(1.5)
+
+
+class PagedTrades(SlowClient):
+    """成交历史 450 笔，每页 100 笔，每页耗时 LATENCY"""
+
+    def fetch_my_trades(self, symbol, since=None):
+        time.sleep(LATENCY)
+        rows = [{"id": str(i), "timestamp": 1_000 + i, "side": "buy", "amount": 0.01, "price": 100.0} for i in range(450)]
+        return [t for t in rows if since is None or t["timestamp"] >= since][:100]
+
+
+def test_trade_paging_does_not_block_the_loop(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ex = PagedTrades()
+    st = SigmaSpotStrategy(ex, _settings(), logging.getLogger("test"))
+    st.trade_cursor.reset()
+    aex = AsyncExchangeAdapter(ex)
+    gaps = []
+
+    async def heartbeat(done):
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    async def main():
+        done = asyncio.Event()
+        beat = asyncio.create_task(heartbeat(done))
+        await st.tick_async(aex, asyncio.Lock())
+        done.set()
+        await beat
+
+    asyncio.run(main())
+    aex.close()
+    # 首页之后还要同步翻 4 页；放在线程里时其它协程照常运行
+    assert st.trade_cursor.agg.count == 450
+    assert max(gaps) < LATENCY
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from config.settings import Settings, with_overrides
+from backtest.engine import backtest_martingale, backtest_sigma, candles_from_ohlcv, prev_day_hourly_baseline
+from backtest.sweep import parse_range, run_sweep
+from utils.indicators import macd_cross_series
+
+
+def _random_candles(n: int, step_ms: int = 60_000, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.concatenate([[100.0], close[:-1]]) * (1 + rng.normal(0, 0.0005, n))
+    ts = 1_700_000_000_000 + np.arange(n) * step_ms
+    rows = np.column_stack([ts, open_, np.maximum(open_, close), np.minimum(open_, close), close, np.ones(n)])
+    return candles_from_ohlcv(rows)
+
+
+def _sigma_reference(candles, s: Settings):
+    golden = macd_cross_series(candles.close)
+    base, avg, last_buy, count, fills = 0.0, 0.0, 0, 0, []
+    for i in range(len(candles)):
+        last = candles.close[i]
+        now = int(candles.ts[i])
+        price_ok = base <= 0.0 or (avg > 0.0 and last <= avg * (1.0 - s.sigma_buy_price_drop_pct))
+        if price_ok and now - last_buy >= s.sigma_buy_cooldown_sec * 1000 and golden[i] and count < s.sigma_max_adds:
+            avg = (avg * base + last * s.sigma_buy_base_eth) / (base + s.sigma_buy_base_eth)
+            base += s.sigma_buy_base_eth
+            last_buy, count = now, count + 1
+            fills.append(("buy", i))
+        bearish = i >= 1 and candles.open[i - 1] > candles.close[i - 1]
+        if base >= s.sigma_sell_leave_base_eth and avg > 0 and last >= avg * (1 + s.sigma_sell_profit_pct) and bearish:
+            if base > s.sigma_sell_leave_base_eth:
+                base = s.sigma_sell_leave_base_eth
+                fills.append(("sell", i))
+    return fills, base, avg
+
+
+def test_sigma_backtest_matches_per_bar_loop():
+    candles = _random_candles(20_000)
+    s = Settings(sigma_buy_base_eth=0.01, sigma_sell_leave_base_eth=0.001, sigma_buy_cooldown_sec=600,
+                 sigma_buy_price_drop_pct=0.003, sigma_sell_profit_pct=0.004, sigma_max_adds=1000, order_type="market")
+    result = backtest_sigma(candles, s)
+    fills, base, avg = _sigma_reference(candles, s)
+    assert [(f.side, f.index) for f in result.fills] == fills
+    assert abs(result.state["base_amount"] - base) < 1e-12
+    assert abs(result.state["avg_cost"] - avg) < 1e-9
+    assert abs(result.equity[-1] - (result.quote[-1] + result.base[-1] * candles.close[-1])) < 1e-9
+
+
+def test_martingale_backtest_closes_positions_at_take_profit():
+    candles = _random_candles(3 * 288, step_ms=300_000)
+    s = Settings(base_buy_usdt=10.0, multiplicator=2.0, drawdown_pct=0.01, take_profit_pct=0.005, order_type="market")
+    baseline = prev_day_hourly_baseline(candles)
+    assert np.isnan(baseline[0]) and not np.isnan(baseline[-1])
+    result = backtest_martingale(candles, s, fee_rate=0.001, initial_quote=100.0)
+    for f in result.fills:
+        if f.side == "sell":
+            assert result.base[f.index] == 0.0
+    assert result.fees > 0 or not result.fills
+
+
+def test_sweep_ranks_every_combination_and_matches_single_runs():
+    candles = _random_candles(5_000)
+    s = Settings(sigma_buy_base_eth=0.01, sigma_sell_leave_base_eth=0.001, sigma_buy_cooldown_sec=300, order_type="market")
+    grid = {"sigma_buy_price_drop_pct": parse_range("0.001:0.003:0.001"), "sigma_buy_cooldown_sec": [60, 600]}
+    rows = run_sweep(candles, s, grid, "sigma", processes=2)
+    assert len(rows) == 6
+    assert [r["rank"] for r in rows] == list(range(1, 7))
+    assert all(a["pnl"] >= b["pnl"] for a, b in zip(rows, rows[1:]))
+    top = rows[0]
+    single = backtest_sigma(candles, with_overrides(s, {"sigma_buy_price_drop_pct": top["sigma_buy_price_drop_pct"],
+                                                       "sigma_buy_cooldown_sec": top["sigma_buy_cooldown_sec"]}))
+    assert abs(single.pnl - top["pnl"]) < 1e-12
+
+    # 回撤越小越好；拼错的指标直接报错，而不是按 0 随便排
+    rows = run_sweep(candles, s, grid, "sigma", processes=1, rank_by="max_drawdown")
+    assert all(a["max_drawdown"] <= b["max_drawdown"] for a, b in zip(rows, rows[1:]))
+    with pytest.raises(ValueError):
+        run_sweep(candles, s, grid, "sigma", processes=1, rank_by="max_drawdwn")
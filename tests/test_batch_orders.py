@@ -0,0 +1,135 @@
+import ccxt
+import pytest
+from core.exchange_base import IExchange
+from core.exchange_recorder import RecordingExchange, read_recording
+from core.markets import build_rules
+from core.okx_client import OkxClient
+from core.rate_limiter import RateLimitedExchange, RequestScheduler
+from core.sim_exchange import SimExchange
+from core.simulated_client import SimulatedClient
+
+
+def okx_client():
+    c = OkxClient.__new__(OkxClient)
+    c.exchange = ccxt.okx({})
+    c.exchange.set_markets([{
+        "id": "ETH-USDT", "symbol": "ETH/USDT", "base": "ETH", "quote": "USDT", "baseId": "ETH", "quoteId": "USDT",
+        "type": "spot", "spot": True, "active": True,
+        "precision": {"amount": 1e-6, "price": 0.01}, "limits": {"amount": {"min": 1e-5}, "cost": {"min": 1.0}},
+    }])
+    c.rules = build_rules(c.exchange.markets)
+    c.markets_cache = None
+    c._last_reload = float("inf")
+    return c
+
+
+def test_okx_batch_place_chunks_and_maps_results_per_order(monkeypatch):
+    c = okx_client()
+    sent = []
+
+    def batch_orders(reqs):
+        sent.append(reqs)
+        if len(sent) == 2:
+            raise ccxt.NetworkError("timeout")
+        data = [{"ordId": f"o{len(sent)}-{k}", "clOrdId": r.get("clOrdId", ""), "sCode": "0", "sMsg": ""} for k, r in enumerate(reqs)]
+        data[1] = {"ordId": "", "sCode": "51008", "sMsg": "insufficient balance"}
+        return {"code": "2", "data": data}
+    monkeypatch.setattr(c.exchange, "privatePostTradeBatchOrders", batch_orders)
+
+    orders = [{"symbol": "ETH/USDT", "side": "buy", "amount": 0.0123456789, "price": 2000.004 - i} for i in range(45)]
+    orders[3] = {"symbol": "DOGE/USDT", "side": "buy", "amount": 10.0, "price": 0.1}
+    orders[0]["params"] = {"ordType": "post_only", "clOrdId": "ladder0"}
+    out = c.create_limit_orders(orders)
+
+    assert [len(r) for r in sent] == [19, 20, 5]
+    assert sent[0][0] == {"instId": "ETH-USDT", "tdMode": "cash", "side": "buy", "ordType": "post_only",
+                          "sz": "0.012345", "px": "2000.00", "clOrdId": "ladder0"}
+    assert len(out) == 45
+    assert out[0]["id"] == "o1-0" and out[0]["clientOrderId"] == "ladder0" and out[0]["price"] == 2000.0 and out[0]["amount"] == 0.012345
+    assert out[1]["status"] == "rejected" and out[1]["errorType"] == "InsufficientFunds"
+    assert out[3]["status"] == "rejected" and out[3]["errorType"] == "BadSymbol"
+    assert out[2]["id"] == "o1-2" and out[4]["id"] == "o1-3"
+    # 第二块整块失败：每一笔都带同一个错误
+    assert all(r["status"] == "rejected" and r["errorType"] == "NetworkError" for r in out[20:40])
+    assert out[40]["id"] == "o3-0" and out[41]["status"] == "rejected"
+
+
+def test_okx_batch_cancel_and_amend_requests(monkeypatch):
+    c = okx_client()
+    monkeypatch.setattr(c.exchange, "privatePostTradeCancelBatchOrders",
+                        lambda reqs: {"code": "2", "data": [{"ordId": r["ordId"], "sCode": "0" if r["ordId"] != "gone" else "51400", "sMsg": ""} for r in reqs]})
+    amended = []
+    monkeypatch.setattr(c.exchange, "privatePostTradeAmendBatchOrders",
+                        lambda reqs: amended.extend(reqs) or {"code": "0", "data": [{"ordId": r["ordId"], "sCode": "0"} for r in reqs]})
+
+    out = c.cancel_orders([{"id": "1", "symbol": "ETH/USDT"}, {"id": "gone", "symbol": "ETH/USDT"}])
+    assert out[0]["status"] == "canceled" and out[1]["errorType"] == "OrderNotFound" and out[1]["id"] == "gone"
+
+    out = c.amend_orders([{"id": "1", "symbol": "ETH/USDT", "price": 1999.996}, {"id": "2", "symbol": "ETH/USDT", "amount": 0.1234567},
+                          {"id": "3", "symbol": "ETH/USDT"}])
+    assert amended == [{"instId": "ETH-USDT", "ordId": "1", "newPx": "2000.00"}, {"instId": "ETH-USDT", "ordId": "2", "newSz": "0.123456"}]
+    assert out[0]["price"] == 2000.0 and out[1]["amount"] == 0.123456 and out[2]["errorType"] == "ArgumentsRequired"
+    with pytest.raises(ccxt.ArgumentsRequired):
+        c.amend_order("3", "ETH/USDT")
+
+
+def test_sim_exchange_batch_and_amend_follow_queue_priority():
+    sim = SimExchange(balances={"USDT": 1000.0}, maker_fee=0.0, taker_fee=0.0, spread_pct=0.0)
+    sim.on_trade("ETH/USDT", 1, 100.0)
+    a, b, bad = sim.create_limit_orders([{"symbol": "ETH/USDT", "side": "buy", "amount": 1.0, "price": 99.0},
+                                         {"symbol": "ETH/USDT", "side": "buy", "amount": 1.0, "price": 99.0},
+                                         {"symbol": "ETH/USDT", "side": "buy", "amount": 100.0, "price": 99.0}])
+    assert a["status"] == b["status"] == "open" and bad["errorType"] == "InsufficientFunds"
+
+    # a 改价后排到 b 后面；b 只减量，保留时间优先
+    out = sim.amend_orders([{"id": a["id"], "symbol": "ETH/USDT", "price": 98.5}, {"id": a["id"], "symbol": "ETH/USDT", "price": 99.0},
+                            {"id": b["id"], "symbol": "ETH/USDT", "amount": 0.5}])
+    assert [o["status"] for o in out] == ["open", "open", "open"] and out[2]["amount"] == 0.5
+    assert sim.fetch_balance()["used"]["USDT"] == pytest.approx(99.0 * 1.5)
+    sim.on_trade("ETH/USDT", 2, 99.0, 0.5)
+    assert sim.fetch_order(b["id"])["status"] == "closed" and sim.fetch_order(a["id"])["filled"] == 0.0
+
+    # 改到穿价立即成交
+    assert sim.amend_order(a["id"], "ETH/USDT", price=100.5)["status"] == "closed"
+    out = sim.cancel_orders([{"id": a["id"], "symbol": "ETH/USDT"}, {"id": "nope", "symbol": "ETH/USDT"}])
+    assert [o["errorType"] for o in out] == ["OrderNotFound", "OrderNotFound"]
+    assert sim.fetch_balance()["used"]["USDT"] == pytest.approx(0.0, abs=1e-9)
+
+
+def test_simulated_client_and_rate_limiter_batch():
+    sim = SimulatedClient()
+    placed = sim.create_limit_orders([{"symbol": "ETH/USDT", "side": "buy", "amount": 0.1, "price": 99.0 - i} for i in range(3)])
+    assert len({o["id"] for o in placed}) == 3
+    out = sim.amend_orders([{"id": placed[0]["id"], "symbol": "ETH/USDT", "price": 98.0}])
+    assert out[0]["price"] == 98.0
+    out = sim.cancel_orders([{"id": o["id"], "symbol": "ETH/USDT"} for o in placed] + [{"id": placed[0]["id"], "symbol": "ETH/USDT"}])
+    assert [o["status"] for o in out] == ["canceled"] * 3 + ["rejected"]
+
+    calls = []
+
+    class Counting(SimulatedClient):
+        def create_limit_orders(self, orders):
+            calls.append(len(orders))
+            return super().create_limit_orders(orders)
+    rl = RateLimitedExchange(Counting(), RequestScheduler(limits={}))
+    out = rl.create_limit_orders([{"symbol": "ETH/USDT", "side": "sell", "amount": 0.1, "price": 101.0 + i} for i in range(45)])
+    assert calls == [20, 20, 5] and len(out) == 45
+
+
+def test_single_order_methods_pass_through_wrappers(tmp_path):
+    path = str(tmp_path / "calls.rec")
+    rec = RecordingExchange(RateLimitedExchange(SimulatedClient(), RequestScheduler(limits={})), path)
+    (o,) = rec.create_limit_orders([{"symbol": "ETH/USDT", "side": "buy", "amount": 0.1, "price": 99.0}])
+    assert [x["id"] for x in rec.fetch_open_orders("ETH/USDT")] == [o["id"]]
+    assert rec.amend_order(o["id"], "ETH/USDT", None, 98.0)["price"] == 98.0
+    assert rec.cancel_order(o["id"], "ETH/USDT")["status"] == "canceled"
+    assert rec.fetch_order(o["id"], "ETH/USDT")["status"] == "canceled"
+    rec.close()
+    assert [c.method for c in read_recording(path)] == ["create_limit_orders", "fetch_open_orders", "amend_order", "cancel_order", "fetch_order"]
+
+    # 没有实现单笔撤单/改单的交易所：批量默认实现逐笔报 NotSupported
+    bare = type("Bare", (IExchange,), {m: lambda self, *a, **k: None for m in IExchange.__abstractmethods__})()
+    out = bare.cancel_orders([{"id": "1", "symbol": "ETH/USDT"}]) + bare.amend_orders([{"id": "1", "symbol": "ETH/USDT", "price": 1.0}])
+    assert [r["errorType"] for r in out] == ["NotSupported", "NotSupported"]
+    with pytest.raises(ccxt.NotSupported):
+        bare.fetch_open_orders("ETH/USDT")
@@ -0,0 +1,40 @@
+import json
+import benchmarks.suite  # noqa: F401
+from benchmarks.runner import BENCHMARKS, BenchResult, compare, load_baseline, measure, run_benchmarks, save_baseline
+
+
+def test_suite_covers_hot_paths_and_runs():
+    for name in ("indicators.ema_fallback_200", "indicators.macd_cross_golden_fallback_200", "indicators.macd_cross_golden_talib_200",
+                 "strategy.update_ohlcv_cache", "strategy.sigma_tick", "ledger.csv_rebuild_position_100k",
+                 "state.save_flush", "state.load", "okx.normalize_order_amount"):
+        assert name in BENCHMARKS
+    results = run_benchmarks(["okx.normalize", "update_ohlcv", "fallback"], min_time=0.001, repeats=2)
+    assert {r.name for r in results} == {"okx.normalize_order_amount", "strategy.update_ohlcv_cache",
+                                         "indicators.ema_fallback_200", "indicators.macd_cross_golden_fallback_200"}
+    assert all(r.seconds > 0 and r.loops >= 1 for r in results)
+
+
+def test_measure_scales_loops_to_min_time():
+    calls = []
+    seconds, loops, samples = measure(lambda: calls.append(1), min_time=0.002, repeats=3)
+    assert loops > 1 and len(samples) == 3 and seconds == min(samples)
+    assert len(calls) >= 1 + 3 * loops
+
+
+def test_compare_normalizes_by_calibration_and_flags_regressions(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    assert load_baseline(path) == {"machine": {}, "results": {}}
+    save_baseline(path, [BenchResult("a", 1e-3, 10), BenchResult("b", 2e-3, 10), BenchResult("c", 0.0, 0, skipped="x")], calibration=1e-6)
+    baseline = load_baseline(path)
+    assert set(baseline["results"]) == {"a", "b"} and baseline["calibration"] == 1e-6
+
+    now = [BenchResult("a", 1.5e-3, 10), BenchResult("b", 1e-3, 10), BenchResult("d", 1e-3, 10), BenchResult("c", 0.0, 0, skipped="x")]
+    assert [c.status for c in compare(now, baseline)] == ["regressed", "improved", "new", "skipped"]
+    # 机器整体慢了 1.5 倍：a 折算后与基线持平
+    c = compare(now, baseline, calibration=1.5e-6)
+    assert c[0].status == "ok" and abs(c[0].ratio - 1.0) < 1e-9
+
+    # 在慢一倍的机器上重存：结果折算回基线机器的速度，其它项保留
+    save_baseline(path, [BenchResult("a", 4e-3, 10)], baseline, calibration=2e-6)
+    data = json.load(open(path))
+    assert data["results"]["a"]["seconds"] == 2e-3 and data["results"]["b"]["seconds"] == 2e-3
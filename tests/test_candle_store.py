@@ -0,0 +1,40 @@
+import logging
+import time
+import numpy as np
+from config.settings import Settings
+from strategie.BaseStrategy import BaseStrategy
+from tests.test_ohlcv_sync import CandleFeed, T0, TF_MS
+from utils.candle_store import CandleStore
+
+
+def test_store_appends_overwrites_last_and_looks_up_ranges(tmp_path):
+    series = CandleStore(str(tmp_path)).series("ETH/USDT", "1m")
+    rows = [[T0 + i * TF_MS, 1, 2, 0.5, float(i), 3] for i in range(10)]
+    assert series.append(rows[:5]) == 5
+    assert series.append([rows[4][:4] + [99.0, 3], rows[5]]) == 2
+    assert series.append(rows[:3]) == 0
+    series.append(rows[7:])
+    again = CandleStore(str(tmp_path)).series("ETH/USDT", "1m")
+    assert len(again) == 9 and again.last_ts == T0 + 9 * TF_MS
+    assert again.range(T0 + 4 * TF_MS, T0 + 5 * TF_MS)[0, 4] == 99.0
+    got = again.range(T0 + 5 * TF_MS, T0 + 9 * TF_MS)
+    assert np.array_equal(got[:, 0], [T0 + 5 * TF_MS, T0 + 7 * TF_MS, T0 + 8 * TF_MS])
+    assert again.range(T0 + 6 * TF_MS, T0 + 7 * TF_MS).shape[0] == 0
+    assert np.array_equal(again.tail(2)[:, 4], [8.0, 9.0])
+
+
+def test_warm_start_fetches_only_the_delta(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    feed = CandleFeed(400)
+    feed.now_ms = T0 + 300 * TF_MS
+    monkeypatch.setattr(time, "time", lambda: feed.now_ms / 1000.0)
+    settings = Settings(simulated_env=True, sigma_macd_timeframe="1m", candle_store_dir=str(tmp_path / "candles"))
+    first = BaseStrategy(feed, settings, logging.getLogger("test"))
+    first._update_ohlcv_cache()
+    feed.now_ms += 3 * TF_MS
+    feed.calls.clear()
+    second = BaseStrategy(feed, settings, logging.getLogger("test"))
+    second._update_ohlcv_cache()
+    assert feed.calls == [(T0 + 300 * TF_MS, 5)]
+    assert second._ohlcv_cache.last_ts == T0 + 303 * TF_MS
+    assert np.array_equal(second._ohlcv_cache.closes, [r[4] for r in feed.rows[104:304]])
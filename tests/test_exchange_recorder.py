@@ -0,0 +1,84 @@
+import logging
+import ccxt
+import pytest
+from config.settings import Settings
+from core.exchange_recorder import MAGIC, RecordingExchange, ReplayError, ReplayExchange, read_recording
+from core.sim_exchange import SimExchange
+from strategie.sigma_spot import SigmaSpotStrategy
+
+
+def candles(n, start=1_700_000_000_000):
+    rows, price = [], 100.0
+    for i in range(n):
+        nxt = price * (1.0 + (0.004 if (i // 15) % 2 else -0.004))
+        rows.append([start + i * 60_000, price, max(price, nxt), min(price, nxt), nxt, 10.0])
+        price = nxt
+    return rows
+
+
+def settings(data_dir):
+    return Settings(dry_run=False, candle_store_dir="", data_dir=str(data_dir), sigma_buy_base_eth=0.05, sigma_buy_cooldown_sec=0,
+                    sigma_buy_price_drop_pct=0.002, sigma_sell_profit_pct=0.003, sigma_sell_leave_base_eth=0.05)
+
+
+def test_replayed_session_reproduces_recorded_decisions(tmp_path):
+    rows = candles(260)
+    sim = SimExchange(balances={"USDT": 10_000.0})
+    sim.replay_candles("ETH/USDT", "1m", rows[:200])
+    path = str(tmp_path / "session.bin")
+    rec = RecordingExchange(sim, path, flush_every=8)
+    st = SigmaSpotStrategy(rec, settings(tmp_path / "live"), logging.getLogger("test"))
+    sim.replay_candles("ETH/USDT", "1m", rows[200:], on_bar=lambda i: st.tick())
+    with pytest.raises(ccxt.InsufficientFunds):
+        rec.create_market_sell("ETH/USDT", 1_000.0)
+    rec.close()
+
+    calls = list(read_recording(path))
+    assert len(calls) == rec.writer.count
+    orders = [c for c in calls if c.method.startswith("create_")]
+    assert orders and calls[-1].error[0] == "InsufficientFunds"
+    assert all(c.duration >= 0 and c.started > 0 for c in calls)
+
+    replay = ReplayExchange(path)
+    st2 = SigmaSpotStrategy(replay, settings(tmp_path / "replay"), logging.getLogger("test"))
+    for _ in range(60):
+        st2.tick()
+    assert st2.state.base_amount == pytest.approx(st.state.base_amount)
+    assert st2.state.avg_cost == pytest.approx(st.state.avg_cost)
+    assert replay.remaining() == 1
+    with pytest.raises(ccxt.InsufficientFunds):
+        replay.create_market_sell("ETH/USDT", 1_000.0)
+    with pytest.raises(ReplayError):
+        replay.fetch_ticker("ETH/USDT")
+
+
+def test_args_matching_latency_and_truncated_files(tmp_path):
+    sim = SimExchange()
+    sim.on_trade("ETH/USDT", 1, 100.0)
+    sim.on_trade("BTC/USDT", 1, 50_000.0)
+    path = str(tmp_path / "s.bin")
+    rec = RecordingExchange(sim, path)
+    rec.fetch_ticker("ETH/USDT")
+    rec.fetch_ticker("BTC/USDT")
+    rec.fetch_open_orders("ETH/USDT")
+    rec.close()
+
+    replay = ReplayExchange(path, match="args", latency=True, latency_scale=0.0)
+    assert replay.fetch_ticker("BTC/USDT")["last"] == 50_000.0
+    assert replay.fetch_ticker("ETH/USDT")["last"] == 100.0
+    assert replay.fetch_open_orders("ETH/USDT") == []
+    with pytest.raises(ReplayError):
+        replay.fetch_ticker("ETH/USDT")
+    with pytest.raises(ReplayError):
+        replay.cancel_order("1", "ETH/USDT")
+    with pytest.raises(AttributeError):
+        replay.fetch_positions
+
+    # 截断的尾部只丢最后一条不完整的记录
+    data = open(path, "rb").read()
+    cut = tmp_path / "cut.bin"
+    for n in range(len(MAGIC), len(data)):
+        cut.write_bytes(data[:n])
+        assert len(list(read_recording(str(cut)))) <= 3
+    with pytest.raises(ReplayError):
+        ReplayExchange(__file__)
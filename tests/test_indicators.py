@@ -1,9 +1,44 @@
 import numpy as np
-from utils.indicators import macd_cross_golden
+import pytest
+from utils import indicators
+from utils.indicators import StreamingMACD, _ema, macd_batch, macd_cross_golden
 
 def test_macd_cross_golden_synthetic():
     arr = np.concatenate([np.linspace(100, 99, 50), np.linspace(99, 101, 50)])
     assert macd_cross_golden(arr) in [True, False]
 
+def test_streaming_macd_matches_full_recompute():
+    rng = np.random.default_rng(3)
+    closes = 100 + np.cumsum(rng.normal(0, 0.3, 300))
+    stream = StreamingMACD()
+    stream.seed(closes[:50])
+    for i in range(50, closes.size):
+        stream.append(closes[i] + 1.0)
+        stream.replace_last(closes[i])
+        window = closes[: i + 1]
+        macd = _ema(window, 12) - _ema(window, 26)
+        signal = _ema(macd, 9)
+        assert abs(stream.macd - macd[-1]) < 1e-9
+        assert abs(stream.signal - signal[-1]) < 1e-9
+        assert stream.golden_cross() == bool(macd[-2] <= signal[-2] and macd[-1] > signal[-1])
+
+def test_macd_batch_matches_scalar_ema_and_talib():
+    rng = np.random.default_rng(5)
+    prices = 100 + np.cumsum(rng.normal(0, 0.3, (3, 800)), axis=1)
+    params = [(12, 26, 9), (5, 35, 5), (8, 21, 13)]
+    macd, signal, cross = macd_batch(prices, params, use_talib=False)
+    assert macd.shape == signal.shape == cross.shape == (3, 3, 800)
+    for p, (f, s, g) in enumerate(params):
+        for i in range(prices.shape[0]):
+            m = _ema(prices[i], f) - _ema(prices[i], s)
+            assert np.allclose(macd[p, i], m, rtol=0, atol=1e-10)
+            assert np.allclose(signal[p, i], _ema(m, g), rtol=0, atol=1e-10)
+    if indicators.talib is None:
+        pytest.skip("TA-Lib not installed")
+    t_macd, t_signal, t_cross = macd_batch(prices, params, use_talib=True)
+    assert np.allclose(macd[..., 400:], t_macd[..., 400:], rtol=0, atol=1e-8)
+    assert np.allclose(signal[..., 400:], t_signal[..., 400:], rtol=0, atol=1e-8)
+    assert (cross[..., 400:] == t_cross[..., 400:]).all()
+
 if __name__ == "__main__":
     test_macd_cross_golden_synthetic()
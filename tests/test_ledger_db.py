@@ -0,0 +1,43 @@
+import random
+import pytest
+from config.settings import Settings
+from utils.ledger_db import SqliteTradeLedger
+from utils.state import TradeLedger, open_ledger
+
+
+def test_sqlite_ledger_matches_csv_and_imports(tmp_path):
+    settings = Settings(simulated_env=True, data_dir=str(tmp_path))
+    csv_ledger = TradeLedger(settings)
+    rng = random.Random(3)
+    for i in range(300):
+        symbol = rng.choice(["ETH/USDT", "BTC/USDT"])
+        side = "buy" if rng.random() < 0.7 else "sell"
+        csv_ledger.record(side, symbol, rng.uniform(90, 110), rng.uniform(0.01, 0.1), 0.0, str(i))
+
+    db = SqliteTradeLedger(settings, str(tmp_path / "direct.db"))
+    with open(csv_ledger.path, encoding="utf-8") as f:
+        next(f)
+        for line in f:
+            ts, side, symbol, price, amount, fee, oid = line.strip().split(",")
+            db.record(side, symbol, float(price), float(amount), float(fee), oid)
+
+    settings.ledger_backend = "sqlite"
+    imported = open_ledger(settings)
+    assert imported.count() == 300
+    for symbol in ("ETH/USDT", "BTC/USDT", "SOL/USDT"):
+        expected = csv_ledger.rebuild_position(symbol)
+        for ledger in (db, imported):
+            got = ledger.rebuild_position(symbol)
+            assert abs(got[0] - expected[0]) < 1e-9 and abs(got[1] - expected[1]) < 1e-9
+
+    # 重复导入会把累计量翻倍，默认拒绝
+    with pytest.raises(ValueError):
+        imported.import_csv(csv_ledger.path)
+    assert imported.count() == 300
+
+    imported.record("buy", "SOL/USDT", 20.0, 1.0, 0.0, "x")
+    imported.close()
+    reopened = open_ledger(settings)
+    assert reopened.count() == 301 and reopened.rebuild_position("SOL/USDT") == (20.0, 1.0)
+    reopened.close()
+    db.close()
@@ -0,0 +1,27 @@
+import json
+import threading
+from config.settings import Settings
+from utils.logging import Lazy, init_logger, log_fields, shutdown_logger, symbol_logger
+
+
+def test_json_pipeline_is_lazy_rate_limited_and_off_thread(tmp_path):
+    settings = Settings(simulated_env=True, log_format="json", log_rate_limit_sec=3600)
+    logger = init_logger(settings, name="test-pipeline", log_dir=str(tmp_path))
+    calls = []
+
+    def expensive():
+        calls.append(threading.current_thread().name)
+        return "detail"
+
+    log = symbol_logger(logger, "ETH/USDT")
+    for _ in range(5):
+        log.info("cant buy", extra=log_fields(rate_key=(True, False), price_ok=True, detail=Lazy(expensive)))
+    log.info("cant buy", extra=log_fields(rate_key=(False, False), price_ok=False, detail=Lazy(expensive)))
+    logger.debug("below level", extra=log_fields(detail=Lazy(expensive)))
+    shutdown_logger("test-pipeline")
+
+    with open(tmp_path / "trade.log", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert [r["price_ok"] for r in rows] == [True, False]
+    assert rows[0]["symbol"] == "ETH/USDT" and rows[0]["detail"] == "detail" and rows[0]["msg"] == "[ETH/USDT] cant buy"
+    assert len(calls) == 2 and threading.current_thread().name not in calls
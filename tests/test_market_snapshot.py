@@ -0,0 +1,49 @@
+import logging
+from config.settings import Settings
+from core.market_snapshot import MarketSnapshotProvider
+from core.simulated_client import SimulatedClient
+from strategie.BaseStrategy import BaseStrategy
+
+
+class CountingClient(SimulatedClient):
+    def __init__(self):
+        super().__init__()
+        self.ticker_calls = 0
+        self.ref_prices = []
+
+    def fetch_ticker(self, symbol):
+        self.ticker_calls += 1
+        return {"last": self._price, "bid": self._price - 0.5, "ask": self._price + 0.5}
+
+    def create_market_buy(self, symbol, quote_cost, params=None, ref_price=None):
+        self.ref_prices.append(ref_price)
+        return super().create_market_buy(symbol, quote_cost, params, ref_price)
+
+    def create_market_sell(self, symbol, base_amount, params=None, ref_price=None):
+        self.ref_prices.append(ref_price)
+        return super().create_market_sell(symbol, base_amount, params, ref_price)
+
+
+def test_snapshot_is_reused_within_staleness_bound():
+    ex = CountingClient()
+    provider = MarketSnapshotProvider(ex, max_age_ms=60_000)
+    provider.capture("ETH/USDT")
+    assert provider.get("ETH/USDT").bid == 99.5
+    assert ex.ticker_calls == 1
+    provider.max_age_ms = -1
+    provider.get("ETH/USDT")
+    assert ex.ticker_calls == 2
+
+
+def test_one_tick_with_buy_and_sell_costs_one_ticker_request(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ex = CountingClient()
+    st = BaseStrategy(ex, Settings(simulated_env=False, order_type="market", candle_store_dir=""), logging.getLogger("test"))
+    st.settings.dry_run = False
+    ex.ticker_calls = 0
+    st._capture_snapshot()
+    st._buy_base_amount_eth(0.01)
+    st.state.base_amount = 0.02
+    st._sell_but_keep_base(0.001)
+    assert ex.ticker_calls == 1
+    assert ex.ref_prices == [100.0, 100.0]
@@ -0,0 +1,103 @@
+import json
+import time
+import ccxt
+import pytest
+from core.markets import MarketRules, MarketsCache, build_rules
+from core.okx_client import OkxClient
+
+
+def market(symbol, amount_step=1e-6, price_step=0.01, min_amount=1e-5, min_cost=1.0):
+    base, quote = symbol.split("/")
+    return {"id": f"{base}-{quote}", "symbol": symbol, "base": base, "quote": quote, "baseId": base, "quoteId": quote,
+            "type": "spot", "spot": True, "active": True,
+            "precision": {"amount": amount_step, "price": price_step},
+            "limits": {"amount": {"min": min_amount}, "cost": {"min": min_cost}}}
+
+
+MARKETS = {"ETH/USDT": market("ETH/USDT"), "BTC/USDT": market("BTC/USDT", 1e-8, 0.1)}
+
+
+def make_client(monkeypatch, tmp_path, fetch, ttl=3600.0, testnet=False):
+    calls = []
+
+    def fake_fetch(self):
+        calls.append(time.time())
+        m = fetch()
+        self.exchange.set_markets(m)
+        return self.exchange.markets
+    monkeypatch.setattr(OkxClient, "_fetch_markets", fake_fetch)
+    c = OkxClient(None, None, None, {}, testnet, False, 1000, markets_cache_path=str(tmp_path / "markets.json"), markets_ttl_sec=ttl)
+    return c, calls
+
+
+def test_rules_table_normalizes_like_the_exchange():
+    r = MarketRules("ETH/USDT", market("ETH/USDT", min_cost=5.0))
+    assert r.normalize(0.0123456789, 2000.0) == 0.012345
+    # 按最小金额补出来的数量向上取整，截断后不会又低于最小金额
+    assert r.normalize(0.0001, 3000.0) == 0.001667 and 0.001667 * 3000.0 >= 5.0
+    assert r.price_round(2000.004) == 2000.0 and r.price_round(2000.006) == 2000.01
+    assert set(build_rules(dict(MARKETS, **{"X/USDT": {"limits": {}}}))) == {"ETH/USDT", "BTC/USDT"}
+
+
+def test_restart_reads_cache_and_refreshes_in_background(monkeypatch, tmp_path):
+    c, calls = make_client(monkeypatch, tmp_path, lambda: MARKETS)
+    assert len(calls) == 1 and set(c.rules) == {"ETH/USDT", "BTC/USDT"}
+    c.markets_cache.stop()
+    saved = json.load(open(tmp_path / "markets.json"))
+    assert set(saved["markets"]) == {"ETH/USDT", "BTC/USDT"}
+
+    # 重启：缓存没过期，不访问交易所
+    c, calls = make_client(monkeypatch, tmp_path, lambda: {})
+    assert calls == [] and c._normalize_order_amount("BTC/USDT", 0.123456789, 30000.0) == 0.12345678
+    c.markets_cache.stop()
+
+    # 缓存过期：先用旧数据启动，后台拉到新数据后替换规则表
+    newer = dict(MARKETS, **{"SOL/USDT": market("SOL/USDT", 1e-4, 0.001)})
+    c, calls = make_client(monkeypatch, tmp_path, lambda: newer, ttl=0.05)
+    assert "ETH/USDT" in c.rules
+    end = time.time() + 2
+    while "SOL/USDT" not in c.rules:
+        assert time.time() < end
+        time.sleep(0.01)
+    c.markets_cache.stop()
+    assert "SOL/USDT" in json.load(open(tmp_path / "markets.json"))["markets"]
+
+    # 测试网用单独的缓存文件
+    c, calls = make_client(monkeypatch, tmp_path, lambda: MARKETS, testnet=True)
+    c.markets_cache.stop()
+    assert len(calls) == 1 and (tmp_path / "markets-testnet.json").exists()
+
+
+def test_never_places_orders_without_limits(monkeypatch, tmp_path):
+    def down():
+        raise ccxt.NetworkError("down")
+    (tmp_path / "markets.json").write_text("{broken")
+    c, calls = make_client(monkeypatch, tmp_path, down)
+    c.markets_cache.stop()
+    assert c.rules == {} and len(calls) == 1
+    assert list(tmp_path.glob("markets.json.corrupt-*"))
+    sent = []
+    monkeypatch.setattr(c.exchange, "create_order", lambda *a: sent.append(a) or {"id": "1"})
+    with pytest.raises(ccxt.ExchangeNotAvailable):
+        c.create_limit_buy("ETH/USDT", 0.01, 2000.0)
+    assert sent == []
+
+    # 缺规则时下单前会同步重拉一次 markets，间隔内不重复拉
+    c.markets_cache.fetch = lambda: MARKETS
+    with pytest.raises(ccxt.ExchangeNotAvailable):
+        c.create_limit_buy("ETH/USDT", 0.01, 2000.0)
+    c._last_reload = 0.0
+    c.create_limit_buy("ETH/USDT", 0.0123456789, 2000.004)
+    assert sent[-1][:5] == ("ETH/USDT", "limit", "buy", 0.012345, 2000.0)
+    with pytest.raises(ccxt.BadSymbol):
+        c.create_limit_buy("DOGE/USDT", 10.0, 0.1)
+
+
+def test_cache_load_is_fast(tmp_path):
+    markets = {f"C{i}/USDT": market(f"C{i}/USDT") for i in range(1000)}
+    cache = MarketsCache(str(tmp_path / "m.json"), 3600.0, lambda: markets)
+    cache.refresh()
+    t0 = time.perf_counter()
+    loaded = MarketsCache(str(tmp_path / "m.json"), 3600.0, lambda: {}).load()
+    rules = build_rules(loaded)
+    assert len(rules) == 1000 and time.perf_counter() - t0 < 0.5
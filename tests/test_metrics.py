@@ -0,0 +1,66 @@
+import logging
+import urllib.request
+import ccxt
+import pytest
+from config.settings import Settings
+from core.simulated_client import SimulatedClient
+from strategie.BaseStrategy import BaseStrategy
+from utils.metrics import REGISTRY, InstrumentedExchange, MetricsRegistry, MetricsServer
+
+
+class FailingTicker(SimulatedClient):
+    def fetch_ticker(self, symbol):
+        raise RuntimeError("down")
+
+
+def test_disabled_registry_adds_no_wrappers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ex = SimulatedClient()
+    st = BaseStrategy(ex, Settings(simulated_env=True, candle_store_dir=""), logging.getLogger("test"))
+    assert not REGISTRY.enabled and st.exchange is ex
+    assert st.metrics.stage(st.symbol, "x") is REGISTRY.stage("ETH/USDT", "y")
+
+
+def test_tick_is_exported_in_prometheus_format(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    registry = REGISTRY
+    monkeypatch.setattr(registry, "enabled", True)
+    st = BaseStrategy(SimulatedClient(), Settings(simulated_env=True, candle_store_dir=""), logging.getLogger("test"))
+    assert isinstance(st.exchange, InstrumentedExchange)
+    st.tick()
+    st._buy_base_amount_eth(0.01)
+    try:
+        InstrumentedExchange(FailingTicker(), registry).fetch_ticker("ETH/USDT")
+    except RuntimeError:
+        pass
+
+    server = MetricsServer(registry, port=0).start()
+    try:
+        body = urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5).read().decode()
+    finally:
+        server.stop()
+    assert 'exchange_requests_total{method="fetch_ticker"} 2' in body
+    assert 'exchange_errors_total{method="fetch_ticker"} 1' in body
+    assert 'strategy_stage_seconds_count{symbol="ETH/USDT",stage="ohlcv_sync"} 1' in body
+    assert 'strategy_stage_seconds_bucket{symbol="ETH/USDT",stage="order",le="+Inf"} 1' in body
+    assert 'fills_total{symbol="ETH/USDT",side="buy"} 1' in body
+    assert "# TYPE exchange_request_seconds histogram" in body
+
+
+def test_order_calls_are_instrumented():
+    registry = MetricsRegistry(enabled=True)
+    ex = InstrumentedExchange(SimulatedClient(), registry)
+    placed = ex.create_limit_orders([{"symbol": "ETH/USDT", "side": "buy", "amount": 0.1, "price": 99.0 - i} for i in range(2)])
+    ex.fetch_open_orders("ETH/USDT")
+    ex.fetch_order(placed[0]["id"], "ETH/USDT")
+    ex.amend_order(placed[0]["id"], "ETH/USDT", None, 98.0)
+    ex.amend_orders([{"id": placed[1]["id"], "symbol": "ETH/USDT", "price": 97.0}])
+    ex.cancel_order(placed[0]["id"], "ETH/USDT")
+    ex.cancel_orders([{"id": placed[1]["id"], "symbol": "ETH/USDT"}])
+    with pytest.raises(ccxt.OrderNotFound):
+        ex.cancel_order(placed[0]["id"], "ETH/USDT")
+    for method in ("create_limit_orders", "fetch_open_orders", "fetch_order", "amend_order", "amend_orders", "cancel_orders"):
+        assert registry.exchange_requests.value(method) == 1
+        assert registry.exchange_seconds.count(method) == 1
+    assert registry.exchange_requests.value("cancel_order") == 2
+    assert registry.exchange_errors.value("cancel_order") == 1
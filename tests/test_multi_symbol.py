@@ -0,0 +1,49 @@
+import json
+import logging
+import os
+from config.settings import Settings
+from config.symbols import load_symbol_configs
+from core.async_exchange import AsyncExchangeAdapter
+from core.simulated_client import SimulatedClient
+from strategie.martingale_macd_spot import MartingaleMACDSpotStrategy
+from strategie.runtime import AsyncStrategyRuntime, build_strategies
+from strategie.sigma_spot import SigmaSpotStrategy
+
+
+class CountingClient(SimulatedClient):
+    def __init__(self):
+        super().__init__()
+        self.ohlcv_symbols = []
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.ohlcv_symbols.append(symbol)
+        return super().fetch_ohlcv(symbol, timeframe, since, limit)
+
+
+def test_symbols_get_own_settings_and_state(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cfg = tmp_path / "symbols.json"
+    cfg.write_text(json.dumps({
+        "defaults": {"poll_interval_sec": 0, "sigma_buy_base_eth": "0.5"},
+        "symbols": ["ETH/USDT", {"symbol": "BTC/USDT", "strategy": "martingale", "sigma_max_adds": "3"}],
+    }))
+    base = Settings(simulated_env=True, candle_store_dir="", data_dir=str(tmp_path / "data"))
+    configs = load_symbol_configs(str(cfg), base)
+    assert [c.symbol for c in configs] == ["ETH/USDT", "BTC/USDT"]
+    assert configs[0].settings.sigma_buy_base_eth == 0.5 and configs[1].settings.sigma_max_adds == 3
+    assert configs[0].settings.sigma_max_adds == base.sigma_max_adds
+
+    ex = CountingClient()
+    strategies = build_strategies(ex, configs, logging.getLogger("test"))
+    assert isinstance(strategies[0], SigmaSpotStrategy) and isinstance(strategies[1], MartingaleMACDSpotStrategy)
+    assert strategies[0].store.path != strategies[1].store.path
+    assert strategies[0].ledger.path == os.path.join(str(tmp_path / "data"), "ETH-USDT", "trades.csv")
+
+    strategies[0].state.buy_count = 7
+    strategies[0].store.save(strategies[0].state)
+    aex = AsyncExchangeAdapter(ex)
+    AsyncStrategyRuntime(aex, strategies).run(iterations=1)
+    aex.close()
+    assert sorted(set(ex.ohlcv_symbols)) == ["BTC/USDT", "ETH/USDT"]
+    assert strategies[1].store.load().buy_count == 0
+    assert strategies[0].store.load().buy_count >= 7
@@ -0,0 +1,26 @@
+import numpy as np
+from utils.ohlcv_buffer import OHLCVRingBuffer
+
+
+def test_ring_buffer_keeps_last_capacity_candles_in_order():
+    buf = OHLCVRingBuffer(5)
+    rows = [[1000 * i, i, i + 1, i - 1, i + 0.5, 10 * i] for i in range(12)]
+    buf.extend(rows[:3])
+    for r in rows[3:]:
+        buf.append(r)
+    assert len(buf) == 5
+    assert buf.to_list() == rows[-5:]
+    assert buf.last_ts == 11000
+    assert buf[-2] == rows[-2]
+    assert np.array_equal(buf.closes, [r[4] for r in rows[-5:]])
+
+
+def test_ring_buffer_views_are_zero_copy_and_replace_last():
+    buf = OHLCVRingBuffer(4)
+    for i in range(7):
+        buf.append([i, 0, 0, 0, float(i)])
+    closes = buf.closes
+    assert closes.flags["C_CONTIGUOUS"] and np.shares_memory(closes, buf._data)
+    buf.replace_last([6, 1.0, 2.0, 0.5, 42.0, 3.0])
+    assert closes[-1] == 42.0 and len(buf) == 4
+    assert buf[-1] == [6, 1.0, 2.0, 0.5, 42.0, 3.0]
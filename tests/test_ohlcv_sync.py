@@ -0,0 +1,64 @@
+import logging
+import time
+import numpy as np
+from config.settings import Settings
+from core.simulated_client import SimulatedClient
+from strategie.BaseStrategy import BaseStrategy
+from utils.indicators import StreamingMACD
+
+TF_MS = 60_000
+T0 = 1_700_000_000_000
+
+
+class CandleFeed(SimulatedClient):
+    def __init__(self, n: int):
+        super().__init__()
+        self.now_ms = T0
+        self.calls = []
+        closes = 100 + np.cumsum(np.random.default_rng(1).normal(0, 0.2, n))
+        self.rows = [[T0 + i * TF_MS, c, c, c, c, 1.0] for i, c in enumerate(closes.tolist())]
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append((since, limit))
+        rows = [r for r in self.rows if r[0] <= self.now_ms]
+        if since is not None:
+            rows = [r for r in rows if r[0] >= since]
+            return rows[:limit] if limit else rows
+        return rows[-limit:] if limit else rows
+
+
+def _strategy(tmp_path, monkeypatch, feed):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(time, "time", lambda: feed.now_ms / 1000.0)
+    return BaseStrategy(feed, Settings(simulated_env=True, sigma_macd_timeframe="1m"), logging.getLogger("test"))
+
+
+def test_slow_poll_backfills_missing_candles_in_one_request(tmp_path, monkeypatch):
+    feed = CandleFeed(400)
+    feed.now_ms = T0 + 250 * TF_MS
+    st = _strategy(tmp_path, monkeypatch, feed)
+    st._update_ohlcv_cache()
+    feed.now_ms += 7 * TF_MS + 5_000
+    feed.calls.clear()
+    st._update_ohlcv_cache()
+    assert len(feed.calls) == 1 and feed.calls[0][0] is not None
+    assert st._ohlcv_cache.last_ts == T0 + 257 * TF_MS
+    assert np.all(np.diff(st._ohlcv_cache.ts) == TF_MS)
+    ref = StreamingMACD()
+    ref.seed([r[4] for r in feed.rows[51:258]])
+    assert abs(ref.macd - st._macd.macd) < 1e-9
+
+
+def test_non_monotonic_delta_forces_reload(tmp_path, monkeypatch):
+    feed = CandleFeed(300)
+    feed.now_ms = T0 + 250 * TF_MS
+    st = _strategy(tmp_path, monkeypatch, feed)
+    st._update_ohlcv_cache()
+    feed.now_ms += TF_MS
+    good = feed.rows
+    feed.rows = good[:249] + [good[251], good[250]]
+    st._update_ohlcv_cache()
+    assert len(st._ohlcv_cache) == 0 and not st._macd.golden_cross()
+    feed.rows = good
+    st._update_ohlcv_cache()
+    assert st._ohlcv_cache.last_ts == T0 + 251 * TF_MS and len(st._ohlcv_cache) == 200
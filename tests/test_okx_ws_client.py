@@ -0,0 +1,55 @@
+import os
+from core.okx_ws_client import OkxStreamClient
+from core.simulated_client import SimulatedClient
+from core.ws_replay_server import ReplayWebSocketServer, load_recording
+
+RECORDING = os.path.join(os.path.dirname(__file__), "data", "okx_ws_replay.jsonl")
+
+
+class CountingRest(SimulatedClient):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def fetch_ticker(self, symbol):
+        self.calls.append("ticker")
+        return super().fetch_ticker(symbol)
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append("ohlcv")
+        return [[1699999740000 + 60000 * i, 1.0, 1.0, 1.0, 2029.0 + i, 1.0] for i in range(3)]
+
+
+def _wait(cond, timeout=5.0):
+    import time
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_stream_client_serves_replayed_market_data_and_resubscribes():
+    server = ReplayWebSocketServer(load_recording(RECORDING), drop_after_replay=2).start()
+    rest = CountingRest()
+    client = OkxStreamClient(rest, ["ETH/USDT"], ["1m"], public_url=server.url + "/ws/v5/public",
+                             business_url=server.url + "/ws/v5/business", reconnect_delay_sec=0.05)
+    try:
+        client.start()
+        assert _wait(lambda: server.connections >= 4 and client.is_connected())
+        assert _wait(lambda: len(client.recent_trades("ETH/USDT")) >= 3)
+        assert len(server.subscriptions) == 6
+        ticker = client.fetch_ticker("ETH/USDT")
+        assert ticker["last"] == 2032.4 and ticker["bid"] == 2032.3 and ticker["ask"] == 2032.5
+        assert rest.calls == []
+        rows = client.fetch_ohlcv("ETH/USDT", "1m", None, 5)
+        assert [r[0] for r in rows] == [1699999800000 + 60000 * i for i in range(4)] + [1700000040000]
+        assert rows[-1][4] == 2032.4 and rest.calls == []
+        rows = client.fetch_ohlcv("ETH/USDT", "1m", None, 6)
+        assert rest.calls == ["ohlcv"] and len(rows) == 3
+        rows = client.fetch_ohlcv("ETH/USDT", "1m", None, 6)
+        assert rest.calls == ["ohlcv"] and rows[0][0] == 1699999740000 and len(rows) == 6
+    finally:
+        client.close()
+        server.stop()
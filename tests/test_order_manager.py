@@ -0,0 +1,156 @@
+import logging
+import pytest
+from config.settings import Settings
+from core.order_manager import OrderManager
+from core.sim_exchange import SimExchange
+from strategie.martingale_macd_spot import MartingaleMACDSpotStrategy
+from strategie.sigma_spot import SigmaSpotStrategy
+from utils.state import PositionState, StateStore
+
+MARKETS = {"ETH/USDT": {"precision": {"amount": 0.001, "price": 0.1}, "limits": {"amount": {"min": 0.01}, "cost": {"min": 1.0}}}}
+
+
+class Counting:
+    """记录经过的每个交易所调用"""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = []
+
+    def __getattr__(self, name):
+        fn = getattr(self.inner, name)
+
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return fn(*args, **kwargs)
+        return call
+
+
+def make_sim():
+    sim = SimExchange(markets=MARKETS, balances={"USDT": 1000.0, "ETH": 1.0}, maker_fee=0.0, taker_fee=0.0, spread_pct=0.0)
+    sim.on_trade("ETH/USDT", 1_000, 100.0)
+    return sim
+
+
+def make_manager(tmp_path, ex, **kw):
+    fills = []
+    state = PositionState()
+    store = StateStore(Settings(data_dir=str(tmp_path)))
+    m = OrderManager(ex, "ETH/USDT", state, store, lambda *a: fills.append(a), **kw)
+    return m, fills
+
+
+def test_fills_are_applied_from_one_batched_status_request(tmp_path):
+    sim = make_sim()
+    ex = Counting(sim)
+    m, fills = make_manager(tmp_path, ex)
+    ids = [m.place("buy", 1.0, 99.0 - i)["id"] for i in range(3)]
+    assert m.sync() == 1 and fills == []
+
+    # 部分成交：只看一次挂单列表就知道
+    sim.on_trade("ETH/USDT", 2_000, 99.0, 0.4)
+    ex.calls.clear()
+    assert m.sync() == 1 and ex.calls == ["fetch_open_orders"]
+    assert fills == [("buy", pytest.approx(0.4), 99.0, ids[0])]
+    assert m.pending("buy") == pytest.approx(2.6)
+
+    # 成交完离开挂单列表：补查一次最终状态后移除
+    sim.on_trade("ETH/USDT", 3_000, 98.0, 2.0)
+    ex.calls.clear()
+    assert m.sync() == 3 and ex.calls == ["fetch_open_orders", "fetch_order", "fetch_order"]
+    assert [(f[1], f[3]) for f in fills[1:]] == [(pytest.approx(0.6), ids[0]), (pytest.approx(1.0), ids[1])]
+    assert [o["id"] for o in m.orders] == [ids[2]] and m.orders[0]["filled"] == 0.0
+    assert m.state.open_orders is m.orders
+
+
+def test_lookups_per_tick_are_bounded(tmp_path):
+    sim = make_sim()
+    m, fills = make_manager(tmp_path, sim, max_lookups=2)
+    for i in range(5):
+        m.place("buy", 1.0, 99.0)
+    sim.on_trade("ETH/USDT", 2_000, 98.0, 10.0)
+    assert [m.sync(), m.sync(), m.sync()] == [3, 3, 2]
+    assert m.orders == [] and len(fills) == 5
+
+
+def test_stale_orders_are_repriced_then_canceled(tmp_path):
+    sim = make_sim()
+    ex = Counting(sim)
+    m, fills = make_manager(tmp_path, ex, timeout_sec=60, max_reprices=1)
+    a = m.place("buy", 1.0, 95.0)
+    b = m.place("sell", 0.5, 105.0)
+    t0 = m.orders[0]["placed_ms"]
+    assert m.expire(lambda o: 96.0, now_ms=t0 + 59_000) == 0
+
+    # 两笔一起超时：一次批量改单
+    ex.calls.clear()
+    assert m.expire(lambda o: 96.0 if o["side"] == "buy" else 104.0, now_ms=t0 + 61_000) == 1
+    assert ex.calls == ["amend_orders"]
+    assert [o["price"] for o in m.orders] == [96.0, 104.0]
+    assert sim.fetch_order(a["id"])["price"] == 96.0 and sim.fetch_order(b["id"])["price"] == 104.0
+
+    # 改价次数用完：一次批量撤单，下一轮对账拿到最终状态后移除
+    sim.on_trade("ETH/USDT", 2_000, 104.0, 0.2)
+    ex.calls.clear()
+    assert m.expire(lambda o: 97.0, now_ms=t0 + 122_000) == 1 and ex.calls == ["cancel_orders"]
+    assert sim.fetch_open_orders("ETH/USDT") == []
+    assert m.expire(lambda o: 97.0, now_ms=t0 + 300_000) == 0
+    m.sync()
+    assert m.orders == [] and fills == [("sell", pytest.approx(0.2), 104.0, b["id"])]
+
+    with pytest.raises(ValueError):
+        make_manager(tmp_path, sim, stale_action="ignore")
+
+
+def test_strategy_position_follows_limit_fills_and_survives_restart(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sim = make_sim()
+    s = Settings(dry_run=False, candle_store_dir="", order_type="limit", limit_slippage_pct=0.01)
+    st = SigmaSpotStrategy(sim, s, logging.getLogger("test"))
+    st._sell_but_keep_base(0.2)
+    (o,) = st.state.open_orders
+    assert o["side"] == "sell" and o["amount"] == pytest.approx(0.8)
+    # 没成交之前持仓不变，也不会再挂一笔
+    st._refresh_state_from_balance()
+    assert st.state.base_amount == pytest.approx(1.0)
+    st._sell_but_keep_base(0.2)
+    assert len(st.state.open_orders) == 1
+
+    sim.on_trade("ETH/USDT", 2_000, 101.0, 0.3)
+    st._sync_orders()
+    st._refresh_state_from_balance()
+    assert st.state.base_amount == pytest.approx(0.7)
+
+    # 买单成交：先对账再读余额，不重复计入
+    st._buy_base_amount_eth(0.5)
+    sim.on_trade("ETH/USDT", 3_000, 99.0, 0.5)
+    st._sync_orders()
+    st._refresh_state_from_balance()
+    assert st.state.base_amount == pytest.approx(1.2)
+    st.store.flush()
+
+    st2 = SigmaSpotStrategy(sim, s, logging.getLogger("test"))
+    assert [x["id"] for x in st2.state.open_orders] == [o["id"]]
+    assert st2.orders.pending("sell") == pytest.approx(0.5)
+
+
+def test_martingale_balance_refresh_counts_resting_sells(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sim = make_sim()
+    s = Settings(dry_run=False, candle_store_dir="", order_type="limit", limit_slippage_pct=0.01)
+    st = MartingaleMACDSpotStrategy(sim, s, logging.getLogger("test"))
+    st._capture_snapshot()
+    st._sell_all()
+    (o,) = st.state.open_orders
+    assert o["side"] == "sell" and o["amount"] == pytest.approx(1.0)
+    # 全部冻结在卖单里，持仓不变
+    st._refresh_state_from_balance()
+    assert st.state.base_amount == pytest.approx(1.0)
+
+    sim.on_trade("ETH/USDT", 2_000, 101.0, 0.3)
+    st._sync_orders()
+    st._refresh_state_from_balance()
+    assert st.state.base_amount == pytest.approx(0.7)
+    # 余额里没有这个币时按 0 处理
+    st._apply_balance({"free": {}}, None)
+    assert st.state.base_amount == pytest.approx(0.7)
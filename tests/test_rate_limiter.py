@@ -0,0 +1,133 @@
+import threading
+import time
+import pytest
+from core.rate_limiter import MARKET, RateLimitedExchange, RequestScheduler, TokenBucket
+from core.simulated_client import SimulatedClient
+from utils.metrics import REGISTRY
+
+
+class GatedClient(SimulatedClient):
+    """fetch_ticker 阻塞到 gate 打开；记录每个请求真正发出的顺序和时间"""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.gate.set()
+        self.sent = []
+        self.ticker_calls = 0
+
+    def fetch_ticker(self, symbol):
+        self.sent.append(("fetch_ticker", symbol, time.monotonic()))
+        self.ticker_calls += 1
+        self.gate.wait(5)
+        if symbol == "BAD/USDT":
+            raise RuntimeError("down")
+        return super().fetch_ticker(symbol)
+
+    def fetch_balance(self):
+        self.sent.append(("fetch_balance", "", time.monotonic()))
+        return super().fetch_balance()
+
+    def create_market_buy(self, symbol, quote_cost, params=None, ref_price=None):
+        self.sent.append(("create_market_buy", symbol, time.monotonic()))
+        return super().create_market_buy(symbol, quote_cost, params, ref_price)
+
+
+def _wait_for(cond, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end
+        time.sleep(0.002)
+
+
+def _spawn(fn, *args):
+    t = threading.Thread(target=fn, args=args, daemon=True)
+    t.start()
+    return t
+
+
+def test_token_bucket_never_exceeds_limit_in_any_window():
+    b = TokenBucket(10, 2.0)
+    b.updated = 0.0
+    granted, now = [], 0.0
+    while now < 20.0:
+        if b.wait_time(now) <= 0:
+            b.take(now)
+            granted.append(now)
+        now += 0.01
+    assert max(sum(1 for t in granted if s <= t < s + 2.0) for s in granted) <= 10
+    # 稳态速率是 limit*(1-burst)
+    assert len(granted) >= 10 * 20.0 / 2.0 * 0.8
+
+
+def test_orders_jump_the_queue_and_keep_a_reserved_slot():
+    ex = GatedClient()
+    ex.gate.clear()
+    sched = RequestScheduler(limits={}, max_inflight=1)
+    rl = RateLimitedExchange(ex, sched)
+    threads = [_spawn(rl.fetch_ticker, "ETH/USDT")]
+    _wait_for(lambda: len(ex.sent) == 1)
+    threads.append(_spawn(rl.fetch_ticker, "BTC/USDT"))
+    _wait_for(lambda: sched.depth(MARKET) == 1)
+    threads.append(_spawn(rl.fetch_balance))
+    threads.append(_spawn(rl.create_market_buy, "ETH/USDT", 10.0))
+    _wait_for(lambda: sched.depth() == 3)
+    ex.gate.set()
+    for t in threads:
+        t.join(5)
+    assert [s[0] for s in ex.sent] == ["fetch_ticker", "create_market_buy", "fetch_balance", "fetch_ticker"]
+
+    # 两个名额时，读请求最多占一个，另一个留给下单
+    ex = GatedClient()
+    ex.gate.clear()
+    sched = RequestScheduler(limits={}, max_inflight=2)
+    rl = RateLimitedExchange(ex, sched)
+    _spawn(rl.fetch_ticker, "ETH/USDT")
+    _spawn(rl.fetch_ticker, "BTC/USDT")
+    _wait_for(lambda: sched.depth(MARKET) == 1)
+    rl.create_market_buy("ETH/USDT", 10.0)
+    assert ex.sent[-1][0] == "create_market_buy"
+    ex.gate.set()
+
+
+def test_per_endpoint_buckets_pace_requests():
+    ex = GatedClient()
+    rl = RateLimitedExchange(ex, RequestScheduler(limits={"market/ticker": (5, 0.1), "trade/order": (5, 0.1)}))
+    t0 = time.monotonic()
+    for _ in range(10):
+        rl.fetch_ticker("ETH/USDT")
+    assert time.monotonic() - t0 >= 0.15
+    times = [s[2] for s in ex.sent]
+    assert max(sum(1 for t in times if s <= t < s + 0.1) for s in times) <= 5
+
+    # 下单按交易对分桶，不受行情桶影响
+    t0 = time.monotonic()
+    rl.create_market_buy("ETH/USDT", 10.0)
+    rl.create_market_buy("BTC/USDT", 10.0)
+    assert time.monotonic() - t0 < 0.05
+
+
+def test_identical_inflight_reads_share_one_request(monkeypatch):
+    monkeypatch.setattr(REGISTRY, "enabled", True)
+    before = REGISTRY.deduped.value("fetch_ticker")
+    ex = GatedClient()
+    ex.gate.clear()
+    rl = RateLimitedExchange(ex, RequestScheduler(limits={}))
+    results = []
+    threads = [_spawn(lambda: results.append(rl.fetch_ticker("ETH/USDT"))) for _ in range(4)]
+    _wait_for(lambda: ex.ticker_calls == 1)
+    time.sleep(0.05)
+    ex.gate.set()
+    for t in threads:
+        t.join(5)
+    assert ex.ticker_calls == 1 and len(results) == 4
+    assert all(r is results[0] for r in results)
+    assert REGISTRY.deduped.value("fetch_ticker") == before + 3
+
+    # 请求结束后不再合并；异常同样交给所有等待者
+    rl.fetch_ticker("ETH/USDT")
+    assert ex.ticker_calls == 2
+    with pytest.raises(RuntimeError):
+        rl.fetch_ticker("BAD/USDT")
+    assert REGISTRY.queue_depth.value("order") == 0
+    assert "exchange_queue_depth" in REGISTRY.render()
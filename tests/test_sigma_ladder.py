@@ -0,0 +1,151 @@
+import logging
+import numpy as np
+import pytest
+from backtest.engine import backtest_sigma, candles_from_ohlcv
+from config.settings import Settings
+from core.sim_exchange import SimExchange
+from strategie.sigma_spot import SigmaSpotStrategy
+from utils.ladder import ladder_levels
+from utils.indicators import macd_cross_series
+
+MARKETS = {"ETH/USDT": {"precision": {"amount": 0.0001, "price": 0.01}, "limits": {"amount": {"min": 0.0001}, "cost": {"min": 0.1}}}}
+
+
+class Counting:
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = []
+
+    def __getattr__(self, name):
+        fn = getattr(self.inner, name)
+
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return fn(*args, **kwargs)
+        return call
+
+
+def ladder_settings(**kw):
+    s = Settings(candle_store_dir="", sigma_buy_base_eth=0.1, sigma_buy_price_drop_pct=0.01, sigma_sell_profit_pct=0.01,
+                 sigma_sell_leave_base_eth=0.0, sigma_max_adds=5, sigma_ladder_levels=3, **kw)
+    return s
+
+
+def test_levels_follow_the_per_tick_buy_rule():
+    levels = ladder_levels(100.0, 1.0, 2, 0.5, 0.01, 10, 4)
+    assert [n for n, _ in levels] == [3, 4, 5, 6]
+    avg, base = 100.0, 1.0
+    for _, price in levels:
+        # 每一档正好是前一档成交后 均价*(1-drop) 的触发价
+        assert price == pytest.approx(avg * 0.99)
+        avg, base = (avg * base + price * 0.5) / (base + 0.5), base + 0.5
+    assert [n for n, _ in ladder_levels(100.0, 1.0, 8, 0.5, 0.01, 10, 4)] == [9, 10]
+    assert ladder_levels(0.0, 1.0, 0, 0.5, 0.01, 10, 4) == []
+
+
+def test_live_ladder_rests_on_the_book_and_reprices_only_what_changed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sim = SimExchange(markets=MARKETS, balances={"USDT": 1000.0}, maker_fee=0.0, taker_fee=0.0, spread_pct=0.0)
+    sim.on_trade("ETH/USDT", 1_000, 100.0)
+    sim.create_market_buy("ETH/USDT", 100.0, {}, ref_price=100.0)
+    ex = Counting(sim)
+    st = SigmaSpotStrategy(ex, ladder_settings(dry_run=False), logging.getLogger("test"))
+    st.state.buy_count = 1
+
+    def tick():
+        st._sync_orders()
+        st._refresh_state_from_balance()
+        st._on_tick(st._capture_snapshot())
+
+    tick()
+    book = {o["tag"]: o for o in st.state.open_orders}
+    assert sorted(book) == ["add:2", "add:3", "add:4", "tp"]
+    assert book["add:2"]["price"] == 99.0 and book["tp"]["price"] == 101.0 and book["tp"]["amount"] == 1.0
+    assert ex.calls.count("create_limit_orders") == 1
+
+    # 价格不动：只有一次挂单对账，不改单
+    ex.calls.clear()
+    tick()
+    assert [c for c in ex.calls if c not in ("fetch_ticker", "fetch_balance", "fetch_my_trades")] == ["fetch_open_orders"]
+
+    # 第一档被吃掉：由交易所撮合，下一轮只补一档新的并改止盈单
+    sim.on_trade("ETH/USDT", 2_000, 99.0, 0.1)
+    assert sim.fetch_balance()["total"]["ETH"] == pytest.approx(1.1)
+    ex.calls.clear()
+    tick()
+    assert st.state.buy_count == 2 and st.state.base_amount == pytest.approx(1.1)
+    assert ex.calls.count("amend_orders") == 1 and ex.calls.count("create_limit_orders") == 1 and "cancel_orders" not in ex.calls
+    book = {o["tag"]: o for o in st.state.open_orders}
+    assert sorted(book) == ["add:3", "add:4", "add:5", "tp"]
+    avg = (100.0 + 99.0 * 0.1) / 1.1
+    assert book["tp"]["price"] == pytest.approx(avg * 1.01, abs=0.01) and book["tp"]["amount"] == pytest.approx(1.1)
+    assert book["add:3"]["reprices"] == 0
+
+    # 止盈成交后平仓，没有锚点时撤掉剩下的档位
+    sim.on_trade("ETH/USDT", 3_000, 102.0, 5.0)
+    tick()
+    assert st.state.base_amount == pytest.approx(0.0, abs=1e-9)
+    assert sim.fetch_open_orders("ETH/USDT") == []
+    tick()
+    assert st.state.open_orders == []
+
+
+def test_dry_run_ladder_fills_levels_the_price_crossed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sim = SimExchange(markets=MARKETS, balances={"USDT": 1000.0}, spread_pct=0.0)
+    levels = ladder_levels(100.0, 1.0, 1, 0.1, 0.01, 5, 3)
+    sim.on_trade("ETH/USDT", 1_000, (levels[1][1] + levels[2][1]) / 2)
+    s = ladder_settings()
+    s.dry_run = True
+    st = SigmaSpotStrategy(sim, s, logging.getLogger("test"))
+    st.state.base_amount, st.state.avg_cost, st.state.buy_count = 1.0, 100.0, 1
+    st._on_tick(st._capture_snapshot())
+    # 现价穿过前两档
+    assert st.state.buy_count == 3 and st.state.base_amount == pytest.approx(1.2)
+    assert st.state.avg_cost == pytest.approx((100.0 + 0.1 * levels[0][1] + 0.1 * levels[1][1]) / 1.2)
+    assert sim.fetch_open_orders("ETH/USDT") == []
+
+
+def _ladder_reference(candles, s):
+    golden = macd_cross_series(candles.close)
+    base, avg, count, fills = 0.0, 0.0, 0, []
+    for i in range(len(candles)):
+        if base > 0.0 and avg > 0.0:
+            levels = ladder_levels(avg, base, count, s.sigma_buy_base_eth, s.sigma_buy_price_drop_pct, s.sigma_max_adds, s.sigma_ladder_levels)
+            tp_amount = base - s.sigma_sell_leave_base_eth
+            tp = avg * (1 + s.sigma_sell_profit_pct)
+            events = []
+            for k, p in levels:
+                if candles.low[i] <= p:
+                    events.append(("buy", k, min(p, candles.open[i])))
+            sells = [("sell", 0, max(tp, candles.open[i]))] if tp_amount > 0 and candles.high[i] >= tp else []
+            order = sells + events if candles.close[i] < candles.open[i] else events + sells
+            for side, k, p in order:
+                if side == "buy":
+                    avg = (avg * base + p * s.sigma_buy_base_eth) / (base + s.sigma_buy_base_eth)
+                    base += s.sigma_buy_base_eth
+                    count = k
+                else:
+                    base -= tp_amount
+                fills.append((side, i, round(p, 9)))
+        elif golden[i] and count < s.sigma_max_adds:
+            avg, base, count = candles.close[i], s.sigma_buy_base_eth, count + 1
+            fills.append(("buy", i, round(candles.close[i], 9)))
+    return fills, base
+
+
+def test_backtest_ladder_matches_per_bar_loop():
+    rng = np.random.default_rng(11)
+    n = 5_000
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.003, n)))
+    open_ = np.concatenate([[100.0], close[:-1]])
+    ts = 1_700_000_000_000 + np.arange(n) * 60_000
+    rows = np.column_stack([ts, open_, np.maximum(open_, close) * 1.002, np.minimum(open_, close) * 0.998, close, np.ones(n)])
+    candles = candles_from_ohlcv(rows)
+    s = Settings(sigma_buy_base_eth=0.01, sigma_sell_leave_base_eth=0.0, sigma_buy_cooldown_sec=0, sigma_buy_price_drop_pct=0.004,
+                 sigma_sell_profit_pct=0.005, sigma_max_adds=10_000, sigma_ladder_levels=4, order_type="market")
+    result = backtest_sigma(candles, s)
+    fills, base = _ladder_reference(candles, s)
+    assert len(fills) > 50
+    assert [(f.side, f.index, round(f.price, 9)) for f in result.fills] == fills
+    assert result.state["base_amount"] == pytest.approx(base)
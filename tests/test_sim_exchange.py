@@ -0,0 +1,99 @@
+import logging
+import ccxt
+import numpy as np
+import pytest
+from config.settings import Settings
+from core.sim_exchange import SimExchange
+from strategie.sigma_spot import SigmaSpotStrategy
+
+MARKETS = {"ETH/USDT": {"precision": {"amount": 0.001, "price": 0.1}, "limits": {"amount": {"min": 0.01}, "cost": {"min": 5.0}}}}
+
+
+def make_sim(**kw):
+    sim = SimExchange(markets=MARKETS, balances={"USDT": 1000.0, "ETH": 1.0}, maker_fee=0.001, taker_fee=0.002, spread_pct=0.0, **kw)
+    sim.on_trade("ETH/USDT", 1_000, 100.0)
+    return sim
+
+
+def test_resting_orders_fill_in_price_time_priority_with_partial_fills():
+    sim = make_sim()
+    a = sim.create_limit_buy("ETH/USDT", 1.0, 99.0)
+    b = sim.create_limit_buy("ETH/USDT", 1.0, 99.0)
+    c = sim.create_limit_buy("ETH/USDT", 1.0, 99.5)
+    assert a["status"] == "open"
+    bal = sim.fetch_balance()
+    assert bal["used"]["USDT"] == pytest.approx(99.0 + 99.0 + 99.5)
+    assert bal["free"]["USDT"] == pytest.approx(1000.0 - 297.5)
+
+    # 99.2 只穿过 99.5 的单；随后 99.0 的两笔按时间先后分到 1.5 的量
+    sim.on_trade("ETH/USDT", 2_000, 99.2, 5.0)
+    assert sim.fetch_order(c["id"])["status"] == "closed"
+    sim.on_trade("ETH/USDT", 3_000, 99.0, 1.5)
+    oa, ob = sim.fetch_order(a["id"]), sim.fetch_order(b["id"])
+    assert oa["status"] == "closed" and oa["filled"] == 1.0
+    assert ob["status"] == "open" and ob["filled"] == pytest.approx(0.5)
+    assert [o["id"] for o in sim.fetch_open_orders("ETH/USDT")] == [b["id"]]
+
+    trades = sim.fetch_my_trades("ETH/USDT")
+    assert [(t["order"], t["price"], t["amount"], t["takerOrMaker"]) for t in trades] == [
+        (c["id"], 99.5, 1.0, "maker"), (a["id"], 99.0, 1.0, "maker"), (b["id"], 99.0, 0.5, "maker")]
+    assert [t["id"] for t in sim.fetch_my_trades("ETH/USDT", since=3_000)] == [trades[1]["id"], trades[2]["id"]]
+
+    # 买入手续费从 base 里扣，撤单退回剩余冻结
+    sim.cancel_order(b["id"])
+    bal = sim.fetch_balance()
+    assert bal["free"]["ETH"] == pytest.approx(1.0 + 2.5 * 0.999)
+    assert bal["used"]["USDT"] == pytest.approx(0.0, abs=1e-9)
+    assert bal["free"]["USDT"] == pytest.approx(1000.0 - 99.5 - 99.0 - 0.5 * 99.0)
+    with pytest.raises(ccxt.OrderNotFound):
+        sim.cancel_order(b["id"])
+
+
+def test_market_and_crossing_orders_pay_taker_fee_and_follow_okx_rules():
+    sim = make_sim()
+    # 10 USDT / 100 = 0.1 ETH；卖出手续费从 quote 里扣
+    o = sim.create_market_buy("ETH/USDT", 10.0, {}, ref_price=100.0)
+    assert o["status"] == "closed" and o["filled"] == pytest.approx(0.1)
+    s = sim.create_limit_sell("ETH/USDT", 0.5, 99.0)
+    assert s["status"] == "closed" and s["average"] == 100.0
+    bal = sim.fetch_balance()["free"]
+    assert bal["ETH"] == pytest.approx(1.0 + 0.1 * 0.998 - 0.5)
+    assert bal["USDT"] == pytest.approx(1000.0 - 10.0 + 50.0 * 0.998)
+
+    # 数量截断到步长、补到最小金额；价格按步长取整
+    o = sim.create_limit_buy("ETH/USDT", 0.01234, 80.04)
+    assert o["amount"] == 0.063 and o["price"] == 80.0
+    with pytest.raises(ccxt.InsufficientFunds):
+        sim.create_limit_buy("ETH/USDT", 100.0, 99.0)
+    with pytest.raises(ccxt.InsufficientFunds):
+        sim.create_market_sell("ETH/USDT", 10.0)
+
+
+def test_candle_replay_drives_strategy_against_real_balances(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(3)
+    n = 400
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.003, n)))
+    open_ = np.concatenate([[100.0], close[:-1]])
+    rows = np.column_stack([1_700_000_000_000 + np.arange(n) * 60_000, open_, np.maximum(open_, close) * 1.001,
+                            np.minimum(open_, close) * 0.999, close, np.full(n, 50.0)]).tolist()
+
+    sim = SimExchange(balances={"USDT": 10_000.0})
+    sim.replay_candles("ETH/USDT", "1m", rows[:200])
+    assert sim.fetch_ohlcv("ETH/USDT", "1m", since=int(rows[198][0])) == [rows[198], rows[199]]
+    assert sim.fetch_ohlcv("ETH/USDT", "1m", limit=1) == [rows[199]]
+
+    s = Settings(dry_run=False, candle_store_dir="", sigma_buy_base_eth=0.05, sigma_buy_cooldown_sec=0,
+                 sigma_buy_price_drop_pct=0.002, sigma_sell_profit_pct=0.003, sigma_sell_leave_base_eth=0.05, order_type="market")
+    st = SigmaSpotStrategy(sim, s, logging.getLogger("test"))
+    sim.replay_candles("ETH/USDT", "1m", rows[200:], on_bar=lambda i: st.tick())
+
+    trades = sim.fetch_my_trades("ETH/USDT", since=0)
+    assert any(t["side"] == "buy" for t in trades)
+    bal = sim.fetch_balance()
+    bought = sum(t["amount"] - t["fee"]["cost"] for t in trades if t["side"] == "buy")
+    sold = sum(t["amount"] for t in trades if t["side"] == "sell")
+    assert bal["total"]["ETH"] == pytest.approx(bought - sold)
+    spent = sum(t["cost"] for t in trades if t["side"] == "buy")
+    got = sum(t["cost"] - t["fee"]["cost"] for t in trades if t["side"] == "sell")
+    assert bal["total"]["USDT"] == pytest.approx(10_000.0 - spent + got)
@@ -0,0 +1,66 @@
+import json
+import os
+from config.settings import Settings
+from utils.state import PositionState, StateStore
+
+
+def _store(tmp_path, durability="batch", **kw):
+    s = Settings(simulated_env=True, data_dir=str(tmp_path), state_durability=durability, state_fsync_interval_ms=60_000)
+    return StateStore(s, **kw)
+
+
+def test_batch_mode_group_commits_and_recovers_from_journal(tmp_path):
+    store = _store(tmp_path)
+    state = store.load()
+    store.flush()
+    base = store.fsyncs
+    for i in range(1, 6):
+        state.base_amount = 0.1 * i
+        state.buy_count = i
+        store.save(state)
+    store.save(state)
+    assert store.fsyncs == base
+    store.flush()
+    assert store.fsyncs == base + 1
+    # 模拟崩溃：不 close，直接从磁盘恢复；再追加一条写了一半的记录
+    with open(store.journal_path, "ab") as f:
+        f.write(b'{"seq": 99, "state": {"base_amount": 9')
+    recovered = _store(tmp_path).load()
+    assert recovered == PositionState(base_amount=0.5, avg_cost=0.0, last_buy_ms=0, buy_count=5)
+
+
+def test_compaction_writes_atomic_snapshot_and_truncates_journal(tmp_path):
+    store = _store(tmp_path, "fsync", compact_every=4)
+    state = store.load()
+    for i in range(1, 11):
+        state.buy_count = i
+        store.save(state)
+    assert store.fsyncs >= 10
+    with open(store.path, encoding="utf-8") as f:
+        snap = json.load(f)
+    assert snap["buy_count"] == 7 and snap["_seq"] == 8
+    assert not os.path.exists(store.path + ".tmp")
+    with open(store.journal_path, "rb") as f:
+        assert f.read().count(b"\n") == 3
+    store.close()
+    # 快照已经包含的旧日志记录（截断前崩溃）不会覆盖更新的快照
+    with open(store.journal_path, "wb") as f:
+        f.write(json.dumps({"seq": 3, "state": {"buy_count": 3}}).encode() + b"\n")
+    assert _store(tmp_path).load().buy_count == 7
+
+
+def test_legacy_and_corrupt_state_files(tmp_path):
+    with open(os.path.join(tmp_path, "state.json"), "w", encoding="utf-8") as f:
+        json.dump({"base_amount": 0.25, "avg_cost": 2000.0, "last_buy_ms": 1, "buy_count": 2}, f)
+    legacy = _store(tmp_path)
+    state = legacy.load()
+    assert state.avg_cost == 2000.0
+    state.buy_count = 3
+    legacy.save(state)
+    legacy.close()
+    with open(os.path.join(tmp_path, "state.json"), "w", encoding="utf-8") as f:
+        f.write('{"base_amount": 0.2')
+    store = _store(tmp_path)
+    state = store.load()
+    assert state.buy_count == 3 and state.avg_cost == 2000.0
+    assert any(n.startswith("state.json.corrupt") for n in os.listdir(tmp_path))
@@ -0,0 +1,119 @@
+import json
+import logging
+import pytest
+from config.settings import Settings
+from core.async_exchange import AsyncExchangeAdapter
+from core.markets import build_rules
+from core.okx_client import OkxClient
+from core.simulated_client import SimulatedClient
+from strategie.BaseStrategy import BaseStrategy
+from strategie.runtime import AsyncStrategyRuntime
+from utils.tracing import TRACER
+
+
+class FakeCcxt:
+    """OkxClient 里用到的 ccxt 方法，行情取 SimulatedClient 的"""
+
+    def __init__(self):
+        self.sim = SimulatedClient()
+        self.markets = {"ETH/USDT": {"precision": {"amount": 1e-6, "price": 0.01}, "limits": {"amount": {"min": 0.001}, "cost": {"min": 1.0}}}}
+
+    def fetch_ohlcv(self, symbol, timeframe=None, since=None, limit=None):
+        return self.sim.fetch_ohlcv(symbol, timeframe, since, limit)
+
+    def fetch_ticker(self, symbol):
+        return {"last": 100.0, "bid": 99.9, "ask": 100.1}
+
+    def fetch_balance(self):
+        return {"free": {"ETH": 0.0, "USDT": 1000.0}}
+
+    def fetch_my_trades(self, symbol, since=None):
+        return []
+
+    def create_order(self, symbol, type, side, amount, price, params):
+        return {"id": "o-1", "amount": amount}
+
+
+def okx_client():
+    c = OkxClient.__new__(OkxClient)
+    c.exchange = FakeCcxt()
+    c.rules = build_rules(c.exchange.markets)
+    return c
+
+
+@pytest.fixture
+def tracer():
+    TRACER.configure(1000)
+    yield TRACER
+    TRACER.configure(0)
+
+
+def spans(tracer):
+    return {e[0]: e for e in tracer.events()}
+
+
+def test_disabled_tracer_records_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    st = BaseStrategy(SimulatedClient(), Settings(simulated_env=True, candle_store_dir=""), logging.getLogger("test"))
+    with TRACER.trace("tick") as root:
+        st.tick()
+        root.set(x=1)
+    assert not TRACER.enabled and TRACER.events() == []
+
+
+def test_tick_to_order_spans_nest_and_export(tmp_path, monkeypatch, tracer):
+    monkeypatch.chdir(tmp_path)
+    settings = Settings(dry_run=False, candle_store_dir="")
+    st = BaseStrategy(okx_client(), settings, logging.getLogger("test"))
+    # 没有进行中的 trace 时 span 不记录
+    st.tick()
+    assert tracer.events() == []
+
+    with tracer.trace("tick", symbol=st.symbol):
+        st.tick()
+        st._buy_base_amount_eth(0.01)
+    s = spans(tracer)
+    root = s["tick"]
+    assert root[3] == 0
+    for name in ("refresh_state", "ohlcv_sync", "ticker", "decide", "after_tick", "state_flush", "order"):
+        assert s[name][1] == root[1] and s[name][3] == root[2], name
+    assert s["normalize_amount"][3] == s["order"][2]
+    assert s["create_order"][3] == s["order"][2]
+    assert s["create_order"][7] == {"side": "buy", "type": "market", "order_id": "o-1"}
+    assert s["order"][7]["method"] == "_buy_base_amount_eth"
+
+    (trace_id, ms), = tracer.tick_to_order()
+    assert trace_id == root[1]
+    assert 0 < ms <= (root[5] - root[4]) / 1e6
+
+    path = tmp_path / "trace.json"
+    assert tracer.export(str(path)) == len(tracer.events())
+    data = json.loads(path.read_text())
+    xs = [e for e in data["traceEvents"] if e["ph"] == "X"]
+    names = {e["args"]["name"] for e in data["traceEvents"] if e["ph"] == "M"}
+    assert names == {"MainThread ETH/USDT"}
+    tick = next(e for e in xs if e["name"] == "tick")
+    order = next(e for e in xs if e["name"] == "create_order")
+    assert tick["ts"] <= order["ts"] and order["ts"] + order["dur"] <= tick["ts"] + tick["dur"] + 1
+    assert tick["args"]["tick_to_order_ms"] == ms
+
+
+def test_async_tick_puts_concurrent_fetches_on_separate_lanes(tmp_path, monkeypatch, tracer):
+    monkeypatch.chdir(tmp_path)
+    settings = Settings(dry_run=False, candle_store_dir="", poll_interval_sec=0)
+    ex = okx_client()
+    st = BaseStrategy(ex, settings, logging.getLogger("test"))
+    aex = AsyncExchangeAdapter(ex, max_workers=4)
+    try:
+        AsyncStrategyRuntime(aex, [st]).run(iterations=1)
+    finally:
+        aex.close()
+    s = spans(tracer)
+    root, fetch = s["tick"], s["fetch"]
+    assert fetch[3] == root[2]
+    lanes = set()
+    for name in ("refresh_state", "ohlcv_sync", "ticker"):
+        assert s[name][3] == fetch[2]
+        lanes.add(s[name][6])
+    assert len(lanes) == 3 and root[6] not in lanes
+    assert s["decide"][1] == root[1]
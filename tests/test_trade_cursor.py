@@ -0,0 +1,109 @@
+import logging
+from config.settings import Settings
+from core.simulated_client import SimulatedClient
+from strategie.BaseStrategy import BaseStrategy
+from utils.ledger_db import SqliteTradeLedger
+from utils.state import TradeCursor, TradeLedger
+
+T0 = 1_700_000_000_000
+
+
+class HistoryClient(SimulatedClient):
+    def __init__(self, trades, page=100):
+        super().__init__()
+        self.trades = trades
+        self.page = page
+        self.calls = []
+
+    def fetch_balance(self):
+        return {"free": {"ETH": 1.0}}
+
+    def fetch_my_trades(self, symbol, since=None):
+        rows = [t for t in self.trades if since is None or t["timestamp"] >= since]
+        out = rows[: self.page]
+        self.calls.append((since, len(out)))
+        return out
+
+
+def _trade(i, side, amount, price, ts=None):
+    return {"id": str(i), "timestamp": T0 + i * 1000 if ts is None else ts, "side": side, "amount": amount, "price": price}
+
+
+def _full_avg(trades):
+    buy = sum(t["amount"] for t in trades if t["side"] == "buy")
+    cost = sum(t["amount"] * t["price"] for t in trades if t["side"] == "buy")
+    sell = sum(t["amount"] for t in trades if t["side"] == "sell")
+    return cost / (buy - sell)
+
+
+def test_cursor_pages_and_dedupes_same_millisecond(tmp_path):
+    trades = [_trade(i, "buy" if i % 3 else "sell", 0.1 if i % 3 else 0.05, 100 + i) for i in range(250)]
+    trades.append(_trade(250, "buy", 0.2, 90, ts=trades[-1]["timestamp"]))
+    ex = HistoryClient(trades)
+    cursor = TradeCursor(Settings(simulated_env=True, data_dir=str(tmp_path)), "ETH/USDT")
+    assert cursor.sync(ex) == 251
+    assert abs(cursor.position()[0] - _full_avg(trades)) < 1e-9
+    ex.calls.clear()
+    assert cursor.sync(ex) == 0 and len(ex.calls) == 1
+    reloaded = TradeCursor(Settings(simulated_env=True, data_dir=str(tmp_path)), "ETH/USDT")
+    assert reloaded.agg == cursor.agg
+
+
+def test_each_poll_only_fetches_new_trades(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    trades = [_trade(i, "buy", 0.01, 100 + i) for i in range(40)]
+    ex = HistoryClient(list(trades))
+    st = BaseStrategy(ex, Settings(simulated_env=False, candle_store_dir=""), logging.getLogger("test"))
+    st.settings.dry_run = False
+    st._refresh_state_from_balance()
+    ex.calls.clear()
+    ex.trades.append(_trade(40, "sell", 0.05, 150))
+    ex.trades.append(_trade(41, "buy", 0.02, 120))
+    st._refresh_state_from_balance()
+    assert ex.calls == [(trades[-1]["timestamp"], 3)]
+    assert abs(st.state.avg_cost - _full_avg(ex.trades)) < 1e-9
+
+
+def test_cursor_and_ledgers_agree_on_average(tmp_path):
+    # 同一批成交经过游标、csv 账本、sqlite 账本，实盘与 dry-run/回退路径的均价一致
+    settings = Settings(simulated_env=True, data_dir=str(tmp_path))
+    trades = [_trade(0, "buy", 1.0, 100), _trade(1, "sell", 1.0, 110), _trade(2, "buy", 1.0, 100),
+              _trade(3, "buy", 1.0, 200), _trade(4, "sell", 0.5, 300)]
+    cursor = TradeCursor(settings, "ETH/USDT")
+    cursor.apply(trades)
+    csv_ledger = TradeLedger(settings)
+    db = SqliteTradeLedger(settings)
+    for t in trades:
+        for ledger in (csv_ledger, db):
+            ledger.record(t["side"], "ETH/USDT", t["price"], t["amount"], 0.0, t["id"])
+    expected = cursor.position()
+    assert abs(expected[0] - _full_avg(trades)) < 1e-9 and abs(expected[1] - 1.5) < 1e-9
+    for ledger in (csv_ledger, db):
+        got = ledger.rebuild_position("ETH/USDT")
+        assert abs(got[0] - expected[0]) < 1e-9 and abs(got[1] - expected[1]) < 1e-9
+    db.close()
+    assert not (tmp_path / "trade_cursor.json.tmp").exists()
+
+
+def test_prefetched_full_page_keeps_paging(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    trades = [_trade(i, "buy", 0.01, 100 + i) for i in range(250)]
+    ex = HistoryClient(trades)
+    st = BaseStrategy(ex, Settings(simulated_env=False, candle_store_dir=""), logging.getLogger("test"))
+    st.settings.dry_run = False
+    st.trade_cursor.reset()
+    ex.calls.clear()
+    # 异步路径先并发取回的第一页是满页，剩下的由 sync 继续翻完
+    st._apply_balance(ex.fetch_balance(), trades[:100])
+    assert [c[1] for c in ex.calls] == [100, 52]
+    assert st.trade_cursor.agg.count == 250
+    assert abs(st.state.avg_cost - _full_avg(trades)) < 1e-9
+
+
+def test_full_page_in_one_millisecond_stops(tmp_path):
+    trades = [_trade(i, "buy", 0.01, 100, ts=T0) for i in range(100)]
+    ex = HistoryClient(trades)
+    cursor = TradeCursor(Settings(simulated_env=True, data_dir=str(tmp_path)), "ETH/USDT")
+    assert cursor.sync(ex) == 100
+    ex.calls.clear()
+    assert cursor.sync(ex) == 0 and len(ex.calls) == 1
@@ -0,0 +1,101 @@
+import os
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from utils.ohlcv_buffer import COLUMNS, is_strictly_increasing, timeframe_to_ms
+
+_RECORD_BYTES = len(COLUMNS) * 8
+
+
+class CandleSeries:
+    """
+    单个 symbol+timeframe 的K线文件：定长 float64 记录 [ts, open, high, low, close, volume]，只追加；
+    与最后一根同时间戳的K线原地覆盖（未收盘K线会被反复更新）。读取走 np.memmap，不把整个文件读进内存。
+    """
+
+    def __init__(self, path: str, timeframe: str):
+        self.path = path
+        self.timeframe = timeframe
+        self.tf_ms = timeframe_to_ms(timeframe)
+        self._mm: Optional[np.memmap] = None
+        self._mm_rows = -1
+        if not os.path.exists(path):
+            open(path, "ab").close()
+
+    def __len__(self) -> int:
+        return os.path.getsize(self.path) // _RECORD_BYTES
+
+    def _rows(self) -> np.ndarray:
+        n = len(self)
+        if n == 0:
+            return np.zeros((0, len(COLUMNS)))
+        if self._mm is None or self._mm_rows != n:
+            self._mm = np.memmap(self.path, dtype=np.float64, mode="r", shape=(n, len(COLUMNS)))
+            self._mm_rows = n
+        return self._mm
+
+    @property
+    def last_ts(self) -> int:
+        n = len(self)
+        if n == 0:
+            return 0
+        with open(self.path, "rb") as f:
+            f.seek((n - 1) * _RECORD_BYTES)
+            return int(np.frombuffer(f.read(8), dtype=np.float64)[0])
+
+    def append(self, candles: Sequence[Sequence[float]]) -> int:
+        if not candles or not is_strictly_increasing(candles):
+            return 0
+        last = self.last_ts
+        rows = [[float(v) if v is not None else 0.0 for v in list(c[: len(COLUMNS)]) + [0.0] * (len(COLUMNS) - len(c))]
+                for c in candles if int(c[0]) >= last]
+        if not rows:
+            return 0
+        n = len(self)
+        with open(self.path, "r+b") as f:
+            if n and int(rows[0][0]) == last:
+                f.seek((n - 1) * _RECORD_BYTES)
+            else:
+                f.seek(n * _RECORD_BYTES)
+            f.write(np.asarray(rows, dtype=np.float64).tobytes())
+        return len(rows)
+
+    def _lower_bound(self, rows: np.ndarray, ts: int) -> int:
+        n = rows.shape[0]
+        if n == 0:
+            return 0
+        first = int(rows[0, 0])
+        if ts <= first:
+            return 0
+        # 连续无缺口时直接按步长定位，O(1)；有缺口再退回二分
+        guess = -(-(ts - first) // self.tf_ms)
+        if guess < n and rows[guess, 0] >= ts and rows[guess - 1, 0] < ts:
+            return int(guess)
+        if guess >= n and rows[n - 1, 0] < ts:
+            return n
+        return int(np.searchsorted(rows[:, 0], ts, side="left"))
+
+    def range(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> np.ndarray:
+        rows = self._rows()
+        lo = 0 if start_ms is None else self._lower_bound(rows, int(start_ms))
+        hi = rows.shape[0] if end_ms is None else self._lower_bound(rows, int(end_ms))
+        return rows[lo:max(lo, hi)]
+
+    def tail(self, count: int) -> np.ndarray:
+        rows = self._rows()
+        return rows[max(0, rows.shape[0] - count):]
+
+
+class CandleStore:
+    def __init__(self, root: str = os.path.join("data", "candles")):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._series: Dict[Tuple[str, str], CandleSeries] = {}
+
+    def series(self, symbol: str, timeframe: str) -> CandleSeries:
+        key = (symbol, timeframe)
+        s = self._series.get(key)
+        if s is None:
+            name = f"{symbol.replace('/', '-')}_{timeframe}.bin"
+            s = CandleSeries(os.path.join(self.root, name), timeframe)
+            self._series[key] = s
+        return s
@@ -1,6 +1,6 @@
 import datetime
 import numpy as np
-from typing import List, Any
+from typing import Any, List, Optional, Sequence, Tuple
 
 try:
     import talib
@@ -19,6 +19,20 @@ def macd_cross_golden(closes: np.ndarray) -> bool:
         return False
     return bool(macd[-2] <= signal[-2] and macd[-1] > signal[-1])
 
+def macd_cross_series(closes: np.ndarray) -> np.ndarray:
+    closes = np.asarray(closes, dtype=float)
+    cross = np.zeros(closes.size, dtype=bool)
+    if closes.size < 2:
+        return cross
+    if talib is not None:
+        macd, signal, hist = talib.MACD(closes, fastperiod=12, slowperiod=26, signalperiod=9)
+    else:
+        macd = _ema(closes, 12) - _ema(closes, 26)
+        signal = _ema(macd, 9)
+    with np.errstate(invalid="ignore"):
+        cross[1:] = (macd[:-1] <= signal[:-1]) & (macd[1:] > signal[1:])
+    return cross
+
 def _ema(arr: np.ndarray, period: int) -> np.ndarray:
     alpha = 2.0 / (period + 1)
     res = np.zeros_like(arr)
@@ -27,11 +41,141 @@ def _ema(arr: np.ndarray, period: int) -> np.ndarray:
         res[i] = alpha * arr[i] + (1 - alpha) * res[i - 1]
     return res
 
-def compute_prev_day_1h_baseline(exchange, symbol: str, timezone: str) -> float:
+def _ema_rows(x: np.ndarray, alphas: np.ndarray) -> np.ndarray:
+    """
+    对 (N, T) 的每一行按各自的 alpha 计算 EMA，结果与逐行调用 _ema 一致；时间维循环，行维向量化
+    """
+    xt = np.ascontiguousarray(np.asarray(x, dtype=float).T)
+    out = np.empty_like(xt)
+    if xt.shape[0] == 0:
+        return out.T
+    a = np.asarray(alphas, dtype=float)
+    b = 1.0 - a
+    out[0] = xt[0]
+    tmp = np.empty_like(xt[0])
+    for t in range(1, xt.shape[0]):
+        np.multiply(b, out[t - 1], out=out[t])
+        np.multiply(a, xt[t], out=tmp)
+        out[t] += tmp
+    return out.T
+
+def golden_cross_matrix(macd: np.ndarray, signal: np.ndarray) -> np.ndarray:
+    cross = np.zeros(macd.shape, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        cross[..., 1:] = (macd[..., :-1] <= signal[..., :-1]) & (macd[..., 1:] > signal[..., 1:])
+    return cross
+
+def macd_batch(prices: np.ndarray, params: Sequence[Tuple[int, int, int]], use_talib: Optional[bool] = None):
+    """
+    prices: (品种数, 时间) 的收盘价矩阵；params: [(fast, slow, signal), ...]
+    返回 macd, signal, cross 三个 (参数组数, 品种数, 时间) 数组
+    use_talib=None 时有 TA-Lib 就用 TA-Lib，否则走向量化 EMA（与 _ema 逐位一致）
+    """
+    prices = np.asarray(prices, dtype=float)
+    if prices.ndim == 1:
+        prices = prices[None, :]
+    params = [(int(f), int(s), int(g)) for f, s, g in params]
+    n_sym, n_t = prices.shape
+    if use_talib is None:
+        use_talib = talib is not None
+    if use_talib:
+        if talib is None:
+            raise RuntimeError("TA-Lib is not installed")
+        macd = np.empty((len(params), n_sym, n_t))
+        signal = np.empty_like(macd)
+        for p, (f, s, g) in enumerate(params):
+            for i in range(n_sym):
+                macd[p, i], signal[p, i], _ = talib.MACD(prices[i], fastperiod=f, slowperiod=s, signalperiod=g)
+        return macd, signal, golden_cross_matrix(macd, signal)
+    periods = sorted({f for f, _, _ in params} | {s for _, s, _ in params})
+    index = {period: k for k, period in enumerate(periods)}
+    alphas = np.repeat(2.0 / (np.asarray(periods, dtype=float) + 1), n_sym)
+    emas = _ema_rows(np.tile(prices, (len(periods), 1)), alphas).reshape(len(periods), n_sym, n_t)
+    fast_idx = np.array([index[f] for f, _, _ in params], dtype=int)
+    slow_idx = np.array([index[s] for _, s, _ in params], dtype=int)
+    macd = emas[fast_idx] - emas[slow_idx]
+    sig_alphas = np.repeat(2.0 / (np.array([g for _, _, g in params], dtype=float) + 1), n_sym)
+    signal = _ema_rows(macd.reshape(-1, n_t), sig_alphas).reshape(macd.shape)
+    return macd, signal, golden_cross_matrix(macd, signal)
+
+class StreamingMACD:
+    """
+    增量 MACD：与 _ema 回退实现逐位一致，只保存倒数第二根与最后一根K线之后的 EMA 状态，
+    替换最后一根或追加新K线都是 O(1)
+    """
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self._a_fast = 2.0 / (fast + 1)
+        self._a_slow = 2.0 / (slow + 1)
+        self._a_signal = 2.0 / (signal + 1)
+        self._prev = None
+        self._last = None
+        self.count = 0
+
+    def _step(self, state, close: float):
+        if state is None:
+            return (close, close, 0.0)
+        ef, es, sig = state
+        ef = self._a_fast * close + (1 - self._a_fast) * ef
+        es = self._a_slow * close + (1 - self._a_slow) * es
+        sig = self._a_signal * (ef - es) + (1 - self._a_signal) * sig
+        return (ef, es, sig)
+
+    def reset(self):
+        self._prev = None
+        self._last = None
+        self.count = 0
+
+    def seed(self, closes):
+        self.reset()
+        for c in closes:
+            self.append(float(c))
+
+    def append(self, close: float):
+        self._prev = self._last
+        self._last = self._step(self._prev, float(close))
+        self.count += 1
+
+    def replace_last(self, close: float):
+        if self._last is None:
+            self.append(close)
+            return
+        self._last = self._step(self._prev, float(close))
+
+    @property
+    def macd(self) -> float:
+        return self._last[0] - self._last[1] if self._last is not None else 0.0
+
+    @property
+    def signal(self) -> float:
+        return self._last[2] if self._last is not None else 0.0
+
+    def golden_cross(self) -> bool:
+        if self.count < 2:
+            return False
+        prev_macd = self._prev[0] - self._prev[1]
+        return bool(prev_macd <= self._prev[2] and self.macd > self._last[2])
+
+def _prev_day_1h_from_store(exchange, symbol: str, store, prev_day: datetime.date) -> List[List[float]]:
+    series = store.series(symbol, "1h")
+    start_ms = int(datetime.datetime(prev_day.year, prev_day.month, prev_day.day, tzinfo=datetime.timezone.utc).timestamp() * 1000)
+    last_ts = series.last_ts
+    if last_ts and last_ts >= start_ms:
+        # 只补最后一根之后的增量
+        missing = (int(datetime.datetime.now(datetime.timezone.utc).timestamp() * 1000) - last_ts) // 3600000 + 2
+        series.append(exchange.fetch_ohlcv(symbol, "1h", last_ts, int(missing)))
+    else:
+        series.append(exchange.fetch_ohlcv(symbol, "1h", None, 48))
+    return series.range(start_ms - 24 * 3600000, None).tolist()
+
+def compute_prev_day_1h_baseline(exchange, symbol: str, timezone: str, store=None) -> float:
     try:
         now = datetime.datetime.utcnow()
         prev_day = now.date() - datetime.timedelta(days=1)
-        ohlcv = exchange.fetch_ohlcv(symbol, "1h", None, 48)
+        if store is not None:
+            ohlcv = _prev_day_1h_from_store(exchange, symbol, store, prev_day)
+        else:
+            ohlcv = exchange.fetch_ohlcv(symbol, "1h", None, 48)
         closes = []
         for c in ohlcv:
             ts = int(c[0])
@@ -0,0 +1,19 @@
+from typing import List, Tuple
+
+
+def ladder_levels(avg_cost: float, base_amount: float, buy_count: int, step: float, drop_pct: float,
+                  max_adds: int, levels: int) -> List[Tuple[int, float]]:
+    """
+    Sigma 接下来的加仓档位 [(第几次加仓, 挂单价)]：每档价格是上一档按挂单价成交 step 之后的均价再跌 drop_pct，
+    与逐轮判断 现价 <= 均价*(1-drop_pct) 时买入 step 的规则一致；最多 levels 档，总次数不超过 max_adds
+    """
+    out = []
+    if avg_cost <= 0.0 or base_amount <= 0.0 or step <= 0.0:
+        return out
+    avg, base = avg_cost, base_amount
+    for n in range(buy_count + 1, min(max_adds, buy_count + levels) + 1):
+        price = avg * (1.0 - drop_pct)
+        out.append((n, price))
+        avg = (avg * base + price * step) / (base + step)
+        base += step
+    return out
@@ -0,0 +1,149 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+from config.settings import Settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    time INTEGER NOT NULL,
+    side TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    price REAL NOT NULL,
+    amount REAL NOT NULL,
+    fee REAL NOT NULL,
+    order_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trades_symbol_time ON trades (symbol, time);
+CREATE TABLE IF NOT EXISTS positions (
+    symbol TEXT PRIMARY KEY,
+    buy_amt REAL NOT NULL DEFAULT 0,
+    buy_cost REAL NOT NULL DEFAULT 0,
+    sell_amt REAL NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_UPSERT = """
+INSERT INTO positions (symbol, buy_amt, buy_cost, sell_amt, count) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(symbol) DO UPDATE SET
+    buy_amt = buy_amt + excluded.buy_amt,
+    buy_cost = buy_cost + excluded.buy_cost,
+    sell_amt = sell_amt + excluded.sell_amt,
+    count = count + excluded.count
+"""
+
+
+class SqliteTradeLedger:
+    """
+    与 TradeLedger 相同接口的 SQLite（WAL）账本：成交按 (symbol, time) 建索引，
+    写入时在同一事务里累加 positions 表，rebuild_position 只查一行
+    """
+
+    def __init__(self, settings: Settings, path: str = ""):
+        self.path = path or os.path.join(settings.data_dir, "trades.db")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _insert(self, cur, ts: int, side: str, symbol: str, price: float, amount: float, fee: float, order_id: str):
+        cur.execute(
+            "INSERT INTO trades (time, side, symbol, price, amount, fee, order_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (ts, side, symbol, price, amount, fee, order_id),
+        )
+        if side == "buy":
+            cur.execute(_UPSERT, (symbol, amount, amount * price, 0.0, 1))
+        elif side == "sell":
+            cur.execute(_UPSERT, (symbol, 0.0, 0.0, amount, 1))
+        else:
+            cur.execute(_UPSERT, (symbol, 0.0, 0.0, 0.0, 1))
+
+    def record(self, side: str, symbol: str, price: float, amount: float, fee: float, order_id: str):
+        ts = int(time.time() * 1000)
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                self._insert(cur, ts, side.lower(), symbol, float(price), float(amount), float(fee or 0.0), order_id or "")
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    def rebuild_position(self, symbol: str):
+        with self._lock:
+            row = self._conn.execute("SELECT buy_amt, buy_cost, sell_amt FROM positions WHERE symbol = ?", (symbol,)).fetchone()
+        if row is None:
+            return 0.0, 0.0
+        buy_amt, buy_cost, sell_amt = row
+        net_amt = buy_amt - sell_amt
+        if net_amt > 0:
+            return buy_cost / net_amt, net_amt
+        return 0.0, 0.0
+
+    def count(self, symbol: str = "") -> int:
+        with self._lock:
+            if symbol:
+                row = self._conn.execute("SELECT count FROM positions WHERE symbol = ?", (symbol,)).fetchone()
+            else:
+                row = self._conn.execute("SELECT COALESCE(SUM(count), 0) FROM positions").fetchone()
+        return int(row[0]) if row else 0
+
+    def import_csv(self, csv_path: str, batch: int = 10000, force: bool = False) -> int:
+        """
+        导入旧的 trades.csv：成交按 batch 行 executemany 写入，持仓累计量在内存里汇总后每个 symbol 只 upsert 一次，
+        整个导入在一个事务里。解析失败的行按 0 处理，与 TradeLedger 一致。
+        账本里已有成交时拒绝导入（重复导入会把累计量翻倍），force=True 时照样追加
+        """
+        existing = self.count()
+        if existing and not force:
+            raise ValueError(f"ledger {self.path} already has {existing} trades, refusing to import again")
+        n = 0
+        agg: Dict[str, List[float]] = {}
+        rows = []
+        insert = "INSERT INTO trades (time, side, symbol, price, amount, fee, order_id) VALUES (?, ?, ?, ?, ?, ?, ?)"
+        with open(csv_path, "r", encoding="utf-8") as f, self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                for row in csv.DictReader(f):
+                    try:
+                        ts = int(float(row.get("time") or 0))
+                        amount = float(row.get("amount") or 0.0)
+                        price = float(row.get("price") or 0.0)
+                        fee = float(row.get("fee") or 0.0)
+                    except Exception:
+                        ts, amount, price, fee = 0, 0.0, 0.0, 0.0
+                    side = (row.get("side") or "").lower()
+                    symbol = row.get("symbol") or ""
+                    rows.append((ts, side, symbol, price, amount, fee, row.get("order_id") or ""))
+                    a = agg.setdefault(symbol, [0.0, 0.0, 0.0, 0])
+                    if side == "buy":
+                        a[0] += amount
+                        a[1] += amount * price
+                    elif side == "sell":
+                        a[2] += amount
+                    a[3] += 1
+                    n += 1
+                    if len(rows) >= batch:
+                        cur.executemany(insert, rows)
+                        rows = []
+                if rows:
+                    cur.executemany(insert, rows)
+                for symbol, (buy_amt, buy_cost, sell_amt, count) in agg.items():
+                    cur.execute(_UPSERT, (symbol, buy_amt, buy_cost, sell_amt, count))
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        return n
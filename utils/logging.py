@@ -1,24 +1,174 @@
 import os
+import copy
+import json
+import queue
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Hashable, Optional, Tuple
 from config.settings import Settings
 
-def init_logger(settings: Settings):
-    os.makedirs("logs", exist_ok=True)
-    logger = logging.getLogger("bot")
+_LISTENERS: Dict[str, QueueListener] = {}
+
+
+class Lazy:
+    """日志字段的延迟求值：只有记录真的被输出时，才在后台线程里调用 fn"""
+
+    __slots__ = ("fn",)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __str__(self):
+        return str(self.fn())
+
+
+def _resolve(v: Any) -> Any:
+    if isinstance(v, Lazy):
+        v = v.fn()
+    if isinstance(v, (str, int, float, bool)) or v is None:
+        return v
+    return str(v)
+
+
+def log_fields(rate_key: Optional[Hashable] = None, **fields) -> Dict[str, Any]:
+    """
+    logger.info("cant buy", extra=log_fields(price_ok=False, detail=Lazy(lambda: ...)))
+    rate_key 不为 None 时，同一条消息在限频窗口内 rate_key 不变就只输出一次
+    """
+    extra: Dict[str, Any] = {"fields": fields}
+    if rate_key is not None:
+        extra["rate_key"] = rate_key
+    return extra
+
+
+def _record_fields(record: logging.LogRecord, with_symbol: bool) -> Dict[str, Any]:
+    # 文件和终端两个 handler 共用同一条记录，Lazy 只求值一次
+    resolved = getattr(record, "_resolved_fields", None)
+    if resolved is None:
+        resolved = {k: _resolve(v) for k, v in (getattr(record, "fields", None) or {}).items()}
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            resolved["suppressed"] = suppressed
+        record._resolved_fields = resolved
+    symbol = getattr(record, "symbol", None)
+    if symbol and with_symbol:
+        return {"symbol": symbol, **resolved}
+    return resolved
+
+
+class KeyValueFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        # symbol 已经由 SymbolLoggerAdapter 写在消息前缀里
+        fields = _record_fields(record, with_symbol=False)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        d = {
+            "ts": int(record.created * 1000),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        d.update(_record_fields(record, with_symbol=True))
+        if record.exc_info:
+            d["exc"] = self.formatException(record.exc_info)
+        return json.dumps(d, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    带 rate_key 的记录按 (logger, msg, rate_key) 限频：interval_sec 内相同的只放行第一条，
+    下一次放行时在 suppressed 字段里带上被吞掉的条数。在调用方线程执行，只做一次字典查找
+    """
+
+    def __init__(self, interval_sec: float):
+        super().__init__()
+        self.interval_sec = interval_sec
+        self._lock = threading.Lock()
+        self._seen: Dict[Tuple[str, str, Hashable], Tuple[float, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate_key = getattr(record, "rate_key", None)
+        if rate_key is None or self.interval_sec <= 0:
+            return True
+        key = (record.name, str(record.msg), rate_key)
+        now = time.monotonic()
+        with self._lock:
+            last, dropped = self._seen.get(key, (0.0, 0))
+            if last and now - last < self.interval_sec:
+                self._seen[key] = (last, dropped + 1)
+                return False
+            self._seen[key] = (now, 0)
+        record.suppressed = dropped
+        return True
+
+
+class _DeferredQueueHandler(QueueHandler):
+    # 默认的 prepare 会在调用方线程里格式化消息；这里原样入队，格式化和 Lazy 求值都放到监听线程
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+
+def init_logger(settings: Settings, name: str = "bot", log_dir: str = "logs"):
+    """
+    日志走 QueueHandler -> 后台 QueueListener：交易循环只把记录放进无界队列，
+    格式化、写文件和终端输出都在后台线程完成
+    """
+    logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
-    fmt = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-    fh = RotatingFileHandler("logs/trade.log", maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
+    if name in _LISTENERS or logger.handlers:
+        return logger
+    os.makedirs(log_dir, exist_ok=True)
+    if settings.log_format == "json":
+        fmt: logging.Formatter = JsonLinesFormatter()
+    else:
+        fmt = KeyValueFormatter("%(asctime)s %(levelname)s %(message)s")
+    fh = RotatingFileHandler(os.path.join(log_dir, "trade.log"), maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
     fh.setLevel(logging.INFO)
     fh.setFormatter(fmt)
     ch = logging.StreamHandler()
     ch.setLevel(logging.INFO)
     ch.setFormatter(fmt)
-    if not logger.handlers:
-        logger.addHandler(fh)
-        logger.addHandler(ch)
-    # if not any(isinstance(h, RotatingFileHandler) for h in logger.handlers):
-    #     logger.addHandler(fh)
-    # if not any(isinstance(h, logging.StreamHandler) for h in logger.handlers):
-    #     logger.addHandler(ch)
+    q: "queue.Queue[logging.LogRecord]" = queue.Queue()
+    qh = _DeferredQueueHandler(q)
+    qh.addFilter(RateLimitFilter(settings.log_rate_limit_sec))
+    logger.addHandler(qh)
+    logger.propagate = False
+    listener = QueueListener(q, fh, ch, respect_handler_level=True)
+    listener.start()
+    _LISTENERS[name] = listener
+    atexit.register(shutdown_logger, name)
     return logger
+
+
+def shutdown_logger(name: str = "bot"):
+    """把队列里剩下的记录写完再停后台线程"""
+    listener = _LISTENERS.pop(name, None)
+    if listener is None:
+        return
+    listener.stop()
+    logger = logging.getLogger(name)
+    for h in list(logger.handlers):
+        logger.removeHandler(h)
+    for h in listener.handlers:
+        h.close()
+
+
+class SymbolLoggerAdapter(logging.LoggerAdapter):
+    def process(self, msg, kwargs):
+        extra = dict(kwargs.get("extra") or {})
+        extra["symbol"] = self.extra["symbol"]
+        kwargs["extra"] = extra
+        return f"[{self.extra['symbol']}] {msg}", kwargs
+
+
+def symbol_logger(logger, symbol: str):
+    return SymbolLoggerAdapter(logger, {"symbol": symbol})
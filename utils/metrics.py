@@ -0,0 +1,346 @@
+import bisect
+import functools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from core.exchange_base import IExchange
+from utils.tracing import TRACER
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for lv, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, lv)} {v:g}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self._values[label_values] = value
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for lv, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, lv)} {v:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # label values -> [每个桶的计数..., +Inf 计数, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(label_values)
+            if s is None:
+                s = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+            s[i] += 1
+            s[-1] += value
+
+    def count(self, *label_values: str) -> int:
+        s = self._series.get(label_values)
+        return int(sum(s[:-1])) if s else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((lv, list(s)) for lv, s in self._series.items())
+        for lv, s in series:
+            acc = 0.0
+            for b, c in zip(self.buckets, s):
+                acc += c
+                le = 'le="%g"' % b
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, lv, le)} {acc:g}")
+            acc += s[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_str(self.labels, lv, le)} {acc:g}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, lv)} {s[-1]:.9g}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, lv)} {acc:g}")
+        return lines
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "t0")
+
+    def __init__(self, hist: Histogram, labels: Tuple[str, ...]):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0, *self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """
+    进程内指标。enabled=False 时 stage()/fill()/lag() 都直接返回，策略代码里的埋点只剩一次属性判断
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.exchange_seconds = Histogram("exchange_request_seconds", "latency of IExchange calls", ("method",))
+        self.exchange_requests = Counter("exchange_requests_total", "IExchange calls", ("method",))
+        self.exchange_errors = Counter("exchange_errors_total", "IExchange calls that raised", ("method",))
+        self.stage_seconds = Histogram("strategy_stage_seconds", "latency of strategy loop stages", ("symbol", "stage"))
+        self.loop_seconds = Histogram("strategy_loop_seconds", "duration of one strategy iteration", ("symbol",))
+        self.loop_lag = Histogram("strategy_loop_lag_seconds", "iteration start delay beyond poll_interval_sec", ("symbol",))
+        self.loop_errors = Counter("strategy_loop_errors_total", "iterations that raised", ("symbol",))
+        self.fills = Counter("fills_total", "fills written to the ledger", ("symbol", "side"))
+        self.queue_depth = Gauge("exchange_queue_depth", "requests waiting for a rate-limit token or slot", ("priority",))
+        self.queue_wait = Histogram("exchange_queue_wait_seconds", "time spent waiting in the request scheduler", ("priority",))
+        self.deduped = Counter("exchange_deduped_total", "reads answered by an identical in-flight request", ("method",))
+        self.metrics = [self.exchange_seconds, self.exchange_requests, self.exchange_errors, self.stage_seconds,
+                        self.loop_seconds, self.loop_lag, self.loop_errors, self.fills,
+                        self.queue_depth, self.queue_wait, self.deduped]
+
+    def stage(self, symbol: str, stage: str):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.stage_seconds, (symbol, stage))
+
+    def loop(self, symbol: str):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.loop_seconds, (symbol,))
+
+    def lag(self, symbol: str, seconds: float):
+        if self.enabled:
+            self.loop_lag.observe(max(0.0, seconds), symbol)
+
+    def loop_error(self, symbol: str):
+        if self.enabled:
+            self.loop_errors.inc(symbol)
+
+    def fill(self, symbol: str, side: str):
+        if self.enabled:
+            self.fills.inc(symbol, side)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self.metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def timed_stage(stage: str):
+    """方法装饰器：按 self.symbol 记录该方法的耗时，开启追踪时同时记一个 span；用在下单等分支里的方法上"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            if not REGISTRY.enabled and not TRACER.enabled:
+                return fn(self, *args, **kwargs)
+            with REGISTRY.stage(self.symbol, stage), TRACER.span(stage, method=fn.__name__):
+                return fn(self, *args, **kwargs)
+        return wrapper
+    return deco
+
+
+def instrument_exchange(exchange: IExchange, registry: MetricsRegistry = REGISTRY) -> IExchange:
+    if not registry.enabled or isinstance(exchange, InstrumentedExchange):
+        return exchange
+    return InstrumentedExchange(exchange, registry)
+
+
+class InstrumentedExchange(IExchange):
+    """给每个 IExchange 调用记录耗时、次数和异常次数；只在开启指标时包一层"""
+
+    def __init__(self, exchange: IExchange, registry: MetricsRegistry = REGISTRY):
+        self.exchange = exchange
+        self.registry = registry
+
+    def _call(self, method: str, *args, **kwargs):
+        r = self.registry
+        r.exchange_requests.inc(method)
+        t0 = time.perf_counter()
+        try:
+            return getattr(self.exchange, method)(*args, **kwargs)
+        except Exception:
+            r.exchange_errors.inc(method)
+            raise
+        finally:
+            r.exchange_seconds.observe(time.perf_counter() - t0, method)
+
+    def __getattr__(self, name: str):
+        return getattr(self.exchange, name)
+
+    def load_markets(self) -> Dict[str, Any]:
+        return self._call("load_markets")
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str, since: Optional[int] = None, limit: Optional[int] = None) -> List[List[float]]:
+        return self._call("fetch_ohlcv", symbol, timeframe, since, limit)
+
+    def fetch_ticker(self, symbol: str) -> Dict[str, Any]:
+        return self._call("fetch_ticker", symbol)
+
+    def create_market_buy(self, symbol: str, quote_cost: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return self._call("create_market_buy", symbol, quote_cost, params, ref_price=ref_price)
+
+    def create_market_sell(self, symbol: str, base_amount: float, params: Optional[Dict[str, Any]] = None, ref_price: Optional[float] = None) -> Dict[str, Any]:
+        return self._call("create_market_sell", symbol, base_amount, params, ref_price=ref_price)
+
+    def create_limit_buy(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._call("create_limit_buy", symbol, base_amount, price, params)
+
+    def create_limit_sell(self, symbol: str, base_amount: float, price: float, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._call("create_limit_sell", symbol, base_amount, price, params)
+
+    def fetch_balance(self) -> Dict[str, Any]:
+        return self._call("fetch_balance")
+
+    def fetch_my_trades(self, symbol: str, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._call("fetch_my_trades", symbol, since)
+
+    def fetch_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        return self._call("fetch_order", order_id, symbol)
+
+    def fetch_open_orders(self, symbol: str) -> List[Dict[str, Any]]:
+        return self._call("fetch_open_orders", symbol)
+
+    def cancel_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
+        return self._call("cancel_order", order_id, symbol)
+
+    def amend_order(self, order_id: str, symbol: str, amount: Optional[float] = None, price: Optional[float] = None) -> Dict[str, Any]:
+        return self._call("amend_order", order_id, symbol, amount, price)
+
+    def create_limit_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("create_limit_orders", orders)
+
+    def cancel_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("cancel_orders", orders)
+
+    def amend_orders(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("amend_orders", orders)
+
+
+class InstrumentedLedger:
+    def __init__(self, ledger, symbol: str, registry: MetricsRegistry = REGISTRY):
+        self.ledger = ledger
+        self.symbol = symbol
+        self.registry = registry
+
+    def __getattr__(self, name: str):
+        return getattr(self.ledger, name)
+
+    def record(self, side: str, symbol: str, price: float, amount: float, fee: float, order_id: str):
+        with self.registry.stage(self.symbol, "ledger_write"):
+            self.ledger.record(side, symbol, price, amount, fee, order_id)
+        self.registry.fill(symbol, side)
+
+
+class MetricsServer:
+    """/metrics 为 Prometheus 文本；开启追踪时 /trace 返回当前缓冲的 Chrome trace JSON"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = "127.0.0.1", port: int = 9108):
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path in ("/metrics", "/"):
+                    body = registry_ref.render().encode("utf-8")
+                    ctype = "text/plain; version=0.0.4; charset=utf-8"
+                elif path == "/trace" and TRACER.enabled:
+                    body = json.dumps(TRACER.chrome_trace(), ensure_ascii=False, default=str).encode("utf-8")
+                    ctype = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_metrics(settings, registry: MetricsRegistry = REGISTRY) -> Optional[MetricsServer]:
+    """METRICS_PORT>0 时打开指标并在本地起 /metrics；否则保持关闭，埋点不产生开销"""
+    if not settings.metrics_port:
+        return None
+    registry.enabled = True
+    return MetricsServer(registry, settings.metrics_host, settings.metrics_port).start()
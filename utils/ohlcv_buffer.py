@@ -0,0 +1,110 @@
+from functools import lru_cache
+from typing import List, Sequence
+import numpy as np
+
+COLUMNS = ("ts", "open", "high", "low", "close", "volume")
+_UNIT_MS = {"s": 1000, "m": 60 * 1000, "h": 3600 * 1000, "d": 86400 * 1000, "w": 7 * 86400 * 1000, "M": 30 * 86400 * 1000, "y": 365 * 86400 * 1000}
+
+
+@lru_cache(maxsize=None)
+def timeframe_to_ms(timeframe: str) -> int:
+    unit = timeframe[-1]
+    if unit not in _UNIT_MS or not timeframe[:-1].isdigit():
+        raise ValueError(f"unsupported timeframe: {timeframe}")
+    return int(timeframe[:-1]) * _UNIT_MS[unit]
+
+
+def is_strictly_increasing(candles: Sequence[Sequence[float]]) -> bool:
+    prev = None
+    for c in candles:
+        ts = int(c[0])
+        if prev is not None and ts <= prev:
+            return False
+        prev = ts
+    return True
+
+
+class OHLCVRingBuffer:
+    """
+    定长列式K线环形缓冲区。每个值同时写入 i 和 i+capacity 两个位置（镜像），
+    因此任意时刻按时间排序的窗口都是一段连续内存，closes/opens 等返回零拷贝视图。
+    视图在下一次 append/replace_last 之后内容会变化，不要跨 tick 持有。
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self._data = np.zeros((len(COLUMNS), 2 * self.capacity), dtype=float)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _write(self, pos: int, candle: Sequence[float]):
+        n = min(len(candle), len(COLUMNS))
+        for k in range(n):
+            v = candle[k]
+            self._data[k, pos] = self._data[k, pos + self.capacity] = float(v) if v is not None else 0.0
+        for k in range(n, len(COLUMNS)):
+            self._data[k, pos] = self._data[k, pos + self.capacity] = 0.0
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+    def append(self, candle: Sequence[float]):
+        if self._size < self.capacity:
+            self._write((self._start + self._size) % self.capacity, candle)
+            self._size += 1
+        else:
+            self._write(self._start, candle)
+            self._start = (self._start + 1) % self.capacity
+
+    def extend(self, candles: Sequence[Sequence[float]]):
+        for c in candles[-self.capacity:]:
+            self.append(c)
+
+    def replace_last(self, candle: Sequence[float]):
+        if self._size == 0:
+            self.append(candle)
+            return
+        self._write((self._start + self._size - 1) % self.capacity, candle)
+
+    def column(self, name: str) -> np.ndarray:
+        k = COLUMNS.index(name)
+        return self._data[k, self._start:self._start + self._size]
+
+    @property
+    def ts(self) -> np.ndarray:
+        return self.column("ts")
+
+    @property
+    def opens(self) -> np.ndarray:
+        return self.column("open")
+
+    @property
+    def closes(self) -> np.ndarray:
+        return self.column("close")
+
+    @property
+    def last_ts(self) -> int:
+        if self._size == 0:
+            return 0
+        return int(self._data[0, self._start + self._size - 1])
+
+    def __getitem__(self, i: int) -> List[float]:
+        if i < 0:
+            i += self._size
+        if i < 0 or i >= self._size:
+            raise IndexError("candle index out of range")
+        row = self._data[:, self._start + i].tolist()
+        row[0] = int(row[0])
+        return row
+
+    def to_list(self) -> List[List[float]]:
+        rows = self._data[:, self._start:self._start + self._size].T.tolist()
+        for r in rows:
+            r[0] = int(r[0])
+        return rows
@@ -1,9 +1,11 @@
 import os
 import json
 import csv
-from dataclasses import dataclass, asdict
-from typing import Optional
+import time
+from dataclasses import dataclass, asdict, field
+from typing import Any, Dict, List, Optional, Tuple
 from config.settings import Settings
+from utils.ledger_db import SqliteTradeLedger
 
 @dataclass
 class PositionState:
@@ -11,45 +13,190 @@ class PositionState:
     avg_cost: float = 0.0
     last_buy_ms: int = 0
     buy_count: int = 0
+    # 实盘限价单：OrderManager 跟踪中的挂单，随状态一起落盘，重启后接着对账
+    open_orders: List[Dict[str, Any]] = field(default_factory=list)
+
+def _state_from_dict(d: Dict[str, Any]) -> PositionState:
+    return PositionState(
+        base_amount=float(d.get("base_amount", 0.0)),
+        avg_cost=float(d.get("avg_cost", 0.0)),
+        last_buy_ms=int(d.get("last_buy_ms", 0) or 0),
+        buy_count=int(d.get("buy_count", 0) or 0),
+        open_orders=[dict(o) for o in d.get("open_orders") or []],
+    )
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 class StateStore:
-    def __init__(self, settings: Settings):
-        self.path = os.path.join("data", "state.json")
-        os.makedirs("data", exist_ok=True)
+    """
+    state.json 是快照（临时文件 + fsync + rename 原子替换，带 _seq），state.journal 是只追加的 JSON 行日志。
+    save() 只往日志追加一行（内容没变就跳过），durability 决定何时 fsync：
+      fsync 每次 save 都 fsync；batch 在 flush() 或距上次 fsync 超过 fsync_interval_ms 时合并成一次 fsync；
+      none 只写进操作系统缓存。
+    日志累计 compact_every 条后写一次快照并截断日志。load() 读快照再取日志里最后一条完整记录，
+    写了一半的尾行直接忽略，所以进程崩溃不会再把仓位读成 0。
+    """
 
-    def load(self) -> PositionState:
+    def __init__(self, settings: Settings, compact_every: int = 256):
+        self.path = os.path.join(settings.data_dir, "state.json")
+        self.journal_path = os.path.join(settings.data_dir, "state.journal")
+        os.makedirs(settings.data_dir, exist_ok=True)
+        self.durability = settings.state_durability
+        if self.durability not in ("fsync", "batch", "none"):
+            raise ValueError(f"unsupported state durability: {self.durability}")
+        self.fsync_interval_ms = settings.state_fsync_interval_ms
+        self.compact_every = compact_every
+        self._seq = 0
+        self._journal = None
+        self._journal_records = 0
+        self._last_saved: Optional[Dict[str, Any]] = None
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+        self.fsyncs = 0
+
+    def _fsync(self, f):
+        f.flush()
+        os.fsync(f.fileno())
+        self.fsyncs += 1
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+
+    def _read_snapshot(self) -> Tuple[Optional[Dict[str, Any]], int]:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return None, 0
         try:
-            if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
-                state = PositionState()
-                self.save(state)
-                return state
             with open(self.path, "r", encoding="utf-8") as f:
                 d = json.load(f)
-                base_amount = float(d.get("base_amount", 0.0))
-                avg_cost = float(d.get("avg_cost", 0.0))
-                last_buy_ms = int(d.get("last_buy_ms", 0) or 0)
-                buy_count = int(d.get("buy_count", 0) or 0)
-                return PositionState(base_amount=base_amount, avg_cost=avg_cost, last_buy_ms=last_buy_ms, buy_count=buy_count)
+            return d, int(d.get("_seq", 0) or 0)
+        except Exception:
+            os.replace(self.path, f"{self.path}.corrupt-{int(time.time())}")
+            return None, 0
+
+    def _read_journal_tail(self) -> Tuple[Optional[Dict[str, Any]], int]:
+        if not os.path.exists(self.journal_path):
+            return None, 0
+        with open(self.journal_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            block = 4096
+            while True:
+                start = max(0, size - block)
+                f.seek(start)
+                lines = f.read(size - start).split(b"\n")
+                # 第一段可能是被截断的行，除非已经读到文件头
+                candidates = lines if start == 0 else lines[1:]
+                for line in reversed(candidates):
+                    try:
+                        rec = json.loads(line)
+                        return rec["state"], int(rec["seq"])
+                    except Exception:
+                        continue
+                if start == 0:
+                    return None, 0
+                block *= 4
+
+    def _open_journal(self):
+        if self._journal is not None:
+            return self._journal
+        if os.path.exists(self.journal_path):
+            # 崩溃留下的半行会和下一条记录粘在一起，先截到最后一个换行
+            with open(self.journal_path, "r+b") as f:
+                data = f.read()
+                keep = data.rfind(b"\n") + 1
+                if keep != len(data):
+                    f.truncate(keep)
+                self._journal_records = data.count(b"\n")
+        self._journal = open(self.journal_path, "ab")
+        return self._journal
+
+    def load(self) -> PositionState:
+        d, seq = self._read_snapshot()
+        rec, rec_seq = self._read_journal_tail()
+        if rec is not None and rec_seq > seq:
+            d, seq = rec, rec_seq
+        self._seq = seq
+        if d is None:
+            state = PositionState()
+            self.save(state)
+            return state
+        try:
+            state = _state_from_dict(d)
         except Exception:
             state = PositionState()
             self.save(state)
             return state
+        self._last_saved = asdict(state)
+        return state
 
     def save(self, state: PositionState):
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(asdict(state), f, ensure_ascii=False)
+        d = asdict(state)
+        if d == self._last_saved:
+            return
+        f = self._open_journal()
+        self._seq += 1
+        f.write(json.dumps({"seq": self._seq, "state": d}, ensure_ascii=False).encode("utf-8") + b"\n")
+        f.flush()
+        self._last_saved = d
+        self._journal_records += 1
+        self._dirty = True
+        if self.durability == "fsync":
+            self._fsync(f)
+        elif self.durability == "batch" and (time.monotonic() - self._last_fsync) * 1000 >= self.fsync_interval_ms:
+            self._fsync(f)
+        if self._journal_records >= self.compact_every:
+            self.snapshot()
+
+    def flush(self):
+        """tick 结束时调用：batch 模式下把这一轮的所有 save 合并成一次 fsync"""
+        if self._journal is not None and self._dirty and self.durability != "none":
+            self._fsync(self._journal)
+
+    def snapshot(self):
+        if self._last_saved is None:
+            return
+        d = dict(self._last_saved)
+        d["_seq"] = self._seq
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(d, f, ensure_ascii=False)
+            f.flush()
+            if self.durability != "none":
+                os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        if self.durability != "none":
+            _fsync_dir(self.path)
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_path, "wb")
+        self._journal_records = 0
+        self._dirty = False
+
+    def close(self):
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
 
 class TradeLedger:
     def __init__(self, settings: Settings):
-        self.path = os.path.join("data", "trades.csv")
-        os.makedirs("data", exist_ok=True)
+        self.path = os.path.join(settings.data_dir, "trades.csv")
+        os.makedirs(settings.data_dir, exist_ok=True)
         if not os.path.exists(self.path):
             with open(self.path, "w", newline="", encoding="utf-8") as f:
                 w = csv.writer(f)
                 w.writerow(["time", "side", "symbol", "price", "amount", "fee", "order_id"])
 
     def record(self, side: str, symbol: str, price: float, amount: float, fee: float, order_id: str):
-        import time
         ts = int(time.time() * 1000)
         with open(self.path, "a", newline="", encoding="utf-8") as f:
             w = csv.writer(f)
@@ -83,3 +230,130 @@ class TradeLedger:
             avg_cost = buy_cost / net_amt
             return avg_cost, net_amt
         return 0.0, 0.0
+
+def open_ledger(settings: Settings):
+    if settings.ledger_backend == "sqlite":
+        ledger = SqliteTradeLedger(settings)
+        csv_path = os.path.join(settings.data_dir, "trades.csv")
+        # 第一次切到 sqlite 时把已有的 csv 流水导进来
+        if ledger.count() == 0 and os.path.exists(csv_path):
+            ledger.import_csv(csv_path)
+        return ledger
+    if settings.ledger_backend != "csv":
+        raise ValueError(f"unsupported ledger backend: {settings.ledger_backend}")
+    return TradeLedger(settings)
+
+@dataclass
+class TradeAggregates:
+    last_ts: int = 0
+    last_ids: List[str] = field(default_factory=list)
+    buy_amt: float = 0.0
+    buy_cost: float = 0.0
+    sell_amt: float = 0.0
+    count: int = 0
+    synced: bool = False
+
+class TradeCursor:
+    """
+    交易所成交历史的游标 + 累计买卖量。每次只用 since=last_ts 拉新成交，
+    同一毫秒的成交按 id 去重，均价由累计量直接算出，不再每轮拉全量历史
+    """
+
+    def __init__(self, settings: Settings, symbol: str, page_size: int = 100):
+        self.symbol = symbol
+        self.page_size = page_size
+        self.path = os.path.join(settings.data_dir, "trade_cursor.json")
+        self.durability = settings.state_durability
+        os.makedirs(settings.data_dir, exist_ok=True)
+        self.agg = self._load()
+
+    def _load(self) -> TradeAggregates:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                d = json.load(f)
+            if d.get("symbol") != self.symbol:
+                return TradeAggregates()
+            return TradeAggregates(
+                last_ts=int(d.get("last_ts", 0) or 0),
+                last_ids=[str(x) for x in d.get("last_ids", [])],
+                buy_amt=float(d.get("buy_amt", 0.0)),
+                buy_cost=float(d.get("buy_cost", 0.0)),
+                sell_amt=float(d.get("sell_amt", 0.0)),
+                count=int(d.get("count", 0) or 0),
+                synced=bool(d.get("synced", False)),
+            )
+        except Exception:
+            return TradeAggregates()
+
+    def save(self):
+        d = asdict(self.agg)
+        d["symbol"] = self.symbol
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(d, f, ensure_ascii=False)
+            f.flush()
+            if self.durability != "none":
+                os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        if self.durability != "none":
+            _fsync_dir(self.path)
+
+    def reset(self):
+        self.agg = TradeAggregates()
+        self.save()
+
+    @property
+    def since(self) -> Optional[int]:
+        return self.agg.last_ts if self.agg.synced else None
+
+    def apply(self, trades: List[Dict[str, Any]]) -> int:
+        agg = self.agg
+        added = 0
+        for t in sorted(trades, key=lambda t: int(t.get("timestamp") or 0)):
+            ts = int(t.get("timestamp") or 0)
+            tid = str(t.get("id") or "")
+            if ts < agg.last_ts or (ts == agg.last_ts and tid in agg.last_ids):
+                continue
+            side = t.get("side", "")
+            amount = float(t.get("amount", 0.0) or 0.0)
+            price = float(t.get("price", 0.0) or 0.0)
+            if side == "buy":
+                agg.buy_amt += amount
+                agg.buy_cost += amount * price
+            elif side == "sell":
+                agg.sell_amt += amount
+            if ts > agg.last_ts:
+                agg.last_ts = ts
+                agg.last_ids = []
+            agg.last_ids.append(tid)
+            agg.count += 1
+            added += 1
+        if added or not agg.synced:
+            agg.synced = True
+            self.save()
+        return added
+
+    def sync(self, exchange, trades: Optional[List[Dict[str, Any]]] = None) -> int:
+        """
+        增量同步到最新，返回新增成交数。trades 是调用方已经按 since 取回的第一页；
+        满页就从这一页最后的时间戳继续翻，直到不满一页
+        """
+        total = 0
+        since = self.since
+        while True:
+            if trades is None:
+                trades = exchange.fetch_my_trades(self.symbol, since)
+            total += self.apply(trades)
+            if len(trades) < self.page_size:
+                return total
+            last = max(int(t.get("timestamp") or 0) for t in trades)
+            if since is not None and last <= since:
+                # 整页都在同一毫秒，按时间游标翻不动了
+                return total
+            since, trades = last, None
+
+    def position(self) -> Tuple[float, float]:
+        net_amt = self.agg.buy_amt - self.agg.sell_amt
+        if net_amt > 0:
+            return self.agg.buy_cost / net_amt, net_amt
+        return 0.0, 0.0
@@ -0,0 +1,178 @@
+import asyncio
+import atexit
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# 当前线程/任务里正在进行的 span；asyncio 任务和 to_thread 都会拷贝 context，子 span 能找到父 span
+_CURRENT: ContextVar[Optional["_Span"]] = ContextVar("trace_span", default=None)
+
+# (name, trace_id, span_id, parent_id, start_ns, end_ns, lane, args)
+_Event = Tuple[str, int, int, int, int, int, str, Dict[str, Any]]
+
+
+def _current_task():
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "args", "start_ns", "lane", "where", "token")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: int, parent: Optional["_Span"], args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = next(tracer._ids)
+        self.parent_id = parent.span_id if parent else 0
+        self.args = args
+        task = _current_task()
+        self.where = task if task is not None else threading.get_ident()
+        # 时间线上的一行：同一线程/任务里的 span 嵌套在父 span 那一行；gather 出去的任务各占一行，避免并发的 span 互相重叠
+        if parent is not None and parent.where == self.where:
+            self.lane = parent.lane
+        elif parent is not None and task is not None:
+            self.lane = f"{parent.lane}/{name}"
+        else:
+            self.lane = threading.current_thread().name
+            if parent is None and "symbol" in args:
+                self.lane += f" {args['symbol']}"
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.token = _CURRENT.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end_ns = time.perf_counter_ns()
+        _CURRENT.reset(self.token)
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._finish(self, end_ns)
+        return False
+
+
+class Tracer:
+    """
+    每轮循环一个 trace：trace() 开根 span，span() 在当前 trace 下开子 span，没有进行中的 trace 时什么都不记。
+    完成的 span 放在定长环形缓冲里，可导出为 Chrome trace / Perfetto 能打开的 JSON。
+    根 span 结束时在 args 里记 tick_to_order_ms：从这一轮开始到第一个 create_order 返回的耗时
+    """
+
+    def __init__(self, capacity: int = 0, order_span: str = "create_order"):
+        self.order_span = order_span
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.configure(capacity)
+
+    def configure(self, capacity: int):
+        """capacity 为保留的 span 条数，0 关闭；会清空已有的缓冲"""
+        with self._lock:
+            self.enabled = capacity > 0
+            self._events: Deque[_Event] = deque(maxlen=max(1, capacity))
+            self._order_end: Dict[int, int] = {}
+            self._epoch_ns = time.perf_counter_ns()
+            self._epoch_us = time.time() * 1e6
+
+    def trace(self, name: str, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        span = _Span(self, name, 0, None, args)
+        span.trace_id = span.span_id
+        return span
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        parent = _CURRENT.get()
+        if parent is None:
+            return _NULL_SPAN
+        return _Span(self, name, parent.trace_id, parent, args)
+
+    def _finish(self, span: _Span, end_ns: int):
+        with self._lock:
+            if span.parent_id == 0:
+                order_end = self._order_end.pop(span.trace_id, 0)
+                if order_end:
+                    span.args["tick_to_order_ms"] = round((order_end - span.start_ns) / 1e6, 3)
+            elif span.name == self.order_span:
+                self._order_end.setdefault(span.trace_id, end_ns)
+            self._events.append((span.name, span.trace_id, span.span_id, span.parent_id, span.start_ns, end_ns, span.lane, span.args))
+
+    def events(self) -> List[_Event]:
+        with self._lock:
+            return list(self._events)
+
+    def tick_to_order(self) -> List[Tuple[int, float]]:
+        """缓冲里每个下过单的 trace 的 (trace_id, 毫秒)"""
+        return [(e[1], e[7]["tick_to_order_ms"]) for e in self.events() if e[3] == 0 and "tick_to_order_ms" in e[7]]
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        events = self.events()
+        tids: Dict[str, int] = {}
+        out: List[Dict[str, Any]] = []
+        for name, trace_id, span_id, parent_id, start_ns, end_ns, lane, args in events:
+            tid = tids.get(lane)
+            if tid is None:
+                tid = tids[lane] = len(tids) + 1
+                out.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": tid, "args": {"name": lane}})
+            out.append({
+                "name": name,
+                "cat": "tick",
+                "ph": "X",
+                "ts": round(self._epoch_us + (start_ns - self._epoch_ns) / 1e3, 3),
+                "dur": round((end_ns - start_ns) / 1e3, 3),
+                "pid": 1,
+                "tid": tid,
+                "args": {"trace_id": trace_id, "span_id": span_id, "parent_id": parent_id, **args},
+            })
+        return {"traceEvents": out, "displayTimeUnit": "ms"}
+
+    def export(self, path: str) -> int:
+        """写出 Chrome trace JSON（chrome://tracing 或 ui.perfetto.dev 打开），返回 span 条数"""
+        data = self.chrome_trace()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+        return sum(1 for e in data["traceEvents"] if e["ph"] == "X")
+
+
+TRACER = Tracer()
+
+
+def start_tracing(settings, tracer: Tracer = TRACER) -> Optional[Tracer]:
+    """TRACE_BUFFER>0 时开启追踪，退出时把缓冲写到 TRACE_FILE"""
+    if settings.trace_buffer <= 0:
+        return None
+    tracer.configure(settings.trace_buffer)
+    if settings.trace_file:
+        atexit.register(tracer.export, settings.trace_file)
+    return tracer